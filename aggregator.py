@@ -0,0 +1,79 @@
+import asyncio
+from typing import Callable
+
+import twitchio
+
+import logging
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+def join_names(names: list[str], shown: int = 3) -> str:
+    """
+    "A", "A and B", "A, B and C", or "A, B, C and 37 others" past `shown` names.
+    """
+    if len(names) == 1:
+        return names[0]
+    if len(names) <= shown:
+        return f"{', '.join(names[:-1])} and {names[-1]}"
+    hidden = len(names) - shown
+    return f"{', '.join(names[:shown])} and {hidden} other{'s' if hidden > 1 else ''}"
+
+
+class EventAggregator:
+    """
+    Batches bursts of events (follows, subs) per channel.
+
+    The first event after a quiet spell is passed on straight away, so a
+    lone follow is thanked immediately. Events arriving within `window`
+    seconds of that are collected and passed on together when the window
+    closes, and batching carries on window after window until one goes by
+    with no events.
+
+    `send` is called with the broadcaster and the names in the batch, in
+    the order they arrived and without duplicates.
+    """
+
+    def __init__(self, send: Callable[[twitchio.PartialUser, list[str]], None], window: float = 5):
+        self.send = send
+        self.window = window
+        self._pending: dict[str, dict[str, None]] = {}
+        self._timers: dict[str, asyncio.TimerHandle] = {}
+        self._broadcasters: dict[str, twitchio.PartialUser] = {}
+
+    def add(self, broadcaster: twitchio.PartialUser, name: str) -> None:
+        if broadcaster.id in self._timers:
+            self._pending[broadcaster.id][name] = None
+            return
+        self._broadcasters[broadcaster.id] = broadcaster
+        self._pending[broadcaster.id] = {}
+        self._schedule(broadcaster.id)
+        self._send([name], broadcaster)
+
+    def _schedule(self, broadcaster_id: str) -> None:
+        self._timers[broadcaster_id] = asyncio.get_running_loop().call_later(self.window, self._flush, broadcaster_id)
+
+    def _flush(self, broadcaster_id: str) -> None:
+        names = list(self._pending[broadcaster_id])
+        if not names:
+            # A quiet window ends the burst, so the next event goes out straight away again
+            del self._timers[broadcaster_id]
+            del self._pending[broadcaster_id]
+            del self._broadcasters[broadcaster_id]
+            return
+        self._pending[broadcaster_id] = {}
+        self._schedule(broadcaster_id)
+        self._send(names, self._broadcasters[broadcaster_id])
+
+    def _send(self, names: list[str], broadcaster: twitchio.PartialUser) -> None:
+        try:
+            self.send(broadcaster, names)
+        except Exception as e:
+            logger.exception(f"Failed to send batched event for {names}: {e}")
+
+    def stop(self) -> None:
+        for timer in self._timers.values():
+            timer.cancel()
+        self._timers.clear()
+        self._pending.clear()
+        self._broadcasters.clear()
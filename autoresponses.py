@@ -0,0 +1,105 @@
+import asyncio
+import random
+import time
+
+import logging
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+class AutoResponder:
+    """
+    Sends a chatter one of their auto-responses when they chat after
+    being quiet for their cooldown.
+
+    Only chatters who have auto-responses are tracked, indexed by user id,
+    so everyone else costs a single dict lookup per message. Their
+    last-seen times are kept in memory and written back to the user
+    database every `save_interval` seconds. Each chatter's responses are
+    dealt from a shuffled deck, so none repeats until all have been sent.
+    """
+
+    def __init__(self, user_db, default_cooldown: float, save_interval: float = 60):
+        self._user_db = user_db
+        self.default_cooldown = default_cooldown # seconds
+        self.save_interval = save_interval
+        self._responses: dict[str, list[str]] = {}
+        self._cooldowns: dict[str, float] = {} # per chatter overrides of default_cooldown, in seconds
+        self._last_seen: dict[str, float] = {}
+        self._decks: dict[str, list[str]] = {}
+        self._last_sent: dict[str, str] = {}
+        self._dirty: set[str] = set()
+        self._save_task: asyncio.Task | None = None
+
+    async def setup(self) -> None:
+        for user_id, user in (await self._user_db.get_auto_responders()).items():
+            self._responses[user_id] = list(user["auto_responses"])
+            self._last_seen[user_id] = user.get("last_message_ts") or 0
+            if user.get("auto_response_cooldown") is not None:
+                self._cooldowns[user_id] = user["auto_response_cooldown"]
+        logger.info(f"Loaded auto-responses for {len(self)} chatters")
+
+    def __len__(self) -> int:
+        return len(self._responses)
+
+    def __contains__(self, user_id) -> bool:
+        return user_id in self._responses
+
+    def on_message(self, user_id) -> str | None:
+        """Note that user_id chatted, returning the response to send, if any."""
+        if user_id not in self._responses:
+            return None
+        now = time.time()
+        last_seen = self._last_seen.get(user_id, 0)
+        self._last_seen[user_id] = now
+        self._dirty.add(user_id)
+        if now - last_seen < self._cooldowns.get(user_id, self.default_cooldown):
+            return None
+        return self._deal(user_id)
+
+    def _deal(self, user_id) -> str:
+        deck = self._decks.get(user_id)
+        if not deck:
+            deck = random.sample(self._responses[user_id], len(self._responses[user_id]))
+            # Don't let a fresh deck start with the response that ended the last one
+            if len(deck) > 1 and deck[-1] == self._last_sent.get(user_id):
+                deck[0], deck[-1] = deck[-1], deck[0]
+            self._decks[user_id] = deck
+        response = deck.pop()
+        self._last_sent[user_id] = response
+        return response
+
+    def add(self, user_id, response: str) -> None:
+        self._responses.setdefault(user_id, []).append(response)
+        # Reshuffled with the new response on the next deal
+        self._decks.pop(user_id, None)
+        # Untracked until now, so respond the next time they chat
+        self._last_seen.setdefault(user_id, 0)
+
+    def set_cooldown(self, user_id, seconds: float) -> None:
+        self._cooldowns[user_id] = seconds
+
+    async def save(self) -> None:
+        if not self._dirty:
+            return
+        last_seen = {user_id: int(self._last_seen[user_id]) for user_id in self._dirty}
+        self._dirty.clear()
+        await self._user_db.save_last_seen(last_seen)
+
+    async def _save_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.save_interval)
+            try:
+                await self.save()
+            except Exception as e:
+                logger.error(f"Saving auto-response last-seen times failed: {e}")
+
+    def start(self) -> None:
+        if self._save_task is None:
+            self._save_task = asyncio.create_task(self._save_loop())
+
+    async def stop(self) -> None:
+        if self._save_task is not None:
+            self._save_task.cancel()
+            self._save_task = None
+        await self.save()
@@ -0,0 +1,250 @@
+"""
+Chat replay benchmark for BotComponent.
+
+Replays synthetic chat through BotComponent.event_message, and the !d20 and
+!brick command callbacks, against stubbed broadcaster/Helix objects, and
+reports p50/p99 latency and messages per second for each scenario.
+
+Each scenario runs in its own process against a throwaway data directory,
+so storage settings and resident data don't leak between runs:
+
+    python benchmarks/chat_replay.py --users 1000 100000 500000 --keywords 0 100 --culling off on
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import itertools
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BROADCASTER_ID = "1"
+BOT_ID = "2"
+WORDS = ["hello", "gg", "lol", "pog", "brick", "dice", "stream", "nice", "what", "chat", "hype", "clip", "wow", "yes", "no"]
+
+
+class StubBroadcaster:
+    """Stands in for twitchio.PartialUser; every Helix call just sleeps for `latency` seconds."""
+
+    def __init__(self, latency: float):
+        self.id = BROADCASTER_ID
+        self.name = "broadcaster"
+        self.latency = latency
+        self.calls = 0
+
+    async def _call(self, *args, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+
+    send_message = send_announcement = timeout_user = add_vip = remove_vip = add_moderator = remove_moderator = _call
+
+    async def fetch_chatters(self, **kwargs):
+        async def users():
+            return
+            yield
+        return SimpleNamespace(users=users())
+
+
+def make_chatter(user_id: str, name: str, moderator: bool = False):
+    return SimpleNamespace(id=user_id, name=name, mention=f"@{name}", moderator=moderator, vip=False, broadcaster=False)
+
+
+def write_users(path: str, count: int, auto_responses: bool) -> None:
+    users = []
+    for i in range(count):
+        user = {"id": str(1000 + i), "name": f"user{i}", "persistent_mod": False, "points": 0, "last_message_ts": 0}
+        if auto_responses and i % 10 == 0:
+            user["auto_responses"] = ["welcome back!", "hi there"]
+        users.append(user)
+    with open(path, "w") as f:
+        json.dump({"users": users}, f)
+
+
+def write_dice_players(path: str, count: int) -> None:
+    # Players who already rolled today, so !d20 checks against a full day
+    with open(path, "w") as f:
+        json.dump({"timestamp": int(time.time()), "players_today": [f"roller{i}" for i in range(count)]}, f)
+
+
+def make_text(rng: random.Random, keywords: list[str], keyword_rate: float) -> str:
+    words = rng.choices(WORDS, k=rng.randint(2, 12))
+    if keywords and rng.random() < keyword_rate:
+        words.insert(rng.randrange(len(words) + 1), rng.choice(keywords))
+    return " ".join(words)
+
+
+def percentile(samples: list[float], fraction: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+async def run_scenario(scenario: dict) -> dict:
+    sys.path.insert(0, REPO_ROOT)
+    import asqlite
+    from bonkybot import BotComponent
+    from config import JSON_DB_PATH
+    from db import MiniGameDatabase, flush_all
+
+    rng = random.Random(scenario["seed"])
+    minigame_db = MiniGameDatabase()
+    keywords = [f"kw{i}word" for i in range(scenario["keywords"])]
+    minigame_db.update_ban_keywords(keywords[: len(keywords) // 2])
+    minigame_db.update_vip_keywords(keywords[len(keywords) // 2:])
+    minigame_db.toggle_culling_mode(scenario["culling"])
+
+    broadcaster = StubBroadcaster(scenario["helix_latency_ms"] / 1000)
+    pool = None
+    if scenario["backend"] == "sqlite":
+        pool = await asqlite.create_pool(os.path.join(JSON_DB_PATH, "bonkybot.db"))
+    bot = SimpleNamespace(bot_id=BOT_ID, minigame_db=minigame_db, token_database=pool, create_partialuser=lambda user_id: broadcaster)
+    component = BotComponent(bot)
+    await component.component_load()
+
+    # Mostly returning chatters, with some first-timers who have to be inserted
+    known = min(scenario["chatters"], scenario["users"])
+    chatters = [make_chatter(str(1000 + i), f"user{i}", moderator=rng.random() < 0.05) for i in rng.sample(range(scenario["users"]), known)]
+    chatters += [make_chatter(str(10_000_000 + i), f"newuser{i}") for i in range(max(1, scenario["chatters"] // 10))]
+
+    latencies: list[float] = []
+    process_message = component.process_message
+
+    async def timed(message):
+        await process_message(message)
+        payload, _ = message
+        latencies.append(time.perf_counter() - payload.received_at)
+    component.pipeline.handler = timed
+
+    interval = 1 / scenario["rate"] if scenario["rate"] else 0
+    messages = scenario["messages"]
+    start = time.perf_counter()
+    # event_message echoes chat to the terminal, which isn't what's being measured
+    with contextlib.redirect_stdout(io.StringIO()):
+        for i in range(messages):
+            chatter = rng.choice(chatters)
+            payload = SimpleNamespace(
+                id=str(i), chatter=chatter, broadcaster=broadcaster, source_broadcaster=None,
+                text=make_text(rng, keywords, scenario["keyword_rate"]), received_at=time.perf_counter(),
+            )
+            await component.event_message(payload)
+            if interval:
+                await asyncio.sleep(interval)
+            elif i % 100 == 0:
+                await asyncio.sleep(0)
+        while component.pipeline._workers:
+            await asyncio.sleep(0.001)
+    elapsed = time.perf_counter() - start
+
+    command_latencies: dict[str, list[float]] = {"d20": [], "brick": []}
+    for _ in range(scenario["commands"]):
+        chatter = rng.choice(chatters)
+        ctx = SimpleNamespace(chatter=chatter, broadcaster=broadcaster, channel=broadcaster, args=[])
+        began = time.perf_counter()
+        await component.roll_d20.callback(component, ctx)
+        command_latencies["d20"].append(time.perf_counter() - began)
+        began = time.perf_counter()
+        await component.brickroulette.callback(component, ctx)
+        command_latencies["brick"].append(time.perf_counter() - began)
+
+    await component.component_teardown()
+    flush_all()
+    if pool is not None:
+        await pool.close()
+    return {
+        "processed": len(latencies),
+        "dropped": messages - len(latencies),
+        "p50_ms": percentile(latencies, 0.5) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "msgs_per_s": len(latencies) / elapsed if elapsed else 0.0,
+        "commands": {name: {"p50_ms": percentile(samples, 0.5) * 1000, "p99_ms": percentile(samples, 0.99) * 1000} for name, samples in command_latencies.items()},
+        "helix_calls": broadcaster.calls,
+    }
+
+
+def prepare_data_dir(root: str, scenario: dict) -> None:
+    data_dir = os.path.join(root, "BonkyBot")
+    os.makedirs(os.path.join(data_dir, "db"), exist_ok=True)
+    os.makedirs(os.path.join(data_dir, "logs"), exist_ok=True)
+    with open(os.path.join(data_dir, "config.ini"), "w") as f:
+        f.write(
+            "[Twitch]\nCLIENT_ID=\nCLIENT_SECRET=\n"
+            f"BOT_ID={BOT_ID}\nOWNER_ID={BROADCASTER_ID}\n\n"
+            f"[Storage]\nBACKEND={scenario['backend']}\n"
+        )
+    write_users(os.path.join(data_dir, "db", "users.json"), scenario["users"], scenario["auto_responses"])
+    write_dice_players(os.path.join(data_dir, "db", "dice.json"), scenario["dice_players"])
+
+
+def run_in_subprocess(scenario: dict) -> dict:
+    with tempfile.TemporaryDirectory(prefix="bonkybench-") as root:
+        prepare_data_dir(root, scenario)
+        # BONKYBOT_DATA_DIR wins over PROGRAMDATA, so it has to be overridden too or a real data dir gets used
+        env = {**os.environ, "PROGRAMDATA": root, "BONKYBOT_DATA_DIR": os.path.join(root, "BonkyBot")}
+        result = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--run", json.dumps(scenario)],
+            env=env, capture_output=True, text=True, check=False,
+        )
+        if result.returncode != 0:
+            raise RuntimeError(f"Scenario {scenario} failed:\n{result.stderr}")
+        return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def on_off(value: str) -> bool:
+    return value.lower() in ("on", "true", "1", "yes")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, nargs="+", default=[1000, 100000], help="users.json sizes")
+    parser.add_argument("--keywords", type=int, nargs="+", default=[0, 100], help="ban + VIP keyword counts")
+    parser.add_argument("--culling", type=on_off, nargs="+", default=[False], help="culling mode on/off")
+    parser.add_argument("--auto-responses", type=on_off, nargs="+", default=[False], help="give every tenth user auto-responses")
+    parser.add_argument("--dice-players", type=int, nargs="+", default=[0], help="players who already rolled !d20 today")
+    parser.add_argument("--backend", nargs="+", default=["json"], choices=["json", "sqlite"])
+    parser.add_argument("--messages", type=int, default=5000)
+    parser.add_argument("--chatters", type=int, default=500, help="distinct chatters in the replay")
+    parser.add_argument("--commands", type=int, default=200, help="!d20 and !brick invocations after the replay")
+    parser.add_argument("--rate", type=float, default=0, help="messages per second, 0 replays as fast as possible")
+    parser.add_argument("--keyword-rate", type=float, default=0.01, help="fraction of messages containing a keyword")
+    parser.add_argument("--helix-latency-ms", type=float, default=50, help="simulated Helix/chat API latency")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", dest="json_path", help="also write the results to this file")
+    parser.add_argument("--run", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        result = asyncio.run(run_scenario(json.loads(args.run)))
+        print(json.dumps(result))
+        return
+
+    results = []
+    print(f"{'backend':8} {'users':>7} {'kw':>4} {'cull':>4} {'ar':>3} {'dice':>6} {'p50 ms':>8} {'p99 ms':>8} {'msg/s':>9} {'dropped':>7} {'d20 p99':>8} {'brick p99':>9}")
+    for backend, users, keywords, culling, auto_responses, dice_players in itertools.product(args.backend, args.users, args.keywords, args.culling, args.auto_responses, args.dice_players):
+        scenario = {
+            "backend": backend, "users": users, "keywords": keywords, "culling": culling, "auto_responses": auto_responses,
+            "dice_players": dice_players, "messages": args.messages, "chatters": args.chatters, "commands": args.commands, "rate": args.rate,
+            "keyword_rate": args.keyword_rate, "helix_latency_ms": args.helix_latency_ms, "seed": args.seed,
+        }
+        result = run_in_subprocess(scenario)
+        results.append({"scenario": scenario, **result})
+        print(
+            f"{backend:8} {users:>7} {keywords:>4} {'on' if culling else 'off':>4} {'on' if auto_responses else 'off':>3} {dice_players:>6} "
+            f"{result['p50_ms']:>8.2f} {result['p99_ms']:>8.2f} {result['msgs_per_s']:>9.0f} {result['dropped']:>7} "
+            f"{result['commands']['d20']['p99_ms']:>8.2f} {result['commands']['brick']['p99_ms']:>9.2f}",
+            flush=True,
+        )
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(results, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
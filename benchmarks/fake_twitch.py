@@ -0,0 +1,384 @@
+"""
+Local stand-in for Twitch, for load testing the bot offline.
+
+Serves the OAuth endpoints, the Helix endpoints the bot uses (users,
+chatters, bans, VIPs, moderators, chat messages, announcements, EventSub
+subscriptions) and an EventSub websocket, all from one aiohttp app.
+
+Helix responses carry Ratelimit-Limit/-Remaining/-Reset headers from a
+per-token bucket and return 429 once it is empty. Every request can be
+delayed by `latency_ms` (plus up to `jitter_ms`), and a fraction
+`error_rate` of Helix requests fail with a 500. As on Twitch, each
+websocket takes at most 300 subscriptions.
+
+Events are pushed to connected websockets with send_chat(), follow(),
+subscribe(), stream_online() and ad_break(), which go to the
+subscriptions for the main broadcaster or, for chat, follows and subs,
+any other broadcaster_id (channel<id> for ids under 1000). point_twitchio_at() aims
+twitchio and TwitchAPI at the server; load_test.py runs the real Bot
+against it. The server can also be run on its own:
+
+    python benchmarks/fake_twitch.py --port 8080 --users 100000 --latency-ms 30
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+
+from aiohttp import web
+
+HELIX_POINTS_PER_MINUTE = 800
+SUBSCRIPTIONS_PER_SESSION = 300 # Twitch's limit on subscriptions per EventSub websocket
+
+
+def now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+class FakeTwitch:
+    def __init__(
+        self,
+        broadcaster_id: str = "1",
+        bot_id: str = "2",
+        users: int = 1000,
+        latency_ms: float = 0,
+        jitter_ms: float = 0,
+        error_rate: float = 0,
+        rate_limit: int = HELIX_POINTS_PER_MINUTE,
+        keepalive_seconds: int = 10,
+        seed: int = 1,
+    ):
+        self.broadcaster_id = broadcaster_id
+        self.bot_id = bot_id
+        self.user_count = users
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.keepalive_seconds = keepalive_seconds
+        self.random = random.Random(seed)
+        self.calls: Counter[str] = Counter()
+        self.chatters: dict[str, str] = {}
+        self.sent_at: dict[str, float] = {}
+        self._buckets: dict[str, tuple[float, float]] = {}
+        self._sessions: dict[str, web.WebSocketResponse] = {}
+        self._subscriptions: dict[str, dict] = {}
+        self._message_ids = itertools.count()
+        self._runner: web.AppRunner | None = None
+        self.subscribed = asyncio.Event()
+        self.app = self._build_app()
+
+    # Users: user<i> has id 1000 + i, plus the broadcaster and bot accounts, and channel<id> for any other id under 1000
+    def login_for(self, user_id: str) -> str | None:
+        if user_id == self.broadcaster_id:
+            return "broadcaster"
+        if user_id == self.bot_id:
+            return "bonkybot"
+        if user_id.isdigit() and int(user_id) < 1000:
+            return f"channel{user_id}"
+        if user_id.isdigit() and 1000 <= int(user_id) < 1000 + self.user_count:
+            return f"user{int(user_id) - 1000}"
+        return None
+
+    def id_for(self, login: str) -> str | None:
+        login = login.lower()
+        if login == "broadcaster":
+            return self.broadcaster_id
+        if login == "bonkybot":
+            return self.bot_id
+        if login.startswith("channel") and login[7:].isdigit() and int(login[7:]) < 1000:
+            return login[7:]
+        if login.startswith("user") and login[4:].isdigit() and int(login[4:]) < self.user_count:
+            return str(1000 + int(login[4:]))
+        return None
+
+    def _user(self, user_id: str, login: str) -> dict:
+        return {
+            "id": user_id, "login": login, "display_name": login, "type": "", "broadcaster_type": "",
+            "description": "", "profile_image_url": "", "offline_image_url": "", "view_count": 0, "created_at": now_iso(),
+        }
+
+    def _build_app(self) -> web.Application:
+        app = web.Application(middlewares=[self._middleware])
+        app.router.add_post("/oauth2/token", self.token)
+        app.router.add_get("/oauth2/validate", self.validate)
+        app.router.add_get("/helix/users", self.users)
+        app.router.add_get("/helix/chat/chatters", self.get_chatters)
+        app.router.add_post("/helix/moderation/bans", self.ban)
+        app.router.add_post("/helix/channels/vips", self.no_content)
+        app.router.add_delete("/helix/channels/vips", self.no_content)
+        app.router.add_post("/helix/moderation/moderators", self.no_content)
+        app.router.add_delete("/helix/moderation/moderators", self.no_content)
+        app.router.add_post("/helix/chat/messages", self.chat_message)
+        app.router.add_post("/helix/chat/announcements", self.no_content)
+        app.router.add_post("/helix/eventsub/subscriptions", self.create_subscription)
+        app.router.add_get("/helix/eventsub/subscriptions", self.list_subscriptions)
+        app.router.add_delete("/helix/eventsub/subscriptions", self.no_content)
+        app.router.add_get("/ws", self.websocket)
+        return app
+
+    @web.middleware
+    async def _middleware(self, request: web.Request, handler):
+        self.calls[f"{request.method} {request.path}"] += 1
+        if self.latency_ms or self.jitter_ms:
+            await asyncio.sleep((self.latency_ms + self.random.uniform(0, self.jitter_ms)) / 1000)
+        if not request.path.startswith("/helix/"):
+            return await handler(request)
+        token = request.headers.get("Authorization", "")
+        remaining, reset = self._take_point(token)
+        headers = {"Ratelimit-Limit": str(self.rate_limit), "Ratelimit-Remaining": str(max(0, int(remaining))), "Ratelimit-Reset": str(int(reset))}
+        if remaining < 0:
+            self.calls["429"] += 1
+            return web.json_response({"error": "Too Many Requests", "status": 429, "message": "Rate limit exceeded"}, status=429, headers=headers)
+        if self.error_rate and self.random.random() < self.error_rate:
+            self.calls["500"] += 1
+            return web.json_response({"error": "Internal Server Error", "status": 500, "message": "Injected error"}, status=500, headers=headers)
+        response = await handler(request)
+        response.headers.update(headers)
+        return response
+
+    def _take_point(self, token: str) -> tuple[float, float]:
+        # Same shape as Helix: a bucket per token refilling continuously over a minute
+        now = time.time()
+        rate = self.rate_limit / 60
+        tokens, updated = self._buckets.get(token, (self.rate_limit, now))
+        tokens = min(self.rate_limit, tokens + (now - updated) * rate)
+        if tokens >= 1:
+            tokens -= 1
+            self._buckets[token] = (tokens, now)
+            return tokens, now + (self.rate_limit - tokens) / rate
+        self._buckets[token] = (tokens, now)
+        return -1, now + (1 - tokens) / rate
+
+    # OAuth
+    async def token(self, request: web.Request) -> web.Response:
+        return web.json_response({"access_token": f"app-{uuid.uuid4().hex}", "refresh_token": "", "expires_in": 3600, "token_type": "bearer", "scope": []})
+
+    async def validate(self, request: web.Request) -> web.Response:
+        # User tokens are "fake-<user id>", anything else is an app token
+        token = request.headers.get("Authorization", "").split(" ")[-1]
+        user_id = token.removeprefix("fake-") if token.startswith("fake-") else None
+        data = {"client_id": "fake", "scopes": [], "expires_in": 3600}
+        if user_id:
+            data.update({"login": self.login_for(user_id) or f"user{user_id}", "user_id": user_id})
+        return web.json_response(data)
+
+    # Helix
+    async def users(self, request: web.Request) -> web.Response:
+        data = []
+        for user_id in request.query.getall("id", []):
+            if (login := self.login_for(user_id)) is not None:
+                data.append(self._user(user_id, login))
+        for login in request.query.getall("login", []):
+            if (user_id := self.id_for(login)) is not None:
+                data.append(self._user(user_id, login.lower()))
+        return web.json_response({"data": data})
+
+    async def get_chatters(self, request: web.Request) -> web.Response:
+        first = min(int(request.query.get("first", 100)), 1000)
+        start = int(request.query.get("after", 0))
+        chatters = list(self.chatters.items())
+        page = chatters[start:start + first]
+        cursor = str(start + first) if start + first < len(chatters) else None
+        return web.json_response({
+            "data": [{"user_id": user_id, "user_login": login, "user_name": login} for user_id, login in page],
+            "pagination": {"cursor": cursor} if cursor else {},
+            "total": len(chatters),
+        })
+
+    async def ban(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        duration = body["data"].get("duration")
+        return web.json_response({"data": [{
+            "broadcaster_id": request.query.get("broadcaster_id"),
+            "moderator_id": request.query.get("moderator_id"),
+            "user_id": body["data"]["user_id"],
+            "created_at": now_iso(),
+            "end_time": now_iso() if duration else None,
+        }]})
+
+    async def no_content(self, request: web.Request) -> web.Response:
+        return web.Response(status=204)
+
+    async def chat_message(self, request: web.Request) -> web.Response:
+        return web.json_response({"data": [{"message_id": uuid.uuid4().hex, "is_sent": True, "drop_reason": None}]})
+
+    async def create_subscription(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        session_id = body["transport"].get("session_id")
+        if sum(1 for subscription in self._subscriptions.values() if subscription["transport"].get("session_id") == session_id) >= SUBSCRIPTIONS_PER_SESSION:
+            return web.json_response({"error": "Too Many Requests", "status": 429, "message": "websocket transport session subscriptions limit exceeded"}, status=429)
+        subscription = {
+            "id": uuid.uuid4().hex,
+            "status": "enabled",
+            "type": body["type"],
+            "version": body["version"],
+            "condition": body["condition"],
+            "created_at": now_iso(),
+            "transport": {**body["transport"], "connected_at": now_iso()},
+            "cost": 0,
+        }
+        self._subscriptions[subscription["id"]] = subscription
+        if body["type"] == "channel.chat.message":
+            self.subscribed.set()
+        return web.json_response({"data": [subscription], "total": len(self._subscriptions), "total_cost": 0, "max_total_cost": 10000}, status=202)
+
+    async def list_subscriptions(self, request: web.Request) -> web.Response:
+        data = list(self._subscriptions.values())
+        return web.json_response({"data": data, "total": len(data), "total_cost": 0, "max_total_cost": 10000, "pagination": {}})
+
+    # EventSub websocket
+    async def websocket(self, request: web.Request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        session_id = uuid.uuid4().hex
+        keepalive = int(request.query.get("keepalive_timeout_seconds", self.keepalive_seconds))
+        await ws.send_str(json.dumps({
+            "metadata": {"message_id": uuid.uuid4().hex, "message_type": "session_welcome", "message_timestamp": now_iso()},
+            "payload": {"session": {"id": session_id, "status": "connected", "connected_at": now_iso(), "keepalive_timeout_seconds": keepalive, "reconnect_url": None}},
+        }))
+        self._sessions[session_id] = ws
+        keepalive_task = asyncio.create_task(self._keepalive(ws, keepalive))
+        try:
+            async for _ in ws:
+                pass
+        finally:
+            keepalive_task.cancel()
+            del self._sessions[session_id]
+            for subscription_id, subscription in list(self._subscriptions.items()):
+                if subscription["transport"].get("session_id") == session_id:
+                    del self._subscriptions[subscription_id]
+        return ws
+
+    async def _keepalive(self, ws: web.WebSocketResponse, interval: int) -> None:
+        while not ws.closed:
+            await asyncio.sleep(max(1, interval - 1))
+            await ws.send_str(json.dumps({"metadata": {"message_id": uuid.uuid4().hex, "message_type": "session_keepalive", "message_timestamp": now_iso()}, "payload": {}}))
+
+    async def notify(self, subscription_type: str, event: dict) -> int:
+        """Send an event to every websocket subscribed to subscription_type for its broadcaster, returning how many got it."""
+        sent = 0
+        for subscription in list(self._subscriptions.values()):
+            if subscription["type"] != subscription_type:
+                continue
+            if subscription["condition"].get("broadcaster_user_id", event["broadcaster_user_id"]) != event["broadcaster_user_id"]:
+                continue
+            ws = self._sessions.get(subscription["transport"].get("session_id"))
+            if ws is None or ws.closed:
+                continue
+            await ws.send_str(json.dumps({
+                "metadata": {
+                    "message_id": uuid.uuid4().hex, "message_type": "notification", "message_timestamp": now_iso(),
+                    "subscription_type": subscription_type, "subscription_version": subscription["version"],
+                },
+                "payload": {"subscription": subscription, "event": event},
+            }))
+            sent += 1
+        return sent
+
+    def _broadcaster_fields(self, broadcaster_id: str | None = None) -> dict:
+        broadcaster_id = broadcaster_id or self.broadcaster_id
+        login = self.login_for(broadcaster_id)
+        return {"broadcaster_user_id": broadcaster_id, "broadcaster_user_login": login, "broadcaster_user_name": login}
+
+    async def send_chat(self, chatter_id: str, login: str, text: str, badges: tuple[str, ...] = (), broadcaster_id: str | None = None) -> str:
+        """
+        Have a chatter say something, returning the message id. Badges are
+        set ids like "moderator" or "vip". Goes to the main broadcaster's
+        chat unless another broadcaster_id is given.
+        """
+        message_id = f"msg-{next(self._message_ids)}"
+        self.chatters[chatter_id] = login
+        self.sent_at[message_id] = time.perf_counter()
+        await self.notify("channel.chat.message", {
+            **self._broadcaster_fields(broadcaster_id),
+            "chatter_user_id": chatter_id, "chatter_user_login": login, "chatter_user_name": login,
+            "message_id": message_id,
+            "message": {"text": text, "fragments": [{"type": "text", "text": text, "cheermote": None, "emote": None, "mention": None}]},
+            "color": "#FF0000",
+            "badges": [{"set_id": badge, "id": "1", "info": ""} for badge in badges],
+            "message_type": "text", "cheer": None, "reply": None,
+            "channel_points_custom_reward_id": None, "channel_points_animation_id": None,
+            "source_broadcaster_user_id": None, "source_broadcaster_user_login": None, "source_broadcaster_user_name": None,
+            "source_message_id": None, "source_badges": None, "is_source_only": None,
+        })
+        return message_id
+
+    async def follow(self, user_id: str, login: str, broadcaster_id: str | None = None) -> None:
+        await self.notify("channel.follow", {**self._broadcaster_fields(broadcaster_id), "user_id": user_id, "user_login": login, "user_name": login, "followed_at": now_iso()})
+
+    async def subscribe(self, user_id: str, login: str, gift: bool = False, broadcaster_id: str | None = None) -> None:
+        await self.notify("channel.subscribe", {**self._broadcaster_fields(broadcaster_id), "user_id": user_id, "user_login": login, "user_name": login, "tier": "1000", "is_gift": gift})
+
+    async def stream_online(self) -> None:
+        await self.notify("stream.online", {**self._broadcaster_fields(), "id": uuid.uuid4().hex, "type": "live", "started_at": now_iso()})
+
+    async def ad_break(self, duration: int = 60) -> None:
+        await self.notify("channel.ad_break.begin", {
+            **self._broadcaster_fields(),
+            "requester_user_id": self.broadcaster_id, "requester_user_login": "broadcaster", "requester_user_name": "broadcaster",
+            "duration_seconds": duration, "is_automatic": False, "started_at": now_iso(),
+        })
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Start serving, returning the base URL (port 0 picks a free one)."""
+        self._runner = web.AppRunner(self.app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        return f"http://{host}:{port}"
+
+    async def stop(self) -> None:
+        for ws in list(self._sessions.values()):
+            await ws.close()
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+
+def point_twitchio_at(base_url: str) -> None:
+    """Send twitchio's and TwitchAPI's Helix, OAuth and EventSub traffic to a FakeTwitch instead of Twitch."""
+    import twitchio.eventsub.websockets
+    import twitchio.http
+    from twitchapi import TwitchAPI
+
+    twitchio.http.Route.BASE = f"{base_url}/helix/"
+    twitchio.http.Route.ID_BASE = f"{base_url}/"
+    twitchio.eventsub.websockets.WSS = f"{base_url.replace('http', 'ws', 1)}/ws"
+    TwitchAPI.BASE_URL = f"{base_url}/helix"
+    TwitchAPI.TOKEN_URL = f"{base_url}/oauth2/token"
+
+
+async def serve(args: argparse.Namespace) -> None:
+    fake = FakeTwitch(users=args.users, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, error_rate=args.error_rate, rate_limit=args.rate_limit)
+    url = await fake.start(args.host, args.port)
+    print(f"Fake Twitch listening on {url} (websocket {url.replace('http', 'ws', 1)}/ws)", flush=True)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await fake.stop()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--error-rate", type=float, default=0)
+    parser.add_argument("--rate-limit", type=int, default=HELIX_POINTS_PER_MINUTE, help="Helix points per minute per token")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
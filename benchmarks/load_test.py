@@ -0,0 +1,170 @@
+"""
+End-to-end load test: the real Bot and BotComponent against fake_twitch.py.
+
+Starts a FakeTwitch, points twitchio at it, logs the bot in with fake
+tokens and pushes chat (and optionally follows/subs) over the EventSub
+websocket, spread over --channels channels, then reports p50/p99 latency
+from the server sending a message to the bot finishing its checks,
+messages per second, resident memory and the Helix calls the bot made:
+
+    python benchmarks/load_test.py --messages 20000 --rate 2000 --latency-ms 30 --error-rate 0.01
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BROADCASTER_ID = "1"
+BOT_ID = "2"
+WORDS = ["hello", "gg", "lol", "pog", "brick", "dice", "stream", "nice", "what", "chat", "hype", "clip", "wow", "yes", "no"]
+
+
+def channel_ids(channels: int) -> list[str]:
+    # The owner's channel plus channel<id> accounts on the fake
+    return [BROADCASTER_ID, *(str(100 + i) for i in range(channels - 1))]
+
+
+def prepare_data_dir(root: str, backend: str, channels: int) -> None:
+    data_dir = os.path.join(root, "BonkyBot")
+    os.makedirs(os.path.join(data_dir, "db"), exist_ok=True)
+    os.makedirs(os.path.join(data_dir, "logs"), exist_ok=True)
+    with open(os.path.join(data_dir, "config.ini"), "w") as f:
+        f.write(
+            "[Twitch]\nCLIENT_ID=fake\nCLIENT_SECRET=fake\n"
+            f"BOT_ID={BOT_ID}\nOWNER_ID={BROADCASTER_ID}\nCHANNEL_IDS={','.join(channel_ids(channels))}\n\n"
+            f"[Storage]\nBACKEND={backend}\n"
+        )
+
+
+def percentile(samples: list[float], fraction: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+async def run(args: argparse.Namespace) -> dict:
+    sys.path.insert(0, REPO_ROOT)
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import asqlite
+    from fake_twitch import FakeTwitch, point_twitchio_at
+    from bonkybot import BotComponent
+    from bot import Bot
+    from config import JSON_DB_PATH
+    from db import MiniGameDatabase, flush_all
+    from headless import resident_memory_mb
+
+    fake = FakeTwitch(BROADCASTER_ID, BOT_ID, users=args.users, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms)
+    point_twitchio_at(await fake.start())
+
+    minigame_db = MiniGameDatabase()
+    minigame_db.toggle_culling_mode(args.culling)
+    rng = random.Random(args.seed)
+
+    async with asqlite.create_pool(os.path.join(JSON_DB_PATH, "bonkybot.db")) as pool:
+        bot = Bot(token_database=pool, bot_component=BotComponent, minigame_db=minigame_db)
+        await bot.setup_database()
+        async with pool.acquire() as connection:
+            for user_id in (BROADCASTER_ID, BOT_ID):
+                await connection.execute("INSERT OR REPLACE INTO tokens (user_id, token, refresh) VALUES (?, ?, ?)", (user_id, f"fake-{user_id}", "refresh"))
+        bot_task = asyncio.create_task(bot.start(with_adapter=False))
+        # Ready once setup_hook has subscribed every channel
+        await asyncio.wait_for(bot.wait_until_ready(), timeout=60)
+        # Errors are only injected once the bot is up, so it can't fail to start
+        fake.error_rate = args.error_rate
+
+        component = bot.get_component("BotComponent")
+        latencies: list[float] = []
+        process_message = component.process_message
+
+        async def timed(message):
+            await process_message(message)
+            payload, _ = message
+            latencies.append(time.perf_counter() - fake.sent_at.pop(payload.id))
+        component.pipeline.handler = timed
+
+        channels = channel_ids(args.channels)
+        chatters = [(str(1000 + i), f"user{i}", ("moderator",) if rng.random() < 0.05 else ()) for i in rng.sample(range(args.users), min(args.chatters, args.users))]
+        interval = 1 / args.rate if args.rate else 0
+        start = time.perf_counter()
+        next_send = start
+        for i in range(args.messages):
+            user_id, login, badges = rng.choice(chatters)
+            channel = rng.choice(channels)
+            await fake.send_chat(user_id, login, " ".join(rng.choices(WORDS, k=rng.randint(2, 12))), badges, broadcaster_id=channel)
+            if args.follows and i % max(1, args.messages // args.follows) == 0:
+                await fake.follow(user_id, login, broadcaster_id=channel)
+            if args.subs and i % max(1, args.messages // args.subs) == 0:
+                await fake.subscribe(user_id, login, gift=True, broadcaster_id=channel)
+            if interval:
+                next_send += interval
+                if (delay := next_send - time.perf_counter()) > 0:
+                    await asyncio.sleep(delay)
+            elif i % 100 == 0:
+                await asyncio.sleep(0)
+        deadline = time.perf_counter() + args.drain_timeout
+        while len(latencies) < args.messages and time.perf_counter() < deadline:
+            await asyncio.sleep(0.01)
+        elapsed = time.perf_counter() - start
+        while len(component.moderation) and time.perf_counter() < deadline:
+            await asyncio.sleep(0.01)
+        memory = resident_memory_mb()
+        websockets = len(bot._websockets.get(BOT_ID, {}))
+
+        await bot.close()
+        bot_task.cancel()
+        flush_all()
+    await fake.stop()
+    return {
+        "sent": args.messages,
+        "processed": len(latencies),
+        "p50_ms": percentile(latencies, 0.5) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "msgs_per_s": len(latencies) / elapsed if elapsed else 0.0,
+        "channels": args.channels,
+        "websockets": websockets,
+        "rss_mb": memory,
+        "helix_calls": {call: count for call, count in sorted(fake.calls.items()) if "/helix/" in call or call in ("429", "500")},
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=10000)
+    parser.add_argument("--rate", type=float, default=0, help="messages per second, 0 sends as fast as possible")
+    parser.add_argument("--channels", type=int, default=1, help="channels the bot serves, chat is spread evenly over them")
+    parser.add_argument("--users", type=int, default=100000, help="accounts the fake Helix users endpoint knows about")
+    parser.add_argument("--chatters", type=int, default=1000, help="distinct chatters sending messages")
+    parser.add_argument("--follows", type=int, default=0, help="follow events spread over the run")
+    parser.add_argument("--subs", type=int, default=0, help="gift sub events spread over the run")
+    parser.add_argument("--culling", action="store_true", help="turn culling mode on (5%% of chatters are moderators)")
+    parser.add_argument("--backend", default="json", choices=["json", "sqlite"])
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--error-rate", type=float, default=0)
+    parser.add_argument("--drain-timeout", type=float, default=60, help="seconds to wait for the bot to catch up after sending")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    with tempfile.TemporaryDirectory(prefix="bonkyload-") as root:
+        prepare_data_dir(root, args.backend, args.channels)
+        os.environ["PROGRAMDATA"] = root
+        # BONKYBOT_DATA_DIR wins over PROGRAMDATA, so it has to be overridden too or a real data dir gets used
+        os.environ["BONKYBOT_DATA_DIR"] = os.path.join(root, "BonkyBot")
+        # event_message echoes chat to the terminal, which would drown out the results
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = asyncio.run(run(args))
+    print(json.dumps(result, indent=4))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Startup budget check for the headless entry point.
+
+Runs `headless.py --check` in a fresh interpreter against fake_twitch.py,
+several times, and reports how long it took from launch to ready, the
+resident memory once ready and whether any GUI module got imported:
+
+    python benchmarks/startup.py --runs 5 --startup-budget 5 --memory-budget 120
+
+Exits with status 1 if the median run is over either budget or a GUI
+module was imported.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BROADCASTER_ID = "1"
+BOT_ID = "2"
+
+CHILD = """
+import sys
+sys.path[:0] = [{repo!r}, {bench!r}]
+import headless
+from fake_twitch import point_twitchio_at
+point_twitchio_at({url!r})
+headless.main({argv!r})
+"""
+
+
+def prepare_data_dir(data_dir: str) -> None:
+    os.makedirs(os.path.join(data_dir, "db"), exist_ok=True)
+    os.makedirs(os.path.join(data_dir, "logs"), exist_ok=True)
+    with open(os.path.join(data_dir, "config.ini"), "w") as f:
+        f.write(
+            "[Twitch]\nCLIENT_ID=fake\nCLIENT_SECRET=fake\n"
+            f"BOT_ID={BOT_ID}\nOWNER_ID={BROADCASTER_ID}\n"
+        )
+    with sqlite3.connect(os.path.join(data_dir, "db", "bonkybot.db")) as connection:
+        connection.execute("CREATE TABLE IF NOT EXISTS tokens(user_id TEXT PRIMARY KEY, token TEXT NOT NULL, refresh TEXT NOT NULL)")
+        for user_id in (BROADCASTER_ID, BOT_ID):
+            connection.execute("INSERT OR REPLACE INTO tokens (user_id, token, refresh) VALUES (?, ?, ?)", (user_id, f"fake-{user_id}", "refresh"))
+
+
+async def run_once(url: str, data_dir: str, args: argparse.Namespace) -> dict:
+    argv = ["--check", "--data-dir", data_dir, "--startup-budget", str(args.startup_budget), "--memory-budget", str(args.memory_budget)]
+    process = await asyncio.create_subprocess_exec(
+        sys.executable, "-c", CHILD.format(repo=REPO_ROOT, bench=BENCH_DIR, url=url, argv=argv),
+        stdout=asyncio.subprocess.PIPE,
+    )
+    stdout, _ = await asyncio.wait_for(process.communicate(), timeout=60)
+    # The report is the last line, chat echo and the like may come before it
+    return json.loads(stdout.decode().strip().splitlines()[-1])
+
+
+async def run(args: argparse.Namespace) -> list[dict]:
+    sys.path.insert(0, BENCH_DIR)
+    from fake_twitch import FakeTwitch
+
+    results = []
+    for _ in range(args.runs):
+        # A fresh server each run, so no run rides on another's websocket session
+        fake = FakeTwitch(BROADCASTER_ID, BOT_ID)
+        url = await fake.start()
+        with tempfile.TemporaryDirectory(prefix="bonkystartup-") as data_dir:
+            prepare_data_dir(data_dir)
+            results.append(await run_once(url, data_dir, args))
+        await fake.stop()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--startup-budget", type=float, default=5, help="seconds from launch to ready")
+    parser.add_argument("--memory-budget", type=float, default=120, help="resident memory in MB once ready")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    startup = statistics.median(result["startup_s"] for result in results)
+    memory = statistics.median(result["rss_mb"] or 0 for result in results)
+    gui_modules = sorted({name for result in results for name in result["gui_modules"]})
+    summary = {
+        "runs": len(results),
+        "startup_s": {"median": startup, "max": max(result["startup_s"] for result in results), "budget": args.startup_budget},
+        "rss_mb": {"median": memory, "max": max(result["rss_mb"] or 0 for result in results), "budget": args.memory_budget},
+        "gui_modules": gui_modules,
+    }
+    print(json.dumps(summary, indent=4))
+    if startup > args.startup_budget or memory > args.memory_budget or gui_modules:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,24 @@
+import asyncio
 import logging
 import twitchio
 import random
+import time
 
 from twitchio.ext import commands
-from datetime import datetime, timedelta
-from config import OWNER_ID, BOT_ID
-from db import UserDatabase, BrickGameDatabase, DiceGameDatabase, MiniGameDatabase
+from datetime import datetime
+from config import OWNER_ID, BOT_ID, CLIENT_ID, CLIENT_SECRET, CHANNEL_IDS, CHAT_MESSAGE_LIMIT, THANKS_WINDOW_MS, CHAT_ECHO_PER_SECOND, COOLDOWN_STORE, BRICK_HIT_POINTS, NATURAL_20_POINTS
+from channels import ChannelState, open_channel
+from leaderboard import STAT_NAMES, STAT_ALIASES
+from cooldowns import CooldownEngine, cooldown
+from resolver import UserIdResolver
+from twitchapi import TwitchAPI
+from pipeline import MessagePipeline
+from moderation import ModerationDispatcher, Priority
+from outbound import ChatScheduler, ChatPriority
+from aggregator import EventAggregator, join_names
+from metrics import MESSAGES, COMMANDS, COMMAND_SECONDS
+from logsetup import ChatEcho
+from profiler import is_profiling, profile_for
 from bot import Bot
 import re
 
@@ -13,32 +26,83 @@ LOGGER: logging.Logger = logging.getLogger("BonkyBot")
 
 class BotComponent(commands.Component):
     def __init__(self, bot: Bot) -> None:
-        # Load database files into memory
-        self.user_db = UserDatabase()
-        self.brick_db = BrickGameDatabase()
-        self.dice_db = DiceGameDatabase()
-        self.minigame_db = MiniGameDatabase()
+        # Per-channel state, by broadcaster id, filled in by component_load
+        self.channels: dict[str, ChannelState] = {}
+        # Everything below is shared by all channels
+        self.resolver = UserIdResolver(TwitchAPI(CLIENT_ID, CLIENT_SECRET))
+        self._background_tasks: set[asyncio.Task] = set()
+        self.chat_echo = ChatEcho(CHAT_ECHO_PER_SECOND)
+        self.pipeline = MessagePipeline(self.process_message)
+        self.moderation = ModerationDispatcher()
+        self.chat = ChatScheduler(bot.bot_id, CHAT_MESSAGE_LIMIT)
+        self.follows = EventAggregator(self._thank_followers, THANKS_WINDOW_MS / 1000)
+        self.subscriptions = EventAggregator(self._thank_subscribers, THANKS_WINDOW_MS / 1000)
         self.bot = bot
 
-        
-    def _has_mod_perms(self, ctx: commands.Context) -> bool:
-        if not (ctx.chatter.broadcaster or self.user_db.is_persistent_mod(ctx.chatter.id)):
+    async def component_load(self) -> None:
+        # Cooldowns are per channel already, so one engine serves them all
+        self.cooldowns = CooldownEngine(self.bot.token_database if COOLDOWN_STORE == "sqlite" else None)
+        await self.cooldowns.setup()
+        for broadcaster_id in CHANNEL_IDS:
+            # The GUI's minigame settings are the owner's channel's
+            minigame_db = self.bot.minigame_db if broadcaster_id == OWNER_ID else None
+            channel = await open_channel(broadcaster_id, self.resolver, self.bot.token_database, minigame_db)
+            channel.start(self.bot.create_partialuser(broadcaster_id))
+            self.channels[broadcaster_id] = channel
+        self.moderation.start()
+        self.chat.start()
+
+    async def component_teardown(self) -> None:
+        for channel in self.channels.values():
+            await channel.close()
+        self.pipeline.stop()
+        self.moderation.stop()
+        self.chat.stop()
+        self.follows.stop()
+        self.subscriptions.stop()
+        await self.resolver.twitch_api.close()
+
+    async def component_before_invoke(self, ctx: commands.Context) -> None:
+        ctx.started_at = time.perf_counter()
+
+    async def component_after_invoke(self, ctx: commands.Context) -> None:
+        # Also runs when the command raised, as long as its guards passed, but
+        # not before_invoke if parsing its arguments failed, so there's nothing to time
+        started = getattr(ctx, "started_at", None)
+        if started is None:
+            return
+        COMMAND_SECONDS.observe(time.perf_counter() - started, command=ctx.command.name)
+
+    @commands.Component.listener()
+    async def event_command_invoked(self, ctx: commands.Context) -> None:
+        COMMANDS.inc(command=ctx.command.name)
+
+    def _thank_followers(self, broadcaster: twitchio.PartialUser, names: list[str]) -> None:
+        if len(names) == 1:
+            self.chat.send(broadcaster, f"Thanks for the follow {names[0]}!", ChatPriority.EVENT)
+        else:
+            self.chat.send(broadcaster, f"Thanks for the follows {join_names(names)}!", ChatPriority.EVENT)
+
+    def _thank_subscribers(self, broadcaster: twitchio.PartialUser, names: list[str]) -> None:
+        if len(names) == 1:
+            self.chat.send(broadcaster, f"Thanks for subscribing {names[0]}!", ChatPriority.EVENT)
+        else:
+            self.chat.send(broadcaster, f"Thanks for the subs {join_names(names)}!", ChatPriority.EVENT)
+
+    async def _has_mod_perms(self, channel: ChannelState, ctx: commands.Context) -> bool:
+        if not (ctx.chatter.broadcaster or await channel.user_db.is_persistent_mod(ctx.chatter.id)):
             LOGGER.info(f"{ctx.chatter.name} lacks permissions to run this command.")
             return False
         return True
 
-    async def get_current_chatters(self, ctx: commands.Context) -> None:
-        chatters = await ctx.broadcaster.fetch_chatters(moderator=OWNER_ID)
-        chatters_map = {}
-        async for user in chatters.users:
-            chatters_map[user.id] = user.name
-        LOGGER.info(f"Chatters: {chatters_map}")
-        return chatters_map
-    
-    def _pick_random_chatter(self, chatters: dict[str, str]) -> str:
-        # Pick a random chatter from the list
-        random_chatter = random.choice(list(chatters.values()))
-        LOGGER.info(f"Random Chatter: {random_chatter}")
+    async def _pick_random_chatter(self, channel: ChannelState, ctx: commands.Context) -> str:
+        # Pick a random chatter from the ones currently in chat
+        random_chatter = channel.presence.random_name()
+        if random_chatter is None:
+            # Nobody tracked yet (e.g. right after startup), so sweep once now
+            await channel.presence.sweep(ctx.broadcaster, channel.broadcaster_id)
+            random_chatter = channel.presence.random_name() or ctx.chatter.name
+        LOGGER.debug(f"Random Chatter: {random_chatter}")
         return random_chatter
     
     def throw_brick_at_user(self, from_user_id: str, to_user_id: str) -> str:
@@ -56,89 +120,91 @@ class BotComponent(commands.Component):
         args = [arg.replace(u"\U000E0000", "").replace("@", "").strip() for arg in args]
         return [arg.lower() for arg in args if arg]
     
-    def load_user_from_db(self, payload: twitchio.ChatMessage) -> dict[str, str]:
-        user = self.user_db.get_user(payload.chatter.id)
+    async def load_user_from_db(self, channel: ChannelState, payload: twitchio.ChatMessage) -> dict[str, str]:
+        user = await channel.user_db.get_user(payload.chatter.id)
         if not user or user["name"] != payload.chatter.name:
-            user = self.user_db.update_current_chatter(payload)
+            user = await channel.user_db.update_current_chatter(payload)
         return user
     
-    async def check_for_ban_keyword(self, payload: twitchio.ChatMessage) -> None:
-        ban_keyword = self.minigame_db.get_ban_keyword()
-        if ban_keyword and ban_keyword in payload.text.lower():
-            await payload.broadcaster.timeout_user(
-                moderator=OWNER_ID, 
-                user=payload.chatter.id, 
-                duration=self.minigame_db.get_timeout_duration(), 
+    async def check_for_ban_keyword(self, channel: ChannelState, payload: twitchio.ChatMessage, ban_keyword: str | None) -> None:
+        if ban_keyword:
+            self.moderation.timeout_user(
+                payload.broadcaster,
+                payload.chatter.id,
+                moderator=channel.broadcaster_id,
+                duration=channel.minigame_db.get_timeout_duration(),
                 reason="Culled for using the forbidden keyword"
             )
             LOGGER.info(f"Timed out moderator {payload.chatter.name} for using the keyword '{ban_keyword}'")
 
-    async def check_for_vip_keyword(self, payload: twitchio.ChatMessage) -> None:
-        if self.minigame_db.get_vip_game_status() or payload.chatter.vip:
+    async def check_for_vip_keyword(self, channel: ChannelState, payload: twitchio.ChatMessage, vip_keyword: str | None) -> None:
+        if payload.chatter.vip:
             return
-        vip_keyword = self.minigame_db.get_vip_keyword()
-        if vip_keyword and vip_keyword in payload.text.lower():
-            await payload.broadcaster.add_vip(
-                user=payload.chatter.id
-            )
-            await payload.broadcaster.send_message(
-                sender=self.bot.bot_id,
-                message=f"{payload.chatter.mention} just found the VIP word: {vip_keyword}!",
-            )
-            self.user_db.update_user_data(payload.chatter.id, {"mod": True})
-            self.minigame_db.update_mod_game_status(True)
+        # Scanned when the message arrived, so someone may have found it since
+        if vip_keyword and vip_keyword not in channel.minigame_db.get_found_vip_keywords():
+            self.moderation.add_vip(payload.broadcaster, payload.chatter.id)
+            self.chat.send(payload.broadcaster, f"{payload.chatter.mention} just found the VIP word: {vip_keyword}!", ChatPriority.MODERATION)
+            await channel.user_db.update_user_data(payload.chatter.id, {"mod": True})
+            channel.minigame_db.mark_vip_keyword_found(vip_keyword)
     
-    async def check_for_mod_status(self, payload: twitchio.ChatMessage, user: dict[str, str]) -> None:
+    async def check_for_mod_status(self, channel: ChannelState, payload: twitchio.ChatMessage, user: dict[str, str]) -> None:
         if user['persistent_mod'] and not payload.chatter.moderator: 
             LOGGER.info(f"Granting mod status to {payload.chatter.name}")
-            await payload.broadcaster.add_moderator(
-                user=payload.chatter.id
-            )
-            self.user_db.update_user_data(payload.chatter.id, {"mod": True})
+            self.moderation.add_moderator(payload.broadcaster, payload.chatter.id, Priority.BROADCASTER)
+            await channel.user_db.update_user_data(payload.chatter.id, {"mod": True})
 
-    async def cull_user(self, payload: twitchio.ChatMessage, user) -> None:
-        if not self.minigame_db.get_culling_mode():
+    async def cull_user(self, channel: ChannelState, payload: twitchio.ChatMessage, user) -> None:
+        if not channel.minigame_db.get_culling_mode():
             return
         if not payload.chatter.moderator or payload.chatter.broadcaster:
             return
-        if self.user_db.is_persistent_mod(user.get("id")):
+        if await channel.user_db.is_persistent_mod(user.get("id")):
             return
-        await payload.broadcaster.timeout_user(
-            moderator=OWNER_ID, 
-            user=payload.chatter.id, 
-            duration=self.minigame_db.get_timeout_duration(), 
+        self.moderation.timeout_user(
+            payload.broadcaster,
+            payload.chatter.id,
+            moderator=channel.broadcaster_id,
+            duration=channel.minigame_db.get_timeout_duration(),
             reason="It's just business... nothing personal"
         )
 
-    async def send_auto_response(self, payload: twitchio.ChatMessage, user: dict[str, str]) -> None:
-        try:
-            if (responses:=user.get("auto_responses")):
-                last_msg_dt = datetime.fromtimestamp(user.get("last_message_ts"))
-                if datetime.now() - last_msg_dt < timedelta(minutes=10):
-                    return
-                random_message = random.choice(responses)
-                await payload.broadcaster.send_message(
-                    sender=self.bot.bot_id,
-                    message=f"{payload.chatter.mention} {random_message}",
-                )
-        finally:
-            user['last_message_ts'] = self.user_db.get_current_timestamp()
-            self.user_db.update_user_data(payload.chatter.id, user)
+    async def send_auto_response(self, channel: ChannelState, payload: twitchio.ChatMessage) -> None:
+        response = channel.auto_responses.on_message(payload.chatter.id)
+        if response is not None:
+            self.chat.send(payload.broadcaster, f"{payload.chatter.mention} {response}", ChatPriority.GAME)
     
 
     # Message events
     @commands.Component.listener()
     async def event_message(self, payload: twitchio.ChatMessage) -> None:
-        # display all messages in the terminal
-        timestamp = datetime.now().strftime("%H:%M:%S.%f")
-        print(f"[{timestamp}] [{payload.broadcaster.name}] - {payload.chatter.name}: {payload.text}")
-        if(payload.source_broadcaster == None or payload.source_broadcaster.id == OWNER_ID): # stops bot from moderating other channels (shared chat workaround)
-            user = self.load_user_from_db(payload)
-            await self.check_for_mod_status(payload, user)
-            await self.send_auto_response(payload, user)
-            await self.cull_user(payload, user)
-            await self.check_for_vip_keyword(payload)
-            await self.check_for_ban_keyword(payload)
+        MESSAGES.inc()
+        # display messages in the terminal, sampled so a raid can't flood it
+        self.chat_echo.echo(payload.broadcaster.name, payload.chatter.name, payload.text)
+        channel = self.channels.get(payload.broadcaster.id)
+        if channel is None:
+            return
+        if(payload.source_broadcaster == None or payload.source_broadcaster.id == channel.broadcaster_id): # stops bot from moderating other channels (shared chat workaround)
+            channel.presence.add(payload.chatter.id, payload.chatter.name)
+            channel.points.seen(payload.chatter.id)
+            # One pass over the message finds both ban and VIP keywords. Messages with one are never
+            # dropped from a flooding chatter's queue, so they can't slip one past.
+            keywords = channel.minigame_db.get_keyword_matcher().scan(payload.text)
+            # Checks run in the background, in order per chatter and channel, so the next message isn't held up
+            self.pipeline.submit((channel.broadcaster_id, payload.chatter.id), (payload, keywords), droppable=not keywords)
+
+    async def process_message(self, message: tuple[twitchio.ChatMessage, dict[str, str]]) -> None:
+        payload, keywords = message
+        channel = self.channels[payload.broadcaster.id]
+        user = await self.pipeline.run_stage("load_user", self.load_user_from_db(channel, payload))
+        if user is None:
+            return
+        await self.pipeline.run_stages(
+            mod_status=self.check_for_mod_status(channel, payload, user),
+            auto_response=self.send_auto_response(channel, payload),
+            cull=self.cull_user(channel, payload, user),
+            vip_keyword=self.check_for_vip_keyword(channel, payload, keywords.get("vip")),
+            ban_keyword=self.check_for_ban_keyword(channel, payload, keywords.get("ban")),
+        )
 
 
     
@@ -146,141 +212,180 @@ class BotComponent(commands.Component):
     @commands.command(aliases=["mod", "m", "m0d"])
     @commands.is_broadcaster()
     async def grant_perm_mod_status(self, ctx: commands.Context, chatter) -> None:
+        channel = self.channels[ctx.broadcaster.id]
         if not chatter:
-            await ctx.send("Please provide a username to grant permanent mod status to.")
+            self.chat.send(ctx.broadcaster, "Please provide a username to grant permanent mod status to.")
             return
         chatter = chatter.replace("@", "").lower()
-        chatter_id = self.user_db.get_user_id_by_name(chatter)
+        chatter_id = await channel.user_db.get_user_id_by_name(chatter)
         if not chatter_id:
-            await ctx.send(f"{chatter} does not exist.")
+            self.chat.send(ctx.broadcaster, f"{chatter} does not exist.")
             return
-        self.user_db.grant_permamod(chatter_id)
-        await ctx.send(f"Granted permamod to {chatter}.")
-        try:
-            await ctx.broadcaster.remove_vip(
-                user=chatter_id
-            )
-        except twitchio.HTTPException:
-            LOGGER.info(f"{chatter} is not a VIP, skipping removal.")
-        await ctx.broadcaster.add_moderator(
-            user=chatter_id
-        )
+        await channel.user_db.grant_permamod(chatter_id)
+        self.chat.send(ctx.broadcaster, f"Granted permamod to {chatter}.", ChatPriority.MODERATION)
+        # Queued in this order, so the VIP badge is gone before mod is granted
+        self.moderation.remove_vip(ctx.broadcaster, chatter_id, Priority.BROADCASTER)
+        self.moderation.add_moderator(ctx.broadcaster, chatter_id, Priority.BROADCASTER)
         
     @commands.command(aliases=["unmod"])
     @commands.is_broadcaster()
     async def revoke_mod_status(self, ctx: commands.Context, chatter) -> None:
+        channel = self.channels[ctx.broadcaster.id]
         if not chatter:
-            await ctx.send("Please provide a username to revoke mod status from.")
+            self.chat.send(ctx.broadcaster, "Please provide a username to revoke mod status from.")
             return
         chatter = chatter.replace("@", "").lower()
-        chatter_id = self.user_db.get_user_id_by_name(chatter)
+        chatter_id = await channel.user_db.get_user_id_by_name(chatter)
         if not chatter_id:
-            await ctx.send(f"{chatter} does not exist.")
+            self.chat.send(ctx.broadcaster, f"{chatter} does not exist.")
             return
-        self.user_db.revoke_mod_status(chatter_id)
+        await channel.user_db.revoke_mod_status(chatter_id)
         if ctx.chatter.moderator:
-            await ctx.send(f"Revoking mod status from {chatter}")
-            await ctx.broadcaster.remove_moderator(
-                user=chatter_id
-            )
+            self.chat.send(ctx.broadcaster, f"Revoking mod status from {chatter}", ChatPriority.MODERATION)
+            self.moderation.remove_moderator(ctx.broadcaster, chatter_id, Priority.BROADCASTER)
+
+    @commands.command(aliases=["profile"])
+    @commands.is_broadcaster()
+    async def profile_bot(self, ctx: commands.Context, *args) -> None:
+        if is_profiling():
+            self.chat.send(ctx.broadcaster, "Already profiling, hang on!")
+            return
+        try:
+            seconds = min(max(int(args[0]), 1), 300) if args else 30
+        except ValueError:
+            self.chat.send(ctx.broadcaster, "Usage: !profile [seconds]")
+            return
+        self.chat.send(ctx.broadcaster, f"Profiling the bot for {seconds} seconds...")
+        # Run in the background so the command doesn't hold up its own measurement
+        task = asyncio.create_task(self._report_profile(ctx.broadcaster, seconds))
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+
+    async def _report_profile(self, broadcaster: twitchio.PartialUser, seconds: int) -> None:
+        result = await profile_for(seconds)
+        hot_spots = ", ".join(f"{name} {cumulative:.2f}s" for name, cumulative in result.hot_spots[:3])
+        self.chat.send(broadcaster, f"Profile saved to the log folder. Slowest bot functions: {hot_spots or 'none'}")
 
     @commands.command(aliases=["so"])
     @commands.is_moderator()
     async def shoutout(self, ctx: commands.Context, *args) -> None:
+        channel = self.channels[ctx.broadcaster.id]
         if not args:
-            await ctx.send("Please provide a username to shoutout.")
+            self.chat.send(ctx.broadcaster, "Please provide a username to shoutout.")
             return
         target = self.clean_args(ctx.args)[0]
-        target_id = self.user_db.get_user_id_by_name(target)
+        target_id = await channel.user_db.get_user_id_by_name(target)
         if not target_id:
-            await ctx.send(f"{target} does not exist.")
+            self.chat.send(ctx.broadcaster, f"{target} does not exist.")
             return
-        await ctx.send_announcement(f"{target} is an AWESOME streamer! Please give them a follow and check them out at https://twitch.tv/{target}")
+        self.chat.send(ctx.broadcaster, f"{target} is an AWESOME streamer! Please give them a follow and check them out at https://twitch.tv/{target}", announcement=True)
     
     @commands.is_elevated()
     @commands.command(aliases=["vip"])
     async def grant_vip_status(self, ctx: commands.Context, chatter) -> None:
+        channel = self.channels[ctx.broadcaster.id]
         if not chatter:
-            await ctx.send("Please provide a username to grant VIP status to.")
+            self.chat.send(ctx.broadcaster, "Please provide a username to grant VIP status to.")
             return
         chatter = chatter.replace("@", "").lower()
-        chatter_id = self.user_db.get_user_id_by_name(chatter)
+        chatter_id = await channel.user_db.get_user_id_by_name(chatter)
         if not chatter_id:
-            await ctx.send(f"{chatter} does not exist.")
+            self.chat.send(ctx.broadcaster, f"{chatter} does not exist.")
             return
-        await ctx.broadcaster.add_vip(
-            user=chatter_id
-        )
+        self.moderation.add_vip(ctx.broadcaster, chatter_id, Priority.BROADCASTER)
 
     @commands.command(aliases=["autoresponse", "ar"])
     async def set_auto_response(self, ctx: commands.Context, *args) -> None:
-        if self._has_mod_perms(ctx) is False:
+        channel = self.channels[ctx.broadcaster.id]
+        if await self._has_mod_perms(channel, ctx) is False:
             return
         if len(args) < 2:
-            await ctx.send("Format: !ar @username <response>")
+            self.chat.send(ctx.broadcaster, "Format: !ar @username <response>")
+            return
+        chatter = args[0].replace("@", "").lower()
+        chatter_id = await channel.user_db.get_user_id_by_name(chatter)
+        if not chatter_id:
+            self.chat.send(ctx.broadcaster, f"{chatter} does not exist.")
+            return
+        await channel.user_db.append_auto_response(chatter, " ".join(args[1:]))
+        channel.auto_responses.add(chatter_id, " ".join(args[1:]))
+        self.chat.send(ctx.broadcaster, f"Added auto-response for {chatter}: {' '.join(args[1:])}.")
+
+    @commands.command(aliases=["arcooldown", "arcd"])
+    async def set_auto_response_cooldown(self, ctx: commands.Context, *args) -> None:
+        channel = self.channels[ctx.broadcaster.id]
+        if await self._has_mod_perms(channel, ctx) is False:
+            return
+        if len(args) < 2 or not args[1].isdigit():
+            self.chat.send(ctx.broadcaster, "Format: !arcd @username <minutes>")
             return
         chatter = args[0].replace("@", "").lower()
-        if not self.user_db.get_user_id_by_name(chatter):
-            await ctx.send(f"{chatter} does not exist.")
+        chatter_id = await channel.user_db.get_user_id_by_name(chatter)
+        if not chatter_id:
+            self.chat.send(ctx.broadcaster, f"{chatter} does not exist.")
             return
-        self.user_db.append_auto_response(chatter, " ".join(args[1:]))
-        await ctx.send(f"Added auto-response for {chatter}: {' '.join(args[1:])}.")
+        seconds = int(args[1]) * 60
+        await channel.user_db.update_user_data(chatter_id, {"auto_response_cooldown": seconds})
+        channel.auto_responses.set_cooldown(chatter_id, seconds)
+        self.chat.send(ctx.broadcaster, f"{chatter}'s auto-responses now wait for {args[1]} quiet minutes.")
 
     # Chatter commands 
-    @commands.cooldown(rate=1, per=5, key=commands.BucketType.chatter)
+    @cooldown(rate=1, per=5, key=commands.BucketType.chatter)
     @commands.command(aliases=["brick"])
     async def brickroulette(self, ctx: commands.Context, *args) -> None:
+        channel = self.channels[ctx.broadcaster.id]
         target = ""
         _args = self.clean_args(ctx.args)
         if _args:
-            LOGGER.info(_args)
+            LOGGER.debug(f"!brick args: {_args}")
             target = " ".join(_args)
         else:
-            chatters = await self.get_current_chatters(ctx)
-            target = self._pick_random_chatter(chatters)
-            if target == self.brick_db.get_users_target(ctx.chatter.name):
-                target_id = self.user_db.get_user_id_by_name(target)
+            target = await self._pick_random_chatter(channel, ctx)
+            if target == await channel.brick_db.get_users_target(ctx.chatter.name):
+                target_id = await channel.user_db.get_user_id_by_name(target)
                 if target_id:
-                    await ctx.send(f"{ctx.chatter.name} hit their target {target}! They have been timed out!")
-                    await ctx.channel.timeout_user(
-                        moderator=OWNER_ID, 
-                        user=target_id, 
-                        duration=self.minigame_db.get_timeout_duration(), 
+                    self.chat.send(ctx.broadcaster, f"{ctx.chatter.name} hit their target {target}! They have been timed out!", ChatPriority.MODERATION)
+                    channel.points.award(ctx.chatter.id, BRICK_HIT_POINTS)
+                    channel.points.count(ctx.chatter.id, "brick_hits")
+                    self.moderation.timeout_user(
+                        ctx.broadcaster,
+                        target_id,
+                        moderator=channel.broadcaster_id,
+                        duration=channel.minigame_db.get_timeout_duration(),
                         reason="Got bricked"
-                        )
-                    await ctx.broadcaster.remove_vip(
-                        user=target_id
                     )
+                    self.moderation.remove_vip(ctx.broadcaster, target_id)
                     return
-        target_id = self.user_db.get_user_id_by_name(target)
+        target_id = await channel.user_db.get_user_id_by_name(target)
         if target_id == BOT_ID:
             LOGGER.info(f"{ctx.chatter.name} tried to brick the bot.")
-            await ctx.send(f"{ctx.chatter.name} just threw a brick at {target}!")
-            await ctx.broadcaster.timeout_user(
-                moderator=OWNER_ID,
-                user=ctx.chatter.id,
-                duration=self.minigame_db.get_timeout_duration(),
+            self.chat.send(ctx.broadcaster, f"{ctx.chatter.name} just threw a brick at {target}!", ChatPriority.GAME)
+            self.moderation.timeout_user(
+                ctx.broadcaster,
+                ctx.chatter.id,
+                moderator=channel.broadcaster_id,
+                duration=channel.minigame_db.get_timeout_duration(),
                 reason="Tried to brick the bot"
             )
             return
 
         if ctx.broadcaster.name in target.lower():
-            await ctx.send(f"{ctx.chatter.name} just threw a brick at {ctx.broadcaster.name}!")
-            await ctx.channel.timeout_user(
-                moderator=OWNER_ID, 
-                user=ctx.chatter.id, 
-                duration=self.minigame_db.get_timeout_duration(), 
+            self.chat.send(ctx.broadcaster, f"{ctx.chatter.name} just threw a brick at {ctx.broadcaster.name}!", ChatPriority.GAME)
+            self.moderation.timeout_user(
+                ctx.broadcaster,
+                ctx.chatter.id,
+                moderator=channel.broadcaster_id,
+                duration=channel.minigame_db.get_timeout_duration(),
                 reason="Got bricked"
-                )
-            await ctx.broadcaster.remove_vip(
-                user=ctx.chatter.id
             )
+            self.moderation.remove_vip(ctx.broadcaster, ctx.chatter.id)
             return
-        await ctx.send(self.throw_brick_at_user(ctx.chatter.name, target))
+        self.chat.send(ctx.broadcaster, self.throw_brick_at_user(ctx.chatter.name, target), ChatPriority.GAME)
 
-    @commands.cooldown(rate=1, per=5, key=commands.BucketType.chatter)
+    @cooldown(rate=1, per=5, key=commands.BucketType.chatter)
     @commands.command(aliases=["target"])
     async def brick_target(self, ctx: commands.Context, *args) -> None:
+        channel = self.channels[ctx.broadcaster.id]
         target = ""
         chatter_name = ctx.chatter.name
         _args = self.clean_args(ctx.args)
@@ -288,63 +393,64 @@ class BotComponent(commands.Component):
             target = _args[0]
         # Set the target for the user...
         if not target:
-            await ctx.send(f"{chatter_name} current target : {self.brick_db.get_users_target(chatter_name)}. To change it, use !target <username>.")
+            self.chat.send(ctx.broadcaster, f"{chatter_name} current target : {await channel.brick_db.get_users_target(chatter_name)}. To change it, use !target <username>.")
             return
         target = target.replace("@", "").lower()
-        if self.user_db.get_user_id_by_name(target) == BOT_ID:
+        if await channel.user_db.get_user_id_by_name(target) == BOT_ID:
             LOGGER.info(f"{chatter_name} tried to set the bot as their target.")
-            await ctx.send("You cannot set the bot as your target.")
-            ctx.broadcaster.timeout_user(
-                moderator=OWNER_ID,
-                user=ctx.chatter.id,
-                duration=self.minigame_db.get_timeout_duration(),
+            self.chat.send(ctx.broadcaster, "You cannot set the bot as your target.")
+            self.moderation.timeout_user(
+                ctx.broadcaster,
+                ctx.chatter.id,
+                moderator=channel.broadcaster_id,
+                duration=channel.minigame_db.get_timeout_duration(),
                 reason="Tried to set the bot as their target"
             )
             return
         if target == chatter_name:
-            await ctx.send("You cannot set yourself as your target.")
+            self.chat.send(ctx.broadcaster, "You cannot set yourself as your target.")
             return
         elif target == ctx.broadcaster.name:
-            await ctx.send("You cannot set the streamer as your target.")
+            self.chat.send(ctx.broadcaster, "You cannot set the streamer as your target.")
             return
-        self.brick_db.set_users_target(chatter_name, target)
-        await ctx.send(f"Set {target} as your target. !brick them to time them out!")
+        await channel.brick_db.set_users_target(chatter_name, target)
+        self.chat.send(ctx.broadcaster, f"Set {target} as your target. !brick them to time them out!")
 
-    @commands.cooldown(rate=1, per=5, key=commands.BucketType.chatter)
+    @cooldown(rate=1, per=5, key=commands.BucketType.chatter)
     @commands.command(aliases=["d20"])
     async def roll_d20(self, ctx: commands.Context) -> None:
+        channel = self.channels[ctx.broadcaster.id]
         # Roll a dice with the given number of sides...
         random_dice_roll = random.randint(1, 20)
         if random_dice_roll == 20:
-            if self.dice_db.is_new_player(ctx.chatter.name) and not ctx.chatter.moderator:
-                await ctx.send(f"{ctx.chatter.mention} just got super lucky and rolled a 20 in their first attempt today! You are now a vip!")
-                await ctx.broadcaster.add_vip(
-                    user=ctx.chatter.id
-                )
+            channel.points.award(ctx.chatter.id, NATURAL_20_POINTS)
+            channel.points.count(ctx.chatter.id, "d20_crits")
+            if await channel.dice_db.is_new_player(ctx.chatter.name) and not ctx.chatter.moderator:
+                self.chat.send(ctx.broadcaster, f"{ctx.chatter.mention} just got super lucky and rolled a 20 in their first attempt today! You are now a vip!", ChatPriority.MODERATION)
+                self.moderation.add_vip(ctx.broadcaster, ctx.chatter.id)
             else:
-                await ctx.send(f"{ctx.chatter.mention} rolls a natural 20!")
+                self.chat.send(ctx.broadcaster, f"{ctx.chatter.mention} rolls a natural 20!", ChatPriority.GAME)
         elif random_dice_roll == 1:
-            await ctx.send(f"{ctx.chatter.mention} rolls a 1! CRITICAL FAIL!")
-            await ctx.channel.timeout_user(
-                moderator=OWNER_ID, 
-                user=ctx.chatter.id, 
-                duration=self.minigame_db.get_timeout_duration(), 
+            self.chat.send(ctx.broadcaster, f"{ctx.chatter.mention} rolls a 1! CRITICAL FAIL!", ChatPriority.GAME)
+            self.moderation.timeout_user(
+                ctx.broadcaster,
+                ctx.chatter.id,
+                moderator=channel.broadcaster_id,
+                duration=channel.minigame_db.get_timeout_duration(),
                 reason="Rolled a 1"
             )
-            await ctx.broadcaster.remove_vip(
-                user=ctx.chatter.id
-            )
+            self.moderation.remove_vip(ctx.broadcaster, ctx.chatter.id)
         else:
-            await ctx.send(f"{ctx.chatter.mention} rolls a {random_dice_roll}!")
+            self.chat.send(ctx.broadcaster, f"{ctx.chatter.mention} rolls a {random_dice_roll}!", ChatPriority.GAME)
 
-        self.dice_db.add_player(ctx.chatter.name)
+        await channel.dice_db.add_player(ctx.chatter.name)
 
-    @commands.cooldown(rate=1, per=5, key=commands.BucketType.chatter)
+    @cooldown(rate=1, per=5, key=commands.BucketType.chatter)
     @commands.command(aliases=["roll"])
     async def roll_dice(self, ctx: commands.Context, *args) -> None:
         dice_format = r"^(\d+)?d\d+$"
         if not args[0] or not re.match(dice_format, args[0]):
-            await ctx.send("Please provide a valid dice format (e.g., 1d20, 2d6).")
+            self.chat.send(ctx.broadcaster, "Please provide a valid dice format (e.g., 1d20, 2d6).")
             return
         dice_roll = self.clean_args(ctx.args)[0]
         try:
@@ -354,39 +460,104 @@ class BotComponent(commands.Component):
             num_dice = int(num_dice)
             sides = int(sides)            
             if num_dice <= 0 or sides <= 0:
-                await ctx.send("Number of dice and sides must be positive.")
+                self.chat.send(ctx.broadcaster, "Number of dice and sides must be positive.")
                 return
             if num_dice > 100 or sides > 100:
-                await ctx.send("Too many dice or sides! Please keep it reasonable (max 100 dice, 100 sides).")
+                self.chat.send(ctx.broadcaster, "Too many dice or sides! Please keep it reasonable (max 100 dice, 100 sides).")
                 return
             rolls = [random.randint(1, sides) for _ in range(num_dice)]
             total = sum(rolls)
-            await ctx.send(f"{ctx.chatter.mention} rolled a {num_dice}d{sides}: {', '.join(map(str, rolls))} (Total: {total})")
+            self.chat.send(ctx.broadcaster, f"{ctx.chatter.mention} rolled a {num_dice}d{sides}: {', '.join(map(str, rolls))} (Total: {total})", ChatPriority.GAME)
         except ValueError as e:
             print(e)
-            await ctx.send("Invalid dice format. Please use the format <number of dice>d<sides> (e.g., 1d20, 2d6).")
+            self.chat.send(ctx.broadcaster, "Invalid dice format. Please use the format <number of dice>d<sides> (e.g., 1d20, 2d6).")
             return
     
-    @commands.cooldown(rate=1, per=60, key=commands.BucketType.channel)
+    @cooldown(rate=1, per=5, key=commands.BucketType.chatter)
+    @commands.command(aliases=["points"])
+    async def get_points(self, ctx: commands.Context) -> None:
+        channel = self.channels[ctx.broadcaster.id]
+        points = await channel.points.balance(ctx.chatter.id)
+        self.chat.send(ctx.broadcaster, f"{ctx.chatter.mention} has {points} points.", ChatPriority.GAME)
+
+    @cooldown(rate=1, per=5, key=commands.BucketType.chatter)
+    @commands.command(aliases=["give"])
+    async def give_points(self, ctx: commands.Context, *args) -> None:
+        channel = self.channels[ctx.broadcaster.id]
+        _args = self.clean_args(args)
+        if len(_args) < 2 or not _args[1].isdigit() or int(_args[1]) == 0:
+            self.chat.send(ctx.broadcaster, "Format: !give @username <points>")
+            return
+        target, amount = _args[0], int(_args[1])
+        target_id = await channel.user_db.get_user_id_by_name(target)
+        if not target_id:
+            self.chat.send(ctx.broadcaster, f"{target} does not exist.")
+            return
+        if target_id == ctx.chatter.id:
+            self.chat.send(ctx.broadcaster, "You cannot give points to yourself.")
+            return
+        if not await channel.points.give(ctx.chatter.id, target_id, amount):
+            self.chat.send(ctx.broadcaster, f"{ctx.chatter.mention} you don't have {amount} points to give.", ChatPriority.GAME)
+            return
+        self.chat.send(ctx.broadcaster, f"{ctx.chatter.mention} gave {amount} points to {target}!", ChatPriority.GAME)
+
+    def _leaderboard_stat(self, args) -> str | None:
+        # !top/!rank take an optional board: points (default), bricks or crits
+        _args = self.clean_args(args)
+        return STAT_ALIASES.get(_args[0] if _args else "points")
+
+    @cooldown(rate=1, per=30, key=commands.BucketType.channel)
+    @commands.command(aliases=["top", "leaderboard"])
+    async def get_top(self, ctx: commands.Context, *args) -> None:
+        channel = self.channels[ctx.broadcaster.id]
+        stat = self._leaderboard_stat(args)
+        if stat is None:
+            self.chat.send(ctx.broadcaster, "Format: !top [points|bricks|crits]")
+            return
+        entries = await channel.leaderboards.top_names(stat, 5)
+        if not entries:
+            self.chat.send(ctx.broadcaster, f"Nobody has any {STAT_NAMES[stat]} yet.", ChatPriority.GAME)
+            return
+        ranking = ", ".join(f"{rank}. {name} ({score})" for rank, (name, score) in enumerate(entries, 1))
+        self.chat.send(ctx.broadcaster, f"Top {STAT_NAMES[stat]}: {ranking}", ChatPriority.GAME)
+
+    @cooldown(rate=1, per=5, key=commands.BucketType.chatter)
+    @commands.command(aliases=["rank"])
+    async def get_rank(self, ctx: commands.Context, *args) -> None:
+        channel = self.channels[ctx.broadcaster.id]
+        stat = self._leaderboard_stat(args)
+        if stat is None:
+            self.chat.send(ctx.broadcaster, "Format: !rank [points|bricks|crits]")
+            return
+        leaderboard = channel.leaderboards[stat]
+        rank = leaderboard.rank(ctx.chatter.id)
+        if rank is None:
+            self.chat.send(ctx.broadcaster, f"{ctx.chatter.mention} has no {STAT_NAMES[stat]} yet.", ChatPriority.GAME)
+            return
+        self.chat.send(ctx.broadcaster, f"{ctx.chatter.mention} is #{rank} of {len(leaderboard)} with {leaderboard.score(ctx.chatter.id)} {STAT_NAMES[stat]}.", ChatPriority.GAME)
+
+    @cooldown(rate=1, per=60, key=commands.BucketType.channel)
     @commands.command(aliases=["time", "currenttime"])
     async def get_current_time(self, ctx: commands.Context) -> None:
         current_time = datetime.now().strftime("%I:%M%p")
-        await ctx.send(f"The time is currently {current_time} for {ctx.broadcaster.name}")
+        self.chat.send(ctx.broadcaster, f"The time is currently {current_time} for {ctx.broadcaster.name}")
     
-    @commands.cooldown(rate=1, per=60, key=commands.BucketType.chatter)
+    @cooldown(rate=1, per=60, key=commands.BucketType.chatter)
     @commands.command(aliases=["help"])
     async def bonky_help(self, ctx: commands.Context) -> None:
         # Display a list of commands...
-        await ctx.send(
-            f"Viewer commands: !brick, !d20, !help. Broadcaster commands: !mod/!m/!m0d, !unmod/!um/!unm0d, !permamod/!pm/!permam0d. Please message @bonksolid on discord to report bugs or request features."
+        self.chat.send(
+            ctx.broadcaster,
+            f"Viewer commands: !brick, !d20, !points, !give, !top, !rank, !help. Broadcaster commands: !mod/!m/!m0d, !unmod/!um/!unm0d, !permamod/!pm/!permam0d. Please message @bonksolid on discord to report bugs or request features."
         )
 
-    @commands.cooldown(rate=1, per=60, key=commands.BucketType.chatter)
+    @cooldown(rate=1, per=60, key=commands.BucketType.chatter)
     @commands.command(aliases=["commands"])
     async def bonky_commands(self, ctx: commands.Context) -> None:
         # Display a list of commands...
-        await ctx.send(
-            f"!brick - randomly bricks a random chatter, but times you out if you hit the streamer. !brick <username> - bricks the specified user. !d20 - rolls a d20 and times you out if you roll a 1."
+        self.chat.send(
+            ctx.broadcaster,
+            f"!brick - randomly bricks a random chatter, but times you out if you hit the streamer. !brick <username> - bricks the specified user. !d20 - rolls a d20 and times you out if you roll a 1. !points - shows your points, earned by chatting and minigames. !give <username> <points> - gives some of your points away."
         )
 
     @commands.Component.listener()
@@ -395,39 +566,32 @@ class BotComponent(commands.Component):
 
         # Keep in mind we are assuming this is for ourselves
         # others may not want your bot randomly sending messages...
-        await payload.broadcaster.send_message(
-            sender=self.bot.bot_id,
-            message=f"{payload.broadcaster} has gone live!",
-        )
+        self.chat.send(payload.broadcaster, f"{payload.broadcaster} has gone live!", ChatPriority.EVENT)
 
     @commands.Component.listener("follow")
     async def event_new_follower(self, payload: twitchio.ChannelFollow) -> None:
 
         # Event dispatched when a user follows the channel from the subscription we made above...
 
-        await payload.broadcaster.send_message(
-            sender=self.bot.bot_id,
-            message=f"Thanks for the follow {payload.user.name}!",
-        )
+        self.follows.add(payload.broadcaster, payload.user.name)
 
     @commands.Component.listener("subscription")
     async def event_new_subscription(self, payload: twitchio.ChannelSubscribe) -> None:
 
         # Event dispatched when a user subscribes to the channel from the subscription we made above...
 
-        await payload.broadcaster.send_message(
-            sender=self.bot.bot_id,
-            message=f"Thanks for subscribing {payload.user.name}!",
-        )
+        self.subscriptions.add(payload.broadcaster, payload.user.name)
 
     @commands.Component.listener("ad_break")
     async def event_ad_break(self, payload: twitchio.ChannelAdBreakBegin) -> None:
 
         # Event dispatched when an ad break begins from the subscription we made above...
 
-        await payload.broadcaster.send_announcement(
-            sender=self.bot.bot_id,
-            message=f"An ad break has started to help keep the channel going, we promise to be back shortly! Stay tuned for more content from {payload.broadcaster.name}! Please consider using twitch.tv/subs/{payload.broadcaster.name} you can skip ads and continue supporting the channel!",
+        self.chat.send(
+            payload.broadcaster,
+            f"An ad break has started to help keep the channel going, we promise to be back shortly! Stay tuned for more content from {payload.broadcaster.name}! Please consider using twitch.tv/subs/{payload.broadcaster.name} you can skip ads and continue supporting the channel!",
+            ChatPriority.EVENT,
+            announcement=True,
         )
     
 # if __name__ == "__main__":
@@ -1,16 +1,23 @@
+import asyncio
 import asqlite
 import sqlite3
 import twitchio
 from twitchio.ext import commands
 from twitchio import eventsub
+from twitchio.eventsub.websockets import Websocket
 import logging
-from config import CLIENT_ID, CLIENT_SECRET, BOT_ID, OWNER_ID
+from config import CLIENT_ID, CLIENT_SECRET, BOT_ID, OWNER_ID, CHANNEL_IDS
+from metrics import MetricsAdapter, track_helix_requests
 
 LOGGER: logging.Logger = logging.getLogger("BotLaunch")
 
+MAX_WEBSOCKETS = 3 # EventSub websockets Twitch allows per user token, each holding up to 300 subscriptions
+SUBSCRIBE_RETRIES = 6 # Backing off 1, 2, 4... seconds covers a full minute of the Helix rate limit
+
 class Bot(commands.Bot):
-    def __init__(self, *, token_database: asqlite.Pool, bot_component=None, configured: bool = True) -> None:
+    def __init__(self, *, token_database: asqlite.Pool, bot_component=None, configured: bool = True, minigame_db=None) -> None:
         self.bot_component = bot_component
+        self.minigame_db = minigame_db # shared with the GUI when launched from BonkyBotApp
         self.token_database = token_database
         self.configured = configured
         super().__init__(
@@ -19,7 +26,9 @@ class Bot(commands.Bot):
             bot_id=BOT_ID,
             owner_id=OWNER_ID,
             prefix="!",
+            adapter=MetricsAdapter(), # serves /metrics next to the OAuth routes
         )
+        track_helix_requests(self._http)
 
     async def setup_hook(self) -> None:
         if not self.configured:
@@ -27,25 +36,47 @@ class Bot(commands.Bot):
         # Add our component which contains our commands...
         await self.add_component(self.bot_component(self))
 
-        # Subscribe to read chat (event_message) from our channel as the bot...
+        for broadcaster_id in CHANNEL_IDS:
+            try:
+                await self.subscribe_channel(broadcaster_id)
+            except Exception as e:
+                if broadcaster_id == OWNER_ID:
+                    raise
+                # One broadcaster's subscriptions failing shouldn't keep the others offline
+                LOGGER.error("Failed to subscribe to channel %s: %s", broadcaster_id, e)
+        sockets = self._websockets.get(BOT_ID, {})
+        LOGGER.info("Subscribed to %d channels over %d EventSub websockets", len(CHANNEL_IDS), len(sockets))
+
+    async def subscribe_channel(self, broadcaster_id: str) -> None:
+        # Subscribe to read chat (event_message) from the channel as the bot...
         # This creates and opens a websocket to Twitch EventSub...
-        subscription = eventsub.ChatMessageSubscription(broadcaster_user_id=OWNER_ID, user_id=BOT_ID)
-        await self.subscribe_websocket(payload=subscription)
-
-        # Subscribe and listen to when a stream goes live..
-        # For this example listen to our own stream...
-        subscription = eventsub.StreamOnlineSubscription(broadcaster_user_id=OWNER_ID)
-        await self.subscribe_websocket(payload=subscription)
-
-        subscription = eventsub.AdBreakBeginSubscription(broadcaster_user_id=OWNER_ID)
-        await self.subscribe_websocket(payload=subscription)
-
-        subscription = eventsub.ChannelSubscribeSubscription(broadcaster_user_id=OWNER_ID)
-        await self.subscribe_websocket(payload=subscription)
-
-        subscription = eventsub.ChannelFollowSubscription(broadcaster_user_id=OWNER_ID, moderator_user_id=BOT_ID)
-        await self.subscribe_websocket(payload=subscription)
-
+        await self._subscribe(eventsub.ChatMessageSubscription(broadcaster_user_id=broadcaster_id, user_id=BOT_ID))
+
+        # Subscribe and listen to when the stream goes live..
+        await self._subscribe(eventsub.StreamOnlineSubscription(broadcaster_user_id=broadcaster_id))
+        await self._subscribe(eventsub.AdBreakBeginSubscription(broadcaster_user_id=broadcaster_id))
+        await self._subscribe(eventsub.ChannelSubscribeSubscription(broadcaster_user_id=broadcaster_id))
+        await self._subscribe(eventsub.ChannelFollowSubscription(broadcaster_user_id=broadcaster_id, moderator_user_id=BOT_ID))
+
+    async def _subscribe(self, payload: eventsub.SubscriptionPayload) -> None:
+        # Every channel's subscriptions share the bot's websockets. twitchio fills the least busy
+        # one but won't open a second, so do that here once they're all full.
+        sockets = self._websockets.get(BOT_ID, {})
+        if sockets and not any(socket.can_subscribe for socket in sockets.values()):
+            if len(sockets) >= MAX_WEBSOCKETS:
+                raise ValueError(f"All {MAX_WEBSOCKETS} EventSub websockets are full")
+            websocket = Websocket(client=self, token_for=BOT_ID, http=self._http)
+            await websocket.connect(fail_once=True)
+            sockets[websocket.session_id] = websocket
+        # Subscribing many channels at startup can run into the Helix rate limit, so back off and retry
+        for attempt in range(SUBSCRIBE_RETRIES + 1):
+            try:
+                await self.subscribe_websocket(payload=payload)
+                return
+            except twitchio.HTTPException as e:
+                if e.status != 429 or attempt == SUBSCRIBE_RETRIES:
+                    raise
+                await asyncio.sleep(2 ** attempt)
 
     async def add_token(self, token: str, refresh: str) -> twitchio.authentication.ValidateTokenPayload:
         # Make sure to call super() as it will add the tokens interally and return us some data...
@@ -83,4 +114,11 @@ class Bot(commands.Bot):
             await connection.execute(create_token_table)
 
     async def event_ready(self) -> None:
-        LOGGER.info("Successfully logged in as: %s", self.bot_id)
\ No newline at end of file
+        LOGGER.info("Successfully logged in as: %s", self.bot_id)
+
+    async def event_command_error(self, payload: commands.CommandErrorPayload) -> None:
+        # Spamming a command during a raid shouldn't fill the log with tracebacks
+        if isinstance(payload.exception, commands.CommandOnCooldown):
+            LOGGER.debug("%s: %s", payload.context.chatter.name, payload.exception)
+            return
+        await super().event_command_error(payload)
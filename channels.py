@@ -0,0 +1,107 @@
+import asyncio
+import os
+
+import asqlite
+import twitchio
+
+from config import OWNER_ID, STORAGE_BACKEND, AUTO_RESPONSE_COOLDOWN_MINUTES, POINTS_PER_TICK, POINTS_TICK_MINUTES, channel_db_path
+from db import AsyncDatabase, UserDatabase, BrickGameDatabase, DiceGameDatabase, MiniGameDatabase
+from sqlitedb import SQLiteUserDatabase, SQLiteBrickGameDatabase, SQLiteDiceGameDatabase, SQLiteMiniGameDatabase
+from presence import ChatterPresence
+from autoresponses import AutoResponder
+from points import PointsLedger
+from leaderboard import Leaderboards
+from resolver import UserIdResolver
+
+import logging
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+class ChannelState:
+    """
+    Everything BonkyBot keeps for one channel: its user, brick, dice and
+    minigame databases, keyword matcher, auto-responses, points,
+    leaderboards and who is in its chat.
+
+    The owner's channel keeps the files directly under db (and the tokens'
+    bonkybot.db), so existing installs carry on as before. Other channels
+    each get their own folder, db/channels/<broadcaster id>, and with the
+    SQLite backend their own small bonkybot.db.
+    """
+
+    def __init__(self, broadcaster_id: str, resolver: UserIdResolver, pool: asqlite.Pool | None = None, minigame_db: MiniGameDatabase | None = None, owns_pool: bool = False):
+        self.broadcaster_id = broadcaster_id
+        self.db_path = channel_db_path(broadcaster_id)
+        os.makedirs(self.db_path, exist_ok=True)
+        self._pool = pool if owns_pool else None
+        self.sqlite_minigame_db = None
+        # Channels share one resolver (and its Helix session), since user IDs are the same everywhere
+        if pool is not None:
+            self.user_db = SQLiteUserDatabase(pool, self._json_path("users.json"), resolver)
+            self.brick_db = SQLiteBrickGameDatabase(pool, self._json_path("bricks.json"))
+            self.dice_db = SQLiteDiceGameDatabase(pool, self._json_path("dice.json"))
+            self.sqlite_minigame_db = SQLiteMiniGameDatabase(pool, self._json_path("minigames.json"))
+        else:
+            # Load database files into memory
+            self.user_db = AsyncDatabase(UserDatabase(self._json_path("users.json"), resolver))
+            self.brick_db = AsyncDatabase(BrickGameDatabase(self._json_path("bricks.json")))
+            self.dice_db = AsyncDatabase(DiceGameDatabase(self._json_path("dice.json")))
+        # Minigame settings live in memory, shared with the GUI for the owner's channel
+        self.minigame_db = minigame_db if minigame_db is not None else MiniGameDatabase(self._json_path("minigames.json"))
+        self.presence = ChatterPresence()
+        self.auto_responses = AutoResponder(self.user_db, AUTO_RESPONSE_COOLDOWN_MINUTES * 60)
+        self.leaderboards = Leaderboards(self.user_db)
+        self.points = PointsLedger(self.user_db, self.leaderboards, POINTS_PER_TICK, POINTS_TICK_MINUTES * 60)
+        self._background_tasks: set[asyncio.Task] = set()
+
+    def _json_path(self, filename: str) -> str:
+        return os.path.join(self.db_path, filename)
+
+    async def setup(self) -> None:
+        await self.user_db.setup()
+        await self.auto_responses.setup()
+        await self.leaderboards.setup()
+        await self.brick_db.setup()
+        await self.dice_db.setup()
+        if self.sqlite_minigame_db is not None:
+            await self.sqlite_minigame_db.setup()
+            self.minigame_db.subscribe(self._mirror_minigame_settings)
+            await self.sqlite_minigame_db.replace_data(self.minigame_db.load_data())
+
+    def start(self, broadcaster: twitchio.PartialUser) -> None:
+        self.presence.start(broadcaster, self.broadcaster_id)
+        self.auto_responses.start()
+        self.points.start()
+
+    async def close(self) -> None:
+        self.minigame_db.unsubscribe(self._mirror_minigame_settings)
+        self.presence.stop()
+        await self.auto_responses.stop()
+        await self.points.stop()
+        if self._pool is not None:
+            await self._pool.close()
+
+    def _mirror_minigame_settings(self, data: dict) -> None:
+        # Keep bonkybot.db in step with the in-memory settings without blocking the caller
+        task = asyncio.create_task(self.sqlite_minigame_db.replace_data(data))
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+
+
+async def open_channel(broadcaster_id: str, resolver: UserIdResolver, token_database: asqlite.Pool, minigame_db: MiniGameDatabase | None = None) -> ChannelState:
+    """Create and set up a channel's state on the configured storage backend."""
+    pool = None
+    owns_pool = False
+    if STORAGE_BACKEND == "sqlite":
+        if broadcaster_id == OWNER_ID:
+            pool = token_database
+        else:
+            os.makedirs(channel_db_path(broadcaster_id), exist_ok=True)
+            # Each pool connection has its own thread, and one channel's queries rarely overlap
+            pool = await asqlite.create_pool(os.path.join(channel_db_path(broadcaster_id), "bonkybot.db"), size=2)
+            owns_pool = True
+    channel = ChannelState(broadcaster_id, resolver, pool, minigame_db, owns_pool)
+    await channel.setup()
+    logger.info(f"Opened channel {broadcaster_id} from {channel.db_path}")
+    return channel
@@ -3,7 +3,15 @@ import configparser
 
 config = configparser.ConfigParser()
 
-PROGRAM_DATA_DIR = os.path.join(os.environ["PROGRAMDATA"], "BonkyBot")
+def _data_dir() -> str:
+    # BONKYBOT_DATA_DIR (set by headless.py --data-dir) wins, then %PROGRAMDATA% on Windows, then the XDG data dir
+    if os.environ.get("BONKYBOT_DATA_DIR"):
+        return os.path.abspath(os.environ["BONKYBOT_DATA_DIR"])
+    if os.environ.get("PROGRAMDATA"):
+        return os.path.join(os.environ["PROGRAMDATA"], "BonkyBot")
+    return os.path.join(os.environ.get("XDG_DATA_HOME") or os.path.expanduser("~/.local/share"), "bonkybot")
+
+PROGRAM_DATA_DIR = _data_dir()
 CONFIG_PATH = os.path.join(PROGRAM_DATA_DIR, "config.ini")
 LOG_PATH = os.path.join(PROGRAM_DATA_DIR, "logs")
 JSON_DB_PATH = os.path.join(PROGRAM_DATA_DIR, "db")
@@ -37,6 +45,7 @@ if not config.has_section("Twitch"):
     config.set("Twitch", "CLIENT_SECRET", "")  
     config.set("Twitch", "BOT_ID", "") 
     config.set("Twitch", "OWNER_ID", "") 
+    os.makedirs(PROGRAM_DATA_DIR, exist_ok=True)
     with open(CONFIG_PATH, "w") as configfile:
         config.write(configfile)
 
@@ -44,10 +53,40 @@ CLIENT_ID: str = config.get("Twitch", "CLIENT_ID") # The CLIENT ID from the Twit
 CLIENT_SECRET: str = config.get("Twitch", "CLIENT_SECRET") # The CLIENT SECRET from the Twitch Dev Console
 BOT_ID = config.get("Twitch", "BOT_ID")  # The Account ID of the bot user...
 OWNER_ID = config.get("Twitch", "OWNER_ID")  # Your personal User ID..
+# Other broadcasters' User IDs, comma separated, to run in the same bot alongside OWNER_ID
+_extra_channels = [channel.strip() for channel in config.get("Twitch", "CHANNEL_IDS", fallback="").split(",")]
+CHANNEL_IDS: list[str] = list(dict.fromkeys([OWNER_ID, *filter(None, _extra_channels)]))
+
+STORAGE_BACKEND: str = config.get("Storage", "BACKEND", fallback="json").lower() # "json" or "sqlite" (bonkybot.db)
+WRITE_BEHIND: bool = config.getboolean("Storage", "WRITE_BEHIND", fallback=True) # Keep brick and minigame data in memory and flush it in the background
+FLUSH_INTERVAL_MS: int = config.getint("Storage", "FLUSH_INTERVAL_MS", fallback=1000) # Longest time pending changes wait before being written
+FLUSH_MAX_CHANGES: int = config.getint("Storage", "FLUSH_MAX_CHANGES", fallback=200) # Flush early once this many changes are pending
+JOURNAL: bool = config.getboolean("Storage", "JOURNAL", fallback=False) # Append changes to a journal instead of rewriting the whole file
+JOURNAL_MAX_BYTES: int = config.getint("Storage", "JOURNAL_MAX_BYTES", fallback=4 * 1024 * 1024) # Fold the journal into the snapshot past this size
+
+CHAT_MESSAGE_LIMIT: int = config.getint("Chat", "MESSAGE_LIMIT", fallback=100) # Messages the bot may send per channel per 30 seconds (20 if it isn't a moderator)
+THANKS_WINDOW_MS: int = config.getint("Chat", "THANKS_WINDOW_MS", fallback=5000) # Follows/subs arriving this close together are thanked in one message
+AUTO_RESPONSE_COOLDOWN_MINUTES: float = config.getfloat("Chat", "AUTO_RESPONSE_COOLDOWN_MINUTES", fallback=10) # How long a chatter must be quiet before their auto-response is sent again
+
+COOLDOWN_STORE: str = config.get("Commands", "COOLDOWN_STORE", fallback="sqlite").lower() # "sqlite" keeps command cooldowns in bonkybot.db across restarts, "memory" doesn't
+DICE_DAY_START: str = config.get("Games", "DICE_DAY_START", fallback="00:00") # Local time (HH:MM) when !d20's first roll of the day starts over
+POINTS_PER_TICK: int = config.getint("Games", "POINTS_PER_TICK", fallback=10) # Points every chatter earns per tick they chatted in
+POINTS_TICK_MINUTES: float = config.getfloat("Games", "POINTS_TICK_MINUTES", fallback=5) # How often points are credited
+BRICK_HIT_POINTS: int = config.getint("Games", "BRICK_HIT_POINTS", fallback=50) # Bonus for hitting your !target with !brick
+NATURAL_20_POINTS: int = config.getint("Games", "NATURAL_20_POINTS", fallback=20) # Bonus for rolling a 20 with !d20
+
+LOG_LEVEL: str = config.get("Logging", "LEVEL", fallback="INFO").upper() # DEBUG also logs every Helix request and !brick target
+CHAT_ECHO_PER_SECOND: float = config.getfloat("Logging", "CHAT_ECHO_PER_SECOND", fallback=20) # Chat lines echoed to the console per second, 0 turns the echo off
 
 USERS_DB = os.path.join(JSON_DB_PATH, "users.json")
 BRICK_DB = os.path.join(JSON_DB_PATH, "bricks.json")
 DICE_DB = os.path.join(JSON_DB_PATH, "dice.json")
 MINIGAME_DB = os.path.join(JSON_DB_PATH, "minigames.json")
 
+def channel_db_path(broadcaster_id: str) -> str:
+    # OWNER_ID keeps the original files in db, other channels each get db/channels/<id>
+    if broadcaster_id == OWNER_ID:
+        return JSON_DB_PATH
+    return os.path.join(JSON_DB_PATH, "channels", broadcaster_id)
+
 setup()
\ No newline at end of file
@@ -0,0 +1,132 @@
+import time
+
+import asqlite
+from twitchio.ext import commands
+
+from metrics import COOLDOWN_REJECTIONS
+
+import logging
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# How often expired rows are cleared out of bonkybot.db
+PURGE_INTERVAL = 600
+
+class CooldownEngine:
+    """
+    Command cooldowns using GCRA (the generic cell rate algorithm): each
+    bucket is a single number, the time at which it will be full again,
+    under a short "command:scope" key.
+
+    Buckets are grouped by their `per`, so within a group the oldest use
+    is also the first to refill. Refilled buckets are dropped lazily from
+    the front of the group, a couple per use, so a raid of one-off
+    chatters doesn't leave them all in memory.
+
+    With a pool, every use is also checked and recorded in the cooldowns
+    table in one statement, before the command runs. Restarting or
+    crashing the bot doesn't reset anyone's cooldown, and bot instances
+    sharing bonkybot.db share their cooldowns. Uses that are already on
+    cooldown in memory are turned away without touching the database.
+    """
+    SCHEMA = "CREATE TABLE IF NOT EXISTS cooldowns(key TEXT PRIMARY KEY, tat REAL NOT NULL)"
+
+    def __init__(self, pool: asqlite.Pool | None = None):
+        self._pool = pool
+        self._buckets: dict[float, dict[str, float]] = {} # per -> key -> when the bucket is full again, oldest use first
+        self._loaded: dict[str, float] = {} # buckets read back from bonkybot.db, soonest full first
+        self._purged = 0.0
+
+    async def setup(self) -> None:
+        if self._pool is None:
+            return
+        now = time.time()
+        async with self._pool.acquire() as connection:
+            await connection.execute(self.SCHEMA)
+            await connection.execute("DELETE FROM cooldowns WHERE tat <= ?", (now,))
+            rows = await connection.fetchall("SELECT key, tat FROM cooldowns ORDER BY tat")
+        self._purged = now
+        self._loaded = {row["key"]: row["tat"] for row in rows}
+        logger.info(f"Loaded {len(self._loaded)} active cooldowns")
+
+    def __len__(self) -> int:
+        return len(self._loaded) + sum(len(buckets) for buckets in self._buckets.values())
+
+    def _store(self, buckets: dict[str, float], key: str, tat: float) -> None:
+        # Re-inserted so the group stays ordered by last use
+        self._loaded.pop(key, None)
+        buckets.pop(key, None)
+        buckets[key] = tat
+
+    def _expire(self, buckets: dict[str, float], now: float) -> None:
+        for _ in range(2):
+            key = next(iter(buckets), None)
+            if key is None or buckets[key] > now:
+                return
+            del buckets[key]
+
+    async def hit(self, key: str, rate: int, per: float) -> float | None:
+        """
+        Use one of key's `rate` uses per `per` seconds. Returns None if
+        that's allowed, otherwise the seconds until it will be.
+        """
+        now = time.time()
+        buckets = self._buckets.setdefault(per, {})
+        self._expire(buckets, now)
+        self._expire(self._loaded, now)
+        interval = per / rate
+        # How far ahead of now the bucket may be and still allow a use
+        limit = per - interval
+        tat = max(buckets.get(key) or self._loaded.get(key) or now, now)
+        if tat - now > limit:
+            return tat - now - limit
+        if self._pool is None:
+            self._store(buckets, key, tat + interval)
+            return None
+
+        query = """
+        INSERT INTO cooldowns (key, tat)
+        VALUES (:key, :now + :interval)
+        ON CONFLICT(key)
+        DO UPDATE SET tat = max(tat, :now) + :interval
+        WHERE max(tat, :now) - :now <= :limit
+        RETURNING tat;
+        """
+        params = {"key": key, "now": now, "interval": interval, "limit": limit}
+        async with self._pool.acquire() as connection:
+            row = await connection.fetchone(query, params)
+            allowed = row is not None
+            if not allowed:
+                # Another bot instance used it first
+                row = await connection.fetchone("SELECT tat FROM cooldowns WHERE key = ?", (key,))
+            if now - self._purged > PURGE_INTERVAL:
+                self._purged = now
+                await connection.execute("DELETE FROM cooldowns WHERE tat <= ?", (now,))
+        self._store(buckets, key, row["tat"])
+        return None if allowed else row["tat"] - now - limit
+
+
+def _scope(ctx: commands.Context, key: commands.BucketType) -> str:
+    if key is commands.BucketType.chatter:
+        return f"{ctx.broadcaster.id}:{ctx.chatter.id}"
+    if key is commands.BucketType.channel:
+        return ctx.broadcaster.id
+    if key is commands.BucketType.user:
+        return ctx.chatter.id
+    return ""
+
+def cooldown(rate: int, per: float, key: commands.BucketType = commands.BucketType.chatter):
+    """
+    Like commands.cooldown, but the buckets live in the component's
+    CooldownEngine (self.cooldowns). Raises commands.CommandOnCooldown
+    the same way.
+    """
+    async def predicate(ctx: commands.Context) -> bool:
+        name = ctx.command.name
+        retry = await ctx.component.cooldowns.hit(f"{name}:{_scope(ctx, key)}", rate, per)
+        if retry is not None:
+            COOLDOWN_REJECTIONS.inc(command=name)
+            raise commands.CommandOnCooldown(f'The command "{name}" is on cooldown. Try again in {retry:.1f} seconds.', cooldown=None, remaining=retry)
+        return True
+    return commands.guard(predicate)
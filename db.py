@@ -1,14 +1,87 @@
+import atexit
+import copy
+import inspect
 import json
 import os
-from config import USERS_DB, BRICK_DB, DICE_DB, MINIGAME_DB, CLIENT_ID, CLIENT_SECRET
-from datetime import datetime
+import threading
+import time
+import weakref
+from config import USERS_DB, BRICK_DB, DICE_DB, MINIGAME_DB, CLIENT_ID, CLIENT_SECRET, WRITE_BEHIND, FLUSH_INTERVAL_MS, FLUSH_MAX_CHANGES, JOURNAL, JOURNAL_MAX_BYTES, DICE_DAY_START
+from datetime import datetime, timedelta
 from twitchapi import TwitchAPI
+from resolver import UserIdResolver
+from keywords import KeywordMatcher, get_matcher
+from metrics import DB_OPERATIONS
 
 import logging
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
+# Databases running in write-behind mode, so pending writes can be flushed on shutdown
+_write_behind_databases: "weakref.WeakSet[JSONDatabase]" = weakref.WeakSet()
+# One flusher thread serves every write-behind database, however many channels are open
+_flush_requested = threading.Event()
+_flusher: threading.Thread | None = None
+
+def flush_all() -> None:
+    """Flush every write-behind database that has pending changes."""
+    for database in list(_write_behind_databases):
+        database.flush()
+
+def _flush_loop() -> None:
+    while True:
+        _flush_requested.wait(FLUSH_INTERVAL_MS / 1000)
+        _flush_requested.clear()
+        for database in list(_write_behind_databases):
+            try:
+                database.flush()
+            except Exception as e:
+                logger.error(f"Failed to flush {database._filepath}: {e}")
+
+def _start_flusher() -> None:
+    global _flusher
+    if _flusher is None:
+        _flusher = threading.Thread(target=_flush_loop, name="flush-databases", daemon=True)
+        _flusher.start()
+
+atexit.register(flush_all)
+
+_DAY_START = datetime.strptime(DICE_DAY_START, "%H:%M").time()
+
+def dice_day(timestamp: float) -> tuple[int, int]:
+    """Start and end of the dice day containing timestamp, which begins at DICE_DAY_START local time."""
+    moment = datetime.fromtimestamp(timestamp)
+    start = datetime.combine(moment.date(), _DAY_START)
+    if moment < start:
+        start -= timedelta(days=1)
+    # Naive local times, so a day with a DST change is 23 or 25 hours long
+    return int(start.timestamp()), int((start + timedelta(days=1)).timestamp())
+
+class AsyncDatabase:
+    """
+    Awaitable facade over a JSON database, so callers can use the JSON and
+    SQLite backends through the same API: every method becomes a coroutine.
+    """
+
+    def __init__(self, database):
+        self._database = database
+
+    async def setup(self) -> None:
+        pass
+
+    def __getattr__(self, name):
+        attr = getattr(self._database, name)
+        if not callable(attr):
+            return attr
+
+        async def wrapper(*args, **kwargs):
+            result = attr(*args, **kwargs)
+            if inspect.isawaitable(result):
+                result = await result
+            return result
+        return wrapper
+
 class JSONDatabase:
     """
     A simple class to manage JSON data in a file.
@@ -18,26 +91,183 @@ class JSONDatabase:
         "key2": "value2",
         ...
     }
+
+    With write_behind enabled the data is kept in memory and save_data only
+    marks it dirty; a background thread shared by all databases writes the
+    file at most every FLUSH_INTERVAL_MS, or sooner once FLUSH_MAX_CHANGES
+    have piled up.
+
+    With journal enabled each change is appended to "<file>.journal" as a
+    small delta record instead, and the journal is folded back into the
+    snapshot once it grows past JOURNAL_MAX_BYTES (or the snapshot size,
+    whichever is larger). On startup the snapshot is loaded and the journal
+    replayed on top of it. Delta records are idempotent, so replaying a
+    journal that was already folded into the snapshot is harmless.
+
+    Subclasses describe their changes as deltas through record(), and
+    teach apply_delta() about any operations beyond "set" and "add".
     """
 
-    def __init__(self, filepath, default_data):
+    def __init__(self, filepath, default_data, write_behind=False, journal=False, resident=False):
         self._filepath = filepath
+        self._journal_path = f"{filepath}.journal"
+        self._write_behind = write_behind and not journal
+        self._journal = None
+        self._journal_size = 0
+        self._snapshot_size = 0
+        self._data = None
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._pending_changes = 0
         _loaded_data = self.load_data()
         if not _loaded_data:
-            self.save_data(default_data)
+            self.save_data(copy.deepcopy(default_data))
+        if resident or write_behind or journal:
+            self._data = self.load_data()
+            self._index(self._data)
+        if journal:
+            self._replay_journal()
+        elif write_behind:
+            _write_behind_databases.add(self)
+            _start_flusher()
+
+    def _index(self, data) -> None:
+        # Hook for subclasses that keep lookup indexes over the resident data
+        pass
 
 
     def load_data(self):
+        DB_OPERATIONS.inc(database=type(self).__name__, operation="load")
+        if self._data is not None:
+            return self._data
         if os.path.exists(self._filepath):
             with open(self._filepath, "r") as f:
                 return json.load(f)
 
     def save_data(self, data):
-        with open(self._filepath, "w") as f:
-            json.dump(data, f, indent=4)
+        DB_OPERATIONS.inc(database=type(self).__name__, operation="save")
+        if self._data is not None and data is not self._data:
+            self._data = data
+            self._index(data)
+        if self._journal is not None:
+            # A full replace supersedes everything in the journal
+            with self._lock:
+                self._compact()
+            return
+        if not self._write_behind:
+            self._write_file(json.dumps(data, indent=4))
+            return
+        with self._lock:
+            self._data = data
+            self._pending_changes += 1
+            if self._pending_changes >= FLUSH_MAX_CHANGES:
+                _flush_requested.set()
+
+    def flush(self) -> None:
+        with self._lock:
+            if not self._pending_changes:
+                return
+            pending_changes, self._pending_changes = self._pending_changes, 0
+            data = self._data
+        try:
+            # Serialised without indent so the C encoder is used, which can't be
+            # broken half way through by the event loop thread changing data.
+            # It holds the GIL for the whole dump though, stalling the event
+            # loop just as long, so this only suits small files; users.json
+            # is journaled instead.
+            contents = json.dumps(data)
+        except Exception:
+            with self._lock:
+                self._pending_changes += pending_changes
+            raise
+        self._write_file(contents)
+
+    def record(self, data, delta: dict) -> None:
+        """Persist a change that has already been applied to data."""
+        if self._journal is None:
+            self.save_data(data)
+            return
+        line = json.dumps(delta, separators=(",", ":")) + "\n"
+        with self._lock:
+            self._journal.write(line)
+            self._journal.flush()
+            self._journal_size += len(line)
+            if self._journal_size > max(JOURNAL_MAX_BYTES, self._snapshot_size):
+                self._compact()
+
+    def apply_delta(self, data, delta: dict) -> None:
+        path = delta["path"]
+        target = data
+        for key in path[:-1]:
+            target = target.setdefault(key, {})
+        if delta["op"] == "set":
+            target[path[-1]] = delta["value"]
+        elif delta["op"] == "add":
+            values = target.setdefault(path[-1], [])
+            if delta["value"] not in values:
+                values.append(delta["value"])
+        else:
+            raise ValueError(f"Unknown journal operation: {delta['op']}")
+
+    @classmethod
+    def read(cls, filepath) -> dict:
+        """The data in filepath with its journal replayed, without writing to or compacting either."""
+        database = cls.__new__(cls)
+        database._filepath = filepath
+        database._journal_path = f"{filepath}.journal"
+        database._data = None
+        database._data = database.load_data() or copy.deepcopy(getattr(cls, "DEFAULT_DATA", {}))
+        database._index(database._data)
+        database._apply_journal()
+        return database._data
+
+    def _apply_journal(self) -> int:
+        replayed = 0
+        if os.path.exists(self._journal_path):
+            with open(self._journal_path, "r") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    try:
+                        delta = json.loads(line)
+                    except json.JSONDecodeError:
+                        # Only the last record can be torn by a crash mid-write
+                        logger.warning(f"Skipping truncated record at the end of {self._journal_path}")
+                        break
+                    self.apply_delta(self._data, delta)
+                    replayed += 1
+        return replayed
+
+    def _replay_journal(self) -> None:
+        replayed = self._apply_journal()
+        self._journal = open(self._journal_path, "a")
+        with self._lock:
+            if replayed or self._journal.tell():
+                logger.info(f"Replayed {replayed} journal records into {self._filepath}")
+                self._compact()
+            else:
+                self._snapshot_size = os.path.getsize(self._filepath)
+
+    def _compact(self) -> None:
+        # Caller holds self._lock, so no record can slip in between the
+        # snapshot being taken and the journal being truncated.
+        contents = json.dumps(self._data)
+        self._write_file(contents)
+        self._snapshot_size = len(contents)
+        self._journal.truncate(0)
+        self._journal_size = 0
+
+    def _write_file(self, contents: str) -> None:
+        # Write to a temp file and swap it in, so a crash never leaves a half-written database
+        DB_OPERATIONS.inc(database=type(self).__name__, operation="write")
+        with self._write_lock:
+            tmp_path = f"{self._filepath}.tmp"
+            with open(tmp_path, "w") as f:
+                f.write(contents)
+            os.replace(tmp_path, self._filepath)
 
     def reset_data(self, data):
-        self.save_data(data)
+        self.save_data(copy.deepcopy(data))
     
     def get_current_timestamp(self) -> int:
         # Get the current timestamp
@@ -59,75 +289,104 @@ class UserDatabase(JSONDatabase):
             ...
         ]
     }
+
+    The user list is loaded once and kept resident, indexed by id and by
+    lowercase login name, so lookups don't scale with the number of users.
+    It is always journaled, whatever JOURNAL says: a full dump of a big user
+    list holds the GIL long enough to stall the bot, so it only happens when
+    the journal is compacted. Changes are journaled as {"op": "user", "id": ..., "fields": {...}},
+    and one field for many users at once (points, minigame stats, last-seen
+    times) as {"op": "counts", "field": "points", "totals": {id: new value}}.
     """
     DEFAULT_DATA = {
         "users": []
     }
 
-    def __init__(self):
-        super().__init__(USERS_DB, self.DEFAULT_DATA)
-        self.twitch_api = TwitchAPI(CLIENT_ID, CLIENT_SECRET)
+    def __init__(self, filepath=USERS_DB, resolver: UserIdResolver | None = None):
+        super().__init__(filepath, self.DEFAULT_DATA, journal=True, resident=True)
+        self.resolver = resolver or UserIdResolver(TwitchAPI(CLIENT_ID, CLIENT_SECRET))
+        self.twitch_api = self.resolver.twitch_api
+
+    def _index(self, data) -> None:
+        data.setdefault("users", [])
+        self._users_by_id: dict[str, dict] = {}
+        self._users_by_name: dict[str, dict] = {}
+        for user in data["users"]:
+            self._index_user(user)
+
+    def _index_user(self, user: dict) -> None:
+        self._users_by_id[user["id"]] = user
+        if user.get("name"):
+            self._users_by_name[user["name"].lower()] = user
+
+    def _rename_user(self, user: dict, name: str) -> None:
+        old_name = (user.get("name") or "").lower()
+        if self._users_by_name.get(old_name) is user:
+            del self._users_by_name[old_name]
+        user["name"] = name
+        self._users_by_name[name.lower()] = user
+
+    def apply_delta(self, data, delta: dict) -> None:
+        if delta["op"] == "counts":
+            # Totals rather than increments, so replaying the record is harmless
+            for user_id, total in delta["totals"].items():
+                user = self._users_by_id.get(user_id)
+                if user is None:
+                    # Shaped like a new chatter's record, with the name filled in once they chat
+                    user = {"id": user_id, "name": "", "persistent_mod": False, "points": 0}
+                    data["users"].append(user)
+                    self._index_user(user)
+                user[delta["field"]] = total
+            return
+        if delta["op"] != "user":
+            return super().apply_delta(data, delta)
+        fields = {key: value for key, value in delta["fields"].items() if key != "id"}
+        user = self._users_by_id.get(delta["id"])
+        if user is None: # if user didn't exist, add it
+            user = {"id": delta["id"], **fields}
+            data["users"].append(user)
+            self._index_user(user)
+            return
+        if "name" in fields and fields["name"] != user.get("name"):
+            self._rename_user(user, fields["name"])
+        user.update(fields)
+
+    def _upsert_user(self, user_id, fields) -> dict:
+        delta = {"op": "user", "id": user_id, "fields": fields}
+        self.apply_delta(self._data, delta)
+        self.record(self._data, delta)
+        return self._users_by_id[user_id]
 
     def add_user(self, user_id, payload):
-        data = self.load_data()
-        data["users"].append({
-            "id": user_id,
-            **payload
-        })
-        self.save_data(data)
+        self._upsert_user(user_id, payload)
 
     def update_user_data(self, user_id, payload):
-        data = self.load_data()
-        for user in data["users"]:
-            if user["id"] == user_id:
-                user.update(payload)
-                self.save_data(data)
-                return
-        self.add_user(user_id, payload) # if user didn't exist, add it        
-    
+        self._upsert_user(user_id, payload)
+
     def update_current_chatter(self, payload):
-        data = self.load_data()
-        for user in data["users"]:
-            if user["id"] == payload.chatter.id:
-                user["name"] = payload.chatter.name
-                user["last_message_ts"] = self.get_current_timestamp()
-                self.save_data(data)
-                return user
-            
-        new_user = {
-            "id": payload.chatter.id,
+        if payload.chatter.id in self._users_by_id:
+            return self._upsert_user(payload.chatter.id, {
+                "name": payload.chatter.name,
+                "last_message_ts": self.get_current_timestamp()
+            })
+        return self._upsert_user(payload.chatter.id, {
             "name": payload.chatter.name,
             "persistent_mod": False,
             "points": 0
-        }
-        data["users"].append(new_user)
-        self.save_data(data)
-        return new_user
+        })
 
     def get_user(self, user_id) -> dict[str, str]|None:
-        data = self.load_data()
-        for user in data["users"]:
-            if user["id"] == user_id:
-                return user
-        return None
-    
-    def get_user_id_by_name(self, username) -> str|None:
-        data = self.load_data()
-        for user in data["users"]:
-            if user["name"] == username:
-                return user["id"]
-        try:
-            user_data = self.twitch_api.make_request("users", params={"login": username})
-            user_id = user_data["data"][0]["id"]
+        return self._users_by_id.get(user_id)
+
+    async def get_user_id_by_name(self, username) -> str|None:
+        user = self._users_by_name.get(username.lower())
+        if user is not None:
+            return user["id"]
+        user_id = await self.resolver.resolve(username)
+        if user_id:
             self.update_user_data(user_id, {"name": username})
-        except (KeyError, IndexError) as e:
-            logger.error(f"Failed to get user ID for {username}: {user_data}. Error: {e}")
-            user_id = None
-        except Exception as e:
-            logger.error(f"Error while fetching user ID for {username}: {e}")
-            user_id = None
         return user_id
-    
+
     def grant_permamod(self, user_id) -> None:
         self.update_user_data(user_id, {"mod": True, "persistent_mod": True})
 
@@ -138,22 +397,44 @@ class UserDatabase(JSONDatabase):
         self.update_user_data(user_id, {"mod": False, "persistent_mod": False})
 
     def append_auto_response(self, username, response) -> None:
-        data = self.load_data()
-        for user in data["users"]:
-            if user["name"] == username:
-                if "auto_responses" not in user:
-                    user["auto_responses"] = []
-                user["auto_responses"].append(response)
-                self.save_data(data)
-    
+        user = self._users_by_name.get(username.lower())
+        if user is None:
+            return
+        self._upsert_user(user["id"], {"auto_responses": [*user.get("auto_responses", []), response]})
+
+    def add_counts(self, field, amounts: dict[str, int]) -> None:
+        """Add to a counter such as points or brick_hits for many users, as one change."""
+        totals = {}
+        for user_id, amount in amounts.items():
+            user = self._users_by_id.get(user_id) or {}
+            totals[user_id] = user.get(field, 0) + amount
+        delta = {"op": "counts", "field": field, "totals": totals}
+        self.apply_delta(self._data, delta)
+        self.record(self._data, delta)
+
+    def get_stats(self, fields) -> dict[str, dict[str, int]]:
+        stats = {field: {} for field in fields}
+        for user in self._data["users"]:
+            for field in fields:
+                if user.get(field):
+                    stats[field][user["id"]] = user[field]
+        return stats
+
+    def get_auto_responders(self) -> dict[str, dict]:
+        return {user["id"]: user for user in self._data["users"] if user.get("auto_responses")}
+
+    def save_last_seen(self, last_seen: dict[str, int]) -> None:
+        """Set last_message_ts for many users, as one change."""
+        delta = {"op": "counts", "field": "last_message_ts", "totals": last_seen}
+        self.apply_delta(self._data, delta)
+        self.record(self._data, delta)
+
     def is_persistent_mod(self, user_id) -> bool:
-        data = self.load_data()
-        # Check if user is a supermod
-        for user in data["users"]:
-            if user["id"] == user_id:
-                return user.get("persistent_mod", False)
-        return False
-    
+        user = self._users_by_id.get(user_id)
+        if user is None:
+            return False
+        return user.get("persistent_mod", False)
+
 
 
 class BrickGameDatabase(JSONDatabase):
@@ -177,8 +458,8 @@ class BrickGameDatabase(JSONDatabase):
         "players": {}
     }
 
-    def __init__(self):
-        super().__init__(BRICK_DB, self.DEFAULT_DATA)
+    def __init__(self, filepath=BRICK_DB):
+        super().__init__(filepath, self.DEFAULT_DATA, write_behind=WRITE_BEHIND, journal=JOURNAL)
 
     def get_default_target(self):
         data = self.load_data()
@@ -186,8 +467,9 @@ class BrickGameDatabase(JSONDatabase):
     
     def set_default_target(self, target):
         data = self.load_data()
-        data["default_target"] = target
-        self.save_data(data)
+        delta = {"op": "set", "path": ["default_target"], "value": target}
+        self.apply_delta(data, delta)
+        self.record(data, delta)
     
     def get_users_target(self, username):
         data = self.load_data()
@@ -197,10 +479,9 @@ class BrickGameDatabase(JSONDatabase):
     
     def set_users_target(self, username, target):
         data = self.load_data()
-        if username not in data["players"]:
-            data["players"][username] = {}
-        data["players"][username]["target"] = target
-        self.save_data(data)
+        delta = {"op": "set", "path": ["players", username, "target"], "value": target}
+        self.apply_delta(data, delta)
+        self.record(data, delta)
     
     def is_target(self, from_user, current_target):
         # Check if input_user is the target of target_user
@@ -218,52 +499,100 @@ class DiceGameDatabase(JSONDatabase):
             "doe"
         ]
     }
+
+    timestamp is the start of the dice day players_today belongs to. The
+    list starts over at the next DICE_DAY_START, while running or on the
+    first roll after a restart, and is kept in memory as a set so checking
+    a player doesn't scale with how many have rolled. Players are always
+    journaled, so each roll appends one line rather than rewriting the list.
     """
     DEFAULT_DATA = {
         "timestamp": 0,
         "players_today": []
     }
 
-    def __init__(self):
-        super().__init__(DICE_DB, self.DEFAULT_DATA)
-        self.reset_data(self.DEFAULT_DATA)
-        self.set_timestamp()
+    def __init__(self, filepath=DICE_DB):
+        super().__init__(filepath, self.DEFAULT_DATA, journal=True)
+        self._day_ends = 0
+
+    def _index(self, data) -> None:
+        data.setdefault("players_today", [])
+        self._players = set(data["players_today"])
+
+    def apply_delta(self, data, delta: dict) -> None:
+        if delta["op"] == "day":
+            data["timestamp"] = delta["timestamp"]
+            data["players_today"] = []
+            self._players = set()
+        elif delta["op"] == "add" and delta["path"] == ["players_today"]:
+            if delta["value"] not in self._players:
+                self._players.add(delta["value"])
+                data["players_today"].append(delta["value"])
+        else:
+            super().apply_delta(data, delta)
+
+    def _roll_over(self) -> None:
+        now = time.time()
+        if now < self._day_ends:
+            return
+        start, self._day_ends = dice_day(now)
+        data = self.load_data()
+        if data["timestamp"] < start:
+            if data["players_today"]:
+                logger.info(f"New dice day, clearing {len(data['players_today'])} players from {self._filepath}")
+            delta = {"op": "day", "timestamp": start}
+            self.apply_delta(data, delta)
+            self.record(data, delta)
 
     def get_timestamp(self):
-        data = self.load_data()
-        return data["timestamp"]
-    
-    def set_timestamp(self):
-        data = self.load_data()
-        data["timestamp"] = self.get_current_timestamp()
-        self.save_data(data)
+        self._roll_over()
+        return self.load_data()["timestamp"]
 
     def is_new_player(self, username):
-        data = self.load_data()
-        username = username.lower().strip()
-        # Check if user is already in the players_today list
-        return username not in data["players_today"]
+        self._roll_over()
+        return username.lower().strip() not in self._players
     
     def add_player(self, username):
+        self._roll_over()
         username = username.lower().strip()
-        data = self.load_data()
-        # Add user to the players_today list
-        if username not in data["players_today"]:
-            data["players_today"].append(username)
-            self.save_data(data)
+        if username not in self._players:
+            delta = {"op": "add", "path": ["players_today"], "value": username}
+            self.apply_delta(self._data, delta)
+            self.record(self._data, delta)
 
 class MiniGameDatabase(JSONDatabase):
     """
     A simple class to manage mini game data in a JSON file.
     Expected data format:
+    {
+        "ban_game": {
+            "ban_keywords": ["badword", ...],
+            "timeout_duration": 5
+        },
+        "vip_game": {
+            "vip_keywords": ["secret", ...],
+            "found_keywords": ["secret"],
+            "is_found": false
+        },
+        "culling_mode": false
+    }
+    Files written before keyword lists existed hold a single "ban_keyword"
+    / "vip_keyword" string instead, which is still read.
+
+    One instance is shared by the GUI and the bot. Settings are served from
+    memory, changes are published to subscribers straight away and written
+    to disk by the write-behind flusher. Edits made to minigames.json by
+    hand are picked up by checking its mtime every few seconds.
     """
+    EXTERNAL_CHECK_INTERVAL = 2 # seconds between mtime checks
     DEFAULT_DATA = {
         "ban_game" : {
-            "ban_keyword": "",
+            "ban_keywords": [],
             "timeout_duration": 5,
         },
         "vip_game" : {
-            "vip_keyword": "",
+            "vip_keywords": [],
+            "found_keywords": [],
             "is_found": False
         },
         "mod_game" : {
@@ -273,9 +602,76 @@ class MiniGameDatabase(JSONDatabase):
         "culling_mode": False
     }
 
-    def __init__(self):
-        super().__init__(MINIGAME_DB, self.DEFAULT_DATA)
+    def __init__(self, filepath=MINIGAME_DB):
+        self._subscribers = []
+        self._matcher: KeywordMatcher | None = None
+        self._known_mtime = None
+        self._next_external_check = time.monotonic() + self.EXTERNAL_CHECK_INTERVAL
+        super().__init__(filepath, self.DEFAULT_DATA, write_behind=True)
+        self._known_mtime = self._get_mtime()
+
+    def subscribe(self, callback) -> None:
+        """Call callback(data) whenever the settings change."""
+        self._subscribers.append(callback)
+
+    def unsubscribe(self, callback) -> None:
+        if callback in self._subscribers:
+            self._subscribers.remove(callback)
+
+    def _publish(self) -> None:
+        self._matcher = None
+        for callback in list(self._subscribers):
+            try:
+                callback(self._data)
+            except Exception as e:
+                logger.error(f"Minigame settings subscriber {callback} failed: {e}")
+
+    def _get_mtime(self):
+        try:
+            return os.stat(self._filepath).st_mtime_ns
+        except OSError:
+            return None
+
+    def _check_external_changes(self) -> None:
+        now = time.monotonic()
+        if now < self._next_external_check:
+            return
+        self._next_external_check = now + self.EXTERNAL_CHECK_INTERVAL
+        mtime = self._get_mtime()
+        # Local changes that haven't been flushed yet win over the file
+        if mtime == self._known_mtime or self._pending_changes:
+            return
+        try:
+            with open(self._filepath, "r") as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"Ignoring unreadable {self._filepath}, will retry: {e}")
+            return
+        self._known_mtime = mtime
+        self._data = data
+        logger.info(f"Reloaded minigame settings after {self._filepath} changed on disk")
+        self._publish()
+
+    def load_data(self):
+        if self._data is not None:
+            self._check_external_changes()
+        return super().load_data()
+
+    def save_data(self, data):
+        super().save_data(data)
+        if self._data is not None:
+            self._publish()
 
+    def _write_file(self, contents: str) -> None:
+        super()._write_file(contents)
+        self._known_mtime = self._get_mtime()
+
+    @staticmethod
+    def _keyword_list(section: dict, key: str) -> list[str]:
+        if f"{key}s" in section:
+            return section[f"{key}s"]
+        legacy = section.get(key)
+        return [legacy] if legacy else []
 
     def get_timeout_duration(self):
         data = self.load_data()
@@ -284,19 +680,17 @@ class MiniGameDatabase(JSONDatabase):
         except KeyError:
             return self.DEFAULT_DATA["ban_game"]["timeout_duration"]
     
-    def get_ban_keyword(self):
+    def get_ban_keywords(self) -> list[str]:
         data = self.load_data()
-        try:
-            return data["ban_game"]["ban_keyword"]
-        except KeyError:
-            return self.DEFAULT_DATA["ban_game"]["ban_keyword"]
+        return self._keyword_list(data.get("ban_game", {}), "ban_keyword")
     
-    def get_vip_keyword(self):
+    def get_vip_keywords(self) -> list[str]:
         data = self.load_data()
-        try:
-            return data["vip_game"]["vip_keyword"]
-        except KeyError:
-            return self.DEFAULT_DATA["vip_game"]["vip_keyword"]
+        return self._keyword_list(data.get("vip_game", {}), "vip_keyword")
+
+    def get_found_vip_keywords(self) -> list[str]:
+        data = self.load_data()
+        return data.get("vip_game", {}).get("found_keywords", [])
     
     def get_vip_game_status(self):
         data = self.load_data()
@@ -312,21 +706,41 @@ class MiniGameDatabase(JSONDatabase):
         except KeyError:
             return self.DEFAULT_DATA["culling_mode"]
 
-    def update_ban_keyword(self, keyword):
+    def get_keyword_matcher(self) -> KeywordMatcher:
+        """Matcher tagging ban keywords "ban" and still unfound VIP keywords "vip"."""
         data = self.load_data()
-        try:
-            data["ban_game"]["ban_keyword"] = keyword
-        except KeyError:
-            data["ban_game"] = {"ban_keyword": keyword, "timeout_duration": self.DEFAULT_DATA["ban_game"]["timeout_duration"]}
+        if self._matcher is not None:
+            return self._matcher
+        ban_game = data.get("ban_game", {})
+        vip_game = data.get("vip_game", {})
+        found = set(vip_game.get("found_keywords", []))
+        if vip_game.get("is_found"):
+            found.update(self._keyword_list(vip_game, "vip_keyword"))
+        self._matcher = get_matcher([
+            *((keyword, "ban") for keyword in self._keyword_list(ban_game, "ban_keyword")),
+            *((keyword, "vip") for keyword in self._keyword_list(vip_game, "vip_keyword") if keyword not in found),
+        ])
+        return self._matcher
+
+    def update_ban_keywords(self, keywords: list[str]):
+        data = self.load_data()
+        ban_game = data.setdefault("ban_game", {"timeout_duration": self.DEFAULT_DATA["ban_game"]["timeout_duration"]})
+        ban_game.pop("ban_keyword", None)
+        ban_game["ban_keywords"] = keywords
         self.save_data(data)
     
-    def update_vip_keyword(self, keyword):
+    def update_vip_keywords(self, keywords: list[str]):
         data = self.load_data()
-        try:
-            data["vip_game"]["vip_keyword"] = keyword
-            data["vip_game"]["is_found"] = False
-        except KeyError:
-            data["vip_game"] = {"vip_keyword": keyword, "is_found": False}
+        data["vip_game"] = {"vip_keywords": keywords, "found_keywords": [], "is_found": False}
+        self.save_data(data)
+
+    def mark_vip_keyword_found(self, keyword):
+        data = self.load_data()
+        vip_game = data.setdefault("vip_game", {})
+        found = vip_game.setdefault("found_keywords", [])
+        if keyword not in found:
+            found.append(keyword)
+        vip_game["is_found"] = set(self._keyword_list(vip_game, "vip_keyword")) <= set(found)
         self.save_data(data)
 
     def update_timeout_duration(self, duration):
@@ -334,7 +748,7 @@ class MiniGameDatabase(JSONDatabase):
         try:
             data["ban_game"]["timeout_duration"] = duration
         except KeyError:
-            data["ban_game"] = {"ban_keyword": self.DEFAULT_DATA["ban_game"]["ban_keyword"], "timeout_duration": duration}
+            data["ban_game"] = {"ban_keywords": [], "timeout_duration": duration}
         self.save_data(data)
 
     def update_vip_game_status(self, status):
@@ -342,10 +756,10 @@ class MiniGameDatabase(JSONDatabase):
         try:
             data["vip_game"]["is_found"] = status
         except KeyError:
-            data["vip_game"] = {"vip_keyword": self.DEFAULT_DATA["vip_game"]["vip_keyword"], "is_found": status}
+            data["vip_game"] = {"vip_keywords": [], "found_keywords": [], "is_found": status}
         self.save_data(data)
 
     def toggle_culling_mode(self, mode: int = None):
         data = self.load_data()
         data["culling_mode"] = bool(mode)
-        self.save_data(data)
\ No newline at end of file
+        self.save_data(data)
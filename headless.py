@@ -0,0 +1,120 @@
+"""
+Run BonkyBot without the window, e.g. as a service on a Linux server:
+
+    python headless.py --data-dir /var/lib/bonkybot
+
+The data dir holds config.ini, db and logs. It defaults to
+$BONKYBOT_DATA_DIR, then %PROGRAMDATA%\\BonkyBot, then
+$XDG_DATA_HOME/bonkybot (~/.local/share/bonkybot). Nothing from
+customtkinter, PIL or async_tkinter_loop is imported.
+
+Startup time and resident memory are logged once the bot is ready and
+compared against --startup-budget and --memory-budget. --check exits
+straight after, with status 1 if either budget was blown.
+"""
+import time
+
+# Taken before anything heavy is imported, so imports count towards startup time
+STARTED = time.perf_counter()
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import signal
+import sys
+
+import logging
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+GUI_MODULES = ("customtkinter", "tkinter", "PIL", "async_tkinter_loop")
+
+def resident_memory_mb() -> float | None:
+    """Current resident set size in MB, or the peak where the current one can't be read."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kB on Linux, bytes on macOS
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+async def run(args: argparse.Namespace) -> bool:
+    """Run the bot until SIGINT/SIGTERM (or until ready with --check). Returns False if a budget was blown."""
+    # config reads the data dir at import time, so everything from the bot is imported here
+    import asqlite
+    from config import JSON_DB_PATH, LOG_LEVEL
+    from db import flush_all
+    from logsetup import setup_logging
+    from bot import Bot
+    from bonkybot import BotComponent
+
+    setup_logging(LOG_LEVEL)
+
+    async with asqlite.create_pool(os.path.join(JSON_DB_PATH, "bonkybot.db")) as tdb, Bot(token_database=tdb, bot_component=BotComponent) as bot:
+        await bot.setup_database()
+        bot_task = asyncio.create_task(bot.start())
+        ready = asyncio.create_task(bot.wait_until_ready())
+        await asyncio.wait((bot_task, ready), return_when=asyncio.FIRST_COMPLETED)
+        if not ready.done():
+            ready.cancel()
+            # The bot stopped before it was ready, let its error surface
+            await bot_task
+            return False
+
+        startup = time.perf_counter() - STARTED
+        memory = resident_memory_mb()
+        within_budget = startup <= args.startup_budget and (memory is None or memory <= args.memory_budget)
+        gui_modules = [name for name in GUI_MODULES if name in sys.modules]
+        report = f"Ready in {startup:.2f}s (budget {args.startup_budget}s), resident memory {memory or 0:.1f} MB (budget {args.memory_budget} MB)"
+        if within_budget:
+            logger.info(report)
+        else:
+            logger.warning(f"{report}, over budget")
+        if gui_modules:
+            logger.warning(f"GUI modules were imported: {', '.join(gui_modules)}")
+        if args.check:
+            print(json.dumps({"startup_s": startup, "rss_mb": memory, "within_budget": within_budget, "gui_modules": gui_modules}))
+        else:
+            stopping = asyncio.Event()
+            loop = asyncio.get_running_loop()
+            # Installed once ready, since the web adapter's runner sets its own handlers that exit the process on start
+            for sig in (signal.SIGINT, signal.SIGTERM):
+                # Not available on Windows, where Ctrl+C raises KeyboardInterrupt instead
+                with contextlib.suppress(NotImplementedError):
+                    loop.add_signal_handler(sig, stopping.set)
+            await asyncio.wait((bot_task, asyncio.create_task(stopping.wait())), return_when=asyncio.FIRST_COMPLETED)
+            logger.info("Shutting down")
+
+        await bot.close()
+        bot_task.cancel()
+        flush_all()
+    return within_budget
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data-dir", help="folder holding config.ini, db and logs")
+    parser.add_argument("--startup-budget", type=float, default=5, help="seconds from launch to ready before a warning is logged (default 5)")
+    parser.add_argument("--memory-budget", type=float, default=120, help="resident memory in MB once ready before a warning is logged (default 120)")
+    parser.add_argument("--check", action="store_true", help="exit once ready, with status 1 if a budget was blown")
+    args = parser.parse_args(argv)
+    if args.data_dir:
+        os.environ["BONKYBOT_DATA_DIR"] = args.data_dir
+
+    try:
+        within_budget = asyncio.run(run(args))
+    except KeyboardInterrupt:
+        return
+    if args.check and not within_budget:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+import functools
+from collections import deque
+from typing import Iterable
+
+class KeywordMatcher:
+    """
+    Aho-Corasick automaton over a set of (keyword, tag) pairs.
+
+    scan() walks a message once, in time linear in its length however many
+    keywords are configured, and reports the first keyword found for each
+    tag, e.g. {"ban": "badword", "vip": "secret"}. Matching is substring
+    based and case-insensitive, like the `keyword in text.lower()` checks it
+    replaces.
+    """
+
+    def __init__(self, entries: Iterable[tuple[str, str]]):
+        self._goto: list[dict[str, int]] = [{}]
+        self._fail: list[int] = [0]
+        self._output: list[tuple[tuple[str, str], ...]] = [()]
+        self.tags = frozenset()
+        for keyword, tag in entries:
+            keyword = keyword.lower()
+            if not keyword:
+                continue
+            self.tags |= {tag}
+            node = 0
+            for char in keyword:
+                child = self._goto[node].get(char)
+                if child is None:
+                    child = len(self._goto)
+                    self._goto[node][char] = child
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append(())
+                node = child
+            self._output[node] += ((keyword, tag),)
+        self._build_failure_links()
+
+    def _build_failure_links(self) -> None:
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(char, 0)
+                self._output[child] += self._output[self._fail[child]]
+
+    def __bool__(self) -> bool:
+        return bool(self.tags)
+
+    def scan(self, text: str) -> dict[str, str]:
+        found: dict[str, str] = {}
+        if not self.tags:
+            return found
+        goto, fail, output = self._goto, self._fail, self._output
+        node = 0
+        for char in text.lower():
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            for keyword, tag in output[node]:
+                found.setdefault(tag, keyword)
+            if len(found) == len(self.tags):
+                break
+        return found
+
+
+@functools.lru_cache(maxsize=64)
+def _build_matcher(entries: tuple[tuple[str, str], ...]) -> KeywordMatcher:
+    return KeywordMatcher(entries)
+
+def get_matcher(entries: Iterable[tuple[str, str]]) -> KeywordMatcher:
+    """
+    Return a matcher for the given (keyword, tag) pairs.
+    Matchers are cached by keyword set, so one is only built when the
+    configured keywords actually change.
+    """
+    return _build_matcher(tuple(sorted({(keyword.lower(), tag) for keyword, tag in entries if keyword})))
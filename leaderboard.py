@@ -0,0 +1,237 @@
+import html
+import random
+
+from aiohttp import web
+
+import logging
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+STATS = ("points", "brick_hits", "d20_crits")
+# What chat and the OBS page call each stat
+STAT_NAMES = {"points": "points", "brick_hits": "brick hits", "d20_crits": "natural 20s"}
+# What !top and !rank take to pick a stat
+STAT_ALIASES = {"points": "points", "bricks": "brick_hits", "crits": "d20_crits"}
+
+class _Node:
+    __slots__ = ("key", "next", "width")
+
+    def __init__(self, key, levels: int, nil=None):
+        self.key = key
+        self.next = [nil] * levels
+        # width[level] is how many places next[level] is ahead of this node
+        self.width = [1] * levels
+
+
+class IndexableSkipList:
+    """
+    A sorted list of unique keys with O(log n) insert, remove, rank and
+    lookup by position: a skip list whose links also count how many
+    items they skip over.
+    """
+    MAX_LEVELS = 24 # plenty for millions of keys
+
+    def __init__(self, keys=()):
+        self._nil = _Node(None, 0)
+        self._head = _Node(None, self.MAX_LEVELS, self._nil)
+        self._size = 0
+        keys = sorted(keys)
+        if keys:
+            self._build(keys)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _random_levels(self) -> int:
+        levels = 1
+        while levels < self.MAX_LEVELS and random.random() < 0.5:
+            levels += 1
+        return levels
+
+    def _build(self, keys: list) -> None:
+        # Linking sorted keys level by level is O(n), rather than n inserts
+        last = [self._head] * self.MAX_LEVELS
+        last_position = [0] * self.MAX_LEVELS
+        for position, key in enumerate(keys, 1):
+            node = _Node(key, self._random_levels(), self._nil)
+            for level in range(len(node.next)):
+                last[level].next[level] = node
+                last[level].width[level] = position - last_position[level]
+                last[level] = node
+                last_position[level] = position
+        for level in range(self.MAX_LEVELS):
+            last[level].width[level] = len(keys) + 1 - last_position[level]
+        self._size = len(keys)
+
+    def _find(self, key) -> tuple[list[_Node], list[int]]:
+        # The last node before key on each level, and how far each is from the head
+        chain = [self._head] * self.MAX_LEVELS
+        positions = [0] * self.MAX_LEVELS
+        node, position = self._head, 0
+        for level in reversed(range(self.MAX_LEVELS)):
+            while node.next[level] is not self._nil and node.next[level].key < key:
+                position += node.width[level]
+                node = node.next[level]
+            chain[level] = node
+            positions[level] = position
+        return chain, positions
+
+    def insert(self, key) -> None:
+        chain, positions = self._find(key)
+        node = _Node(key, self._random_levels(), self._nil)
+        position = positions[0] + 1
+        for level in range(len(node.next)):
+            previous = chain[level]
+            node.next[level] = previous.next[level]
+            previous.next[level] = node
+            node.width[level] = previous.width[level] - (position - positions[level]) + 1
+            previous.width[level] = position - positions[level]
+        for level in range(len(node.next), self.MAX_LEVELS):
+            chain[level].width[level] += 1
+        self._size += 1
+
+    def remove(self, key) -> None:
+        chain, _ = self._find(key)
+        node = chain[0].next[0]
+        if node is self._nil or node.key != key:
+            raise KeyError(key)
+        for level in range(len(node.next)):
+            previous = chain[level]
+            previous.width[level] += node.width[level] - 1
+            previous.next[level] = node.next[level]
+        for level in range(len(node.next), self.MAX_LEVELS):
+            chain[level].width[level] -= 1
+        self._size -= 1
+
+    def index(self, key) -> int:
+        """Position of key, counting from 0."""
+        chain, positions = self._find(key)
+        node = chain[0].next[0]
+        if node is self._nil or node.key != key:
+            raise KeyError(key)
+        return positions[0]
+
+    def __getitem__(self, index: int):
+        if not 0 <= index < self._size:
+            raise IndexError(index)
+        node, position = self._head, -1
+        for level in reversed(range(self.MAX_LEVELS)):
+            while node.next[level] is not self._nil and position + node.width[level] <= index:
+                position += node.width[level]
+                node = node.next[level]
+        return node.key
+
+    def slice(self, start: int, count: int) -> list:
+        """Up to count keys from position start on: O(log n + count)."""
+        if count <= 0 or start >= self._size:
+            return []
+        keys = [self[max(start, 0)]]
+        node = self._find(keys[0])[0][0].next[0]
+        while len(keys) < count and node.next[0] is not self._nil:
+            node = node.next[0]
+            keys.append(node.key)
+        return keys
+
+
+class Leaderboard:
+    """One stat's scores by user id, ranked highest first (ties by user id)."""
+
+    def __init__(self, scores: dict[str, int] | None = None):
+        self._scores = {user_id: score for user_id, score in (scores or {}).items() if score > 0}
+        self._ranks = IndexableSkipList((-score, user_id) for user_id, score in self._scores.items())
+
+    def __len__(self) -> int:
+        return len(self._ranks)
+
+    def score(self, user_id) -> int:
+        return self._scores.get(user_id, 0)
+
+    def add(self, user_id, amount: int) -> None:
+        old = self._scores.pop(user_id, 0)
+        if old > 0:
+            self._ranks.remove((-old, user_id))
+        score = old + amount
+        # Nobody is ranked on 0 (or after giving every point away)
+        if score > 0:
+            self._scores[user_id] = score
+            self._ranks.insert((-score, user_id))
+
+    def rank(self, user_id) -> int | None:
+        """1 for the top chatter, None if user_id has nothing yet."""
+        score = self._scores.get(user_id)
+        if score is None:
+            return None
+        return self._ranks.index((-score, user_id)) + 1
+
+    def top(self, count: int, start: int = 0) -> list[tuple[str, int]]:
+        return [(user_id, -score) for score, user_id in self._ranks.slice(start, count)]
+
+
+class Leaderboards:
+    """A channel's leaderboards, one per stat in STATS."""
+
+    def __init__(self, user_db):
+        self._user_db = user_db
+        self._boards = {stat: Leaderboard() for stat in STATS}
+
+    async def setup(self) -> None:
+        scores = await self._user_db.get_stats(STATS)
+        self._boards = {stat: Leaderboard(scores.get(stat)) for stat in STATS}
+        logger.info(f"Ranked {len(self._boards['points'])} chatters by points")
+
+    def __getitem__(self, stat: str) -> Leaderboard:
+        return self._boards[stat]
+
+    def add(self, stat: str, user_id, amount: int) -> None:
+        self._boards[stat].add(user_id, amount)
+
+    async def top_names(self, stat: str, count: int) -> list[tuple[str, int]]:
+        entries = []
+        for user_id, score in self._boards[stat].top(count):
+            user = await self._user_db.get_user(user_id)
+            entries.append(((user or {}).get("name") or user_id, score))
+        return entries
+
+
+async def leaderboard_page(request: web.Request, channels: dict) -> web.Response:
+    """
+    GET /leaderboard?stat=points&count=10&channel=<broadcaster id>, a page
+    to add to OBS as a browser source. It refreshes itself every 10
+    seconds and has a transparent background; format=json returns the
+    entries instead.
+    """
+    stat = request.query.get("stat", "points")
+    channel = channels.get(request.query.get("channel", "")) or next(iter(channels.values()), None)
+    if channel is None or stat not in STATS:
+        raise web.HTTPNotFound()
+    try:
+        count = min(max(int(request.query.get("count", 10)), 1), 100)
+    except ValueError:
+        raise web.HTTPBadRequest()
+    entries = await channel.leaderboards.top_names(stat, count)
+    if request.query.get("format") == "json":
+        return web.json_response([{"rank": rank, "name": name, stat: score} for rank, (name, score) in enumerate(entries, 1)])
+    rows = "\n".join(
+        f"<tr><td>{rank}.</td><td>{html.escape(name)}</td><td>{score}</td></tr>"
+        for rank, (name, score) in enumerate(entries, 1)
+    )
+    page = f"""<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<meta http-equiv="refresh" content="10">
+<style>
+body {{ background: transparent; color: white; font: bold 24px sans-serif; text-shadow: 2px 2px 2px black; }}
+td {{ padding: 2px 12px; }}
+</style>
+</head>
+<body>
+<h3>Top {html.escape(STAT_NAMES[stat])}</h3>
+<table>
+{rows}
+</table>
+</body>
+</html>
+"""
+    return web.Response(text=page, content_type="text/html", charset="utf-8")
@@ -0,0 +1,112 @@
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import time
+
+from config import LOG_PATH
+
+CHAT_LOGGER_NAME = "BonkyBot.chat"
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that never blocks or formats on the caller's thread.
+
+    Records are handed to the listener thread as they are, so formatting
+    and I/O both happen there. If the queue is full the record is dropped
+    and counted, and the count is reported with the next record that fits.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Same process, so there is no need to flatten the record for pickling
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            if self.dropped:
+                dropped = logging.LogRecord(record.name, logging.WARNING, __file__, 0, f"Dropped {self.dropped} log records, the log queue was full", None, None)
+                self.queue.put_nowait(dropped)
+                self.dropped = 0
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class ChatEcho:
+    """
+    Echoes chat lines to the console through the chat logger, at most
+    `per_second` lines a second. Lines over the limit are skipped and the
+    number skipped is mentioned with the next line that gets through.
+    0 turns the echo off.
+    """
+
+    def __init__(self, per_second: float):
+        self.per_second = per_second
+        self.logger = logging.getLogger(CHAT_LOGGER_NAME)
+        self._allowance = per_second
+        self._updated = time.monotonic()
+        self._skipped = 0
+
+    def echo(self, channel: str, chatter: str, text: str) -> None:
+        if not self.per_second or not self.logger.isEnabledFor(logging.INFO):
+            return
+        now = time.monotonic()
+        self._allowance = min(self.per_second, self._allowance + (now - self._updated) * self.per_second)
+        self._updated = now
+        if self._allowance < 1:
+            self._skipped += 1
+            return
+        self._allowance -= 1
+        if self._skipped:
+            self.logger.info("[%s] (%d messages not shown)", channel, self._skipped)
+            self._skipped = 0
+        self.logger.info("[%s] - %s: %s", channel, chatter, text)
+
+
+_listener: logging.handlers.QueueListener | None = None
+
+def setup_logging(level: int | str = logging.INFO, queue_size: int = 10000) -> None:
+    """
+    Send all logging through a bounded queue to a background thread that
+    writes the rotating log file and echoes chat to the console, so logging
+    never does I/O on the event loop.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    file_handler = logging.handlers.TimedRotatingFileHandler(
+        os.path.join(LOG_PATH, "bonkybot.log"),
+        when="midnight",
+        interval=1,
+        backupCount=7,
+    )
+    file_handler.setFormatter(logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s"))
+    # Chat only goes to the console, it would swamp the log file
+    file_handler.addFilter(lambda record: not record.name.startswith(CHAT_LOGGER_NAME))
+
+    console_handler = logging.StreamHandler(sys.stdout)
+    console_handler.setFormatter(logging.Formatter("[%(asctime)s] %(message)s", "%H:%M:%S"))
+    console_handler.addFilter(logging.Filter(CHAT_LOGGER_NAME))
+
+    log_queue: queue.Queue = queue.Queue(queue_size)
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(DroppingQueueHandler(log_queue))
+
+    _listener = logging.handlers.QueueListener(log_queue, file_handler, console_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+
+def stop_logging() -> None:
+    """Flush anything still queued and stop the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -1,15 +1,15 @@
-import logging.handlers
 import customtkinter
 from async_tkinter_loop import async_handler
 from async_tkinter_loop.mixins import AsyncCTk
 
 
-import logging
+import asyncio
 import os
 import asqlite
-from config import JSON_DB_PATH, LOG_PATH, PROGRAM_DATA_DIR
-from db import MiniGameDatabase, UserDatabase
-import twitchio
+from config import JSON_DB_PATH, PROGRAM_DATA_DIR, LOG_LEVEL
+from db import MiniGameDatabase, flush_all
+from logsetup import setup_logging, stop_logging
+from profiler import is_profiling, profile_for
 from PIL import ImageTk
 
 from bot import Bot
@@ -17,6 +17,11 @@ from bonkybot import BotComponent
 
 import sys
 
+import logging
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
 def resource_path(relative_path):
     try:
         base_path = sys._MEIPASS
@@ -28,16 +33,17 @@ def resource_path(relative_path):
 class BonkyBotApp(customtkinter.CTk, AsyncCTk):
     def __init__(self):
         super().__init__()
-        self.geometry("400x600")
+        self.geometry("400x650")
         self.iconpath = ImageTk.PhotoImage(file=resource_path("./bb.ico"))
         self.title("BonkyBot")
         self.wm_iconbitmap()
         self.iconphoto(False, self.iconpath)
         self.resizable(False, False)
         self.minigame_db = MiniGameDatabase()
-        self.user_db = UserDatabase()
+        self.bot: Bot | None = None # set once LAUNCH BOT has started it
         self.setup_fonts()
         self.create_widgets()
+        self.minigame_db.subscribe(self.on_minigame_settings_changed)
 
     def setup_fonts(self):
         self.title_font = customtkinter.CTkFont(family="Comic Sans MS", size=30, weight="bold")
@@ -48,16 +54,16 @@ class BonkyBotApp(customtkinter.CTk, AsyncCTk):
         self.title_label = customtkinter.CTkLabel(self, text="BonkyBot", font=self.title_font)
         self.title_label.pack(pady=(20, 5))
 
-        self.autovip_label = customtkinter.CTkLabel(self, text="Auto VIP keyword", font=self.main_font)
+        self.autovip_label = customtkinter.CTkLabel(self, text="Auto VIP keywords (comma separated)", font=self.main_font)
         self.autovip_label.pack(pady=10)
-        self.autovip_input = customtkinter.CTkEntry(self, placeholder_text="Keyword", width=200, font=self.main_font)
+        self.autovip_input = customtkinter.CTkEntry(self, placeholder_text="Keywords", width=200, font=self.main_font)
         self.autovip_input.pack(pady=(0,10))
         self.autovip_update_button = customtkinter.CTkButton(self, text="Update", command=self.update_autovip_keyword, font=self.button_font, state="disabled")
         self.autovip_update_button.pack(pady=(0,10))
 
-        self.autoban_label = customtkinter.CTkLabel(self, text="Auto ban keyword", font=self.main_font)
+        self.autoban_label = customtkinter.CTkLabel(self, text="Auto ban keywords (comma separated)", font=self.main_font)
         self.autoban_label.pack(pady=10)
-        self.autoban_input = customtkinter.CTkEntry(self, placeholder_text="Keyword", width=200, font=self.main_font)
+        self.autoban_input = customtkinter.CTkEntry(self, placeholder_text="Keywords", width=200, font=self.main_font)
         self.autoban_input.pack(pady=(0,10))
         self.autoban_update_button = customtkinter.CTkButton(self, text="Update", command=self.update_autoban_keyword, font=self.button_font, state="disabled")
         self.autoban_update_button.pack(pady=(0,10))
@@ -81,8 +87,11 @@ class BonkyBotApp(customtkinter.CTk, AsyncCTk):
         self.open_config_button = customtkinter.CTkButton(self, text="CONFIG FOLDER", command=self.open_config, font=self.button_font)
         self.open_config_button.pack(pady=10)
 
+        self.profile_button = customtkinter.CTkButton(self, text="PROFILE 30s", command=self.profile_bot, font=self.button_font, state="disabled")
+        self.profile_button.pack(pady=10)
+
     def launch_bot(self):
-        main()
+        main(self.minigame_db, self)
         self.update_autoban_keyword()
         self.update_autovip_keyword()
         self.launch_button.configure(
@@ -95,6 +104,11 @@ class BonkyBotApp(customtkinter.CTk, AsyncCTk):
         self.autovip_update_button.configure(state="normal")
         self.autoban_update_button.configure(state="normal")
         self.timeout_update_button.configure(state="normal")
+        self.profile_button.configure(state="normal")
+
+    def on_minigame_settings_changed(self, data):
+        # Reflect changes made by the bot or by editing minigames.json
+        self.get_culling_mode()
 
     def get_culling_mode(self):
         mode = self.minigame_db.get_culling_mode()
@@ -107,13 +121,16 @@ class BonkyBotApp(customtkinter.CTk, AsyncCTk):
         mode = self.culling_mode_switch.get()
         self.minigame_db.toggle_culling_mode(mode)
 
+    def _parse_keywords(self, text: str) -> list[str]:
+        return [keyword.strip().lower() for keyword in text.split(",") if keyword.strip()]
+
     def update_autoban_keyword(self):
-        keyword = self.autoban_input.get()
-        self.minigame_db.update_ban_keyword(keyword.lower())
+        keywords = self._parse_keywords(self.autoban_input.get())
+        self.minigame_db.update_ban_keywords(keywords)
 
     def update_autovip_keyword(self):
-        keyword = self.autovip_input.get()
-        self.minigame_db.update_vip_keyword(keyword.lower())
+        keywords = self._parse_keywords(self.autovip_input.get())
+        self.minigame_db.update_vip_keywords(keywords)
 
     def update_timeout_duration(self):
         try:
@@ -125,35 +142,49 @@ class BonkyBotApp(customtkinter.CTk, AsyncCTk):
             customtkinter.CTkMessageBox.show_error("Invalid Input", f"Please enter a valid timeout duration: {e}")
             return
 
+    @async_handler
+    async def profile_bot(self):
+        if is_profiling():
+            return
+        self.profile_button.configure(state="disabled", text="PROFILING...")
+        try:
+            result = await profile_for(30)
+            self.profile_button.configure(text=f"SAVED {os.path.basename(result.path)}")
+            await asyncio.sleep(3)
+        finally:
+            self.profile_button.configure(state="normal", text="PROFILE 30s")
+
     def open_config(self):
         # Open the config file in the default text editor
         os.startfile(PROGRAM_DATA_DIR)
     
-    def quit_app(self):
+    @async_handler
+    async def quit_app(self):
+        if self.bot is not None:
+            # Tears the component down, which credits pending points and saves
+            # auto-response last-seen times before everything is flushed
+            try:
+                await asyncio.wait_for(self.bot.close(), timeout=10)
+            except Exception as e:
+                logger.error(f"Closing the bot failed: {e}")
+        flush_all()
+        stop_logging() # os._exit skips atexit, so drain the log queue here
         self.quit()
         self.destroy()
         os._exit(0)
         
-def main() -> None:
-    log_file_handler = logging.handlers.TimedRotatingFileHandler(
-        os.path.join(
-            LOG_PATH, 
-            f"bonkybot.log"
-        ),
-        when="midnight",
-        interval=1,
-        backupCount=7,
-    )
-    
-    log_formatter = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
-    twitchio.utils.setup_logging(handler=log_file_handler, formatter=log_formatter, level=logging.INFO)
+def main(minigame_db: MiniGameDatabase | None = None, app: BonkyBotApp | None = None) -> None:
+    setup_logging(LOG_LEVEL)
 
     @async_handler
     async def runner() -> None:
         async with asqlite.create_pool(os.path.join(JSON_DB_PATH, "bonkybot.db")) as tdb, Bot(token_database=tdb, 
                                                                                               bot_component=BotComponent, 
                                                                                               configured=True, 
+                                                                                              minigame_db=minigame_db,
                                                                                               ) as bot:
+            if app is not None:
+                app.bot = bot
             await bot.setup_database()
             await bot.start()
     try:
@@ -0,0 +1,182 @@
+import bisect
+import contextvars
+import functools
+import threading
+import time
+
+import aiohttp
+from aiohttp import web
+from twitchio.web import AiohttpAdapter
+
+from leaderboard import leaderboard_page
+
+class _Metric:
+    TYPE = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _labels(self, key: tuple, extra: str = "") -> str:
+        pairs = [f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, key)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def render(self) -> list[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.TYPE}", *self._samples()]
+
+    def _samples(self) -> list[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    TYPE = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self) -> list[str]:
+        with self._lock:
+            values = list(self._values.items())
+        return [f"{self.name}{self._labels(key)} {value}" for key, value in values]
+
+
+class Histogram(_Metric):
+    TYPE = "histogram"
+    DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = (), buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = buckets
+        # Per label set: a count for each bucket (plus +Inf), the sum and the total count
+        self._values: dict[tuple, tuple[list[int], list[float]]] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = ([0] * (len(self.buckets) + 1), [0.0])
+            entry[0][bisect.bisect_left(self.buckets, value)] += 1
+            entry[1][0] += value
+
+    def time(self, **labels) -> "_Timer":
+        return _Timer(self, labels)
+
+    def _samples(self) -> list[str]:
+        with self._lock:
+            values = [(key, list(counts), total[0]) for key, (counts, total) in self._values.items()]
+        samples = []
+        for key, counts, total in values:
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += count
+                le = f'le="{bound}"'
+                samples.append(f"{self.name}_bucket{self._labels(key, le)} {cumulative}")
+            samples.append(f"{self.name}_sum{self._labels(key)} {total}")
+            samples.append(f"{self.name}_count{self._labels(key)} {cumulative}")
+        return samples
+
+
+class _Timer:
+    """Context manager observing the time spent inside it."""
+
+    def __init__(self, histogram: Histogram, labels: dict):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self) -> "_Timer":
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.histogram.observe(time.perf_counter() - self.started, **self.labels)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+REGISTRY: list[_Metric] = []
+
+def render() -> str:
+    """All metrics in the Prometheus text exposition format."""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+MESSAGES = Counter("bonkybot_messages_total", "Chat messages handled.")
+COMMANDS = Counter("bonkybot_commands_total", "Commands invoked, by command name.", ("command",))
+HELIX_REQUESTS = Counter("bonkybot_helix_requests_total", "Helix API requests, by endpoint and response status.", ("endpoint", "status"))
+DB_OPERATIONS = Counter("bonkybot_db_operations_total", "Database loads, saves and file writes (JSON) or queries (SQLite), by database class.", ("database", "operation"))
+STAGE_SECONDS = Histogram("bonkybot_message_stage_seconds", "Time spent in each stage of handling a chat message.", ("stage",))
+COOLDOWN_REJECTIONS = Counter("bonkybot_cooldown_rejections_total", "Commands turned away because they were on cooldown, by command name.", ("command",))
+COMMAND_SECONDS = Histogram("bonkybot_command_seconds", "Time spent running each command.", ("command",))
+
+
+# Status of the last response in the current task, set by the trace on twitchio's session
+_helix_status: contextvars.ContextVar[int | None] = contextvars.ContextVar("helix_status", default=None)
+
+async def _on_request_end(session, context, params: aiohttp.TraceRequestEndParams) -> None:
+    _helix_status.set(params.response.status)
+
+def track_helix_requests(http) -> None:
+    """Count every request made through a twitchio HTTP client by endpoint and status."""
+    request = http.request
+    init_session = http._init_session
+
+    @functools.wraps(init_session)
+    async def traced_init_session():
+        # twitchio only reports the status of failed requests, so trace its session to see the rest
+        if not http._session_set and not isinstance(http._session, aiohttp.ClientSession):
+            trace = aiohttp.TraceConfig()
+            trace.on_request_end.append(_on_request_end)
+            http._session = aiohttp.ClientSession(headers=http.headers, trace_configs=[trace])
+        await init_session()
+
+    @functools.wraps(request)
+    async def counted_request(route, *args, **kwargs):
+        endpoint = f"{route.method} {route.path}"
+        _helix_status.set(None)
+        try:
+            response = await request(route, *args, **kwargs)
+        except Exception as e:
+            HELIX_REQUESTS.inc(endpoint=endpoint, status=getattr(e, "status", "error"))
+            raise
+        HELIX_REQUESTS.inc(endpoint=endpoint, status=_helix_status.get() or "2xx")
+        return response
+    http._init_session = traced_init_session
+    http.request = counted_request
+
+
+class MetricsAdapter(AiohttpAdapter):
+    """twitchio's built-in web server (OAuth on port 4343) with /metrics and /leaderboard routes added."""
+
+    def __init__(self, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.router.add_route("GET", "/metrics", self.metrics)
+        self.router.add_route("GET", "/leaderboard", self.leaderboard)
+
+    async def metrics(self, request: web.Request) -> web.Response:
+        return web.Response(text=render(), content_type="text/plain", charset="utf-8")
+
+    async def leaderboard(self, request: web.Request) -> web.Response:
+        component = self.client.get_component("BotComponent")
+        if component is None:
+            raise web.HTTPServiceUnavailable()
+        return await leaderboard_page(request, component.channels)
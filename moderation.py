@@ -0,0 +1,247 @@
+import asyncio
+import heapq
+import itertools
+import random
+import time
+from enum import IntEnum
+
+import aiohttp
+import twitchio
+
+from ratelimit import TokenBucket
+
+import logging
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+HELIX_POINTS_PER_MINUTE = 800
+
+class Priority(IntEnum):
+    BROADCASTER = 0 # commands run by the broadcaster and mod restores
+    GAME = 1 # minigame outcomes, culling and keyword timeouts
+
+
+class _Action:
+    __slots__ = ("user_key", "priority", "broadcaster", "method", "kwargs", "future", "started", "order", "attempts")
+
+    def __init__(self, user_key, priority, broadcaster, method, kwargs, future):
+        self.started = False
+        self.order = 0 # position in the queue, kept if the action has to go back in
+        self.attempts = 0
+        self.user_key = user_key
+        self.priority = priority
+        self.broadcaster = broadcaster
+        self.method = method
+        self.kwargs = kwargs
+        self.future = future
+
+
+class ModerationDispatcher:
+    """
+    Single path for the Helix moderation actions (timeouts, VIP and
+    moderator changes).
+
+    - Actions wait on a local copy of the Helix rate-limit bucket (800
+      points a minute per token by default). They run on each broadcaster's
+      own token, so every broadcaster gets their own bucket. twitchio doesn't
+      expose the Ratelimit-* headers, so a 429 is taken to mean the bucket is
+      empty until it refills.
+    - An action identical to the last one queued or in flight for the same
+      user is merged into it, so culling doesn't time a mod out once per
+      message. Anything else queues behind it, so e.g. a remove VIP is never
+      merged past an add VIP that came after it.
+    - Broadcaster actions jump ahead of game actions.
+    - Actions for the same user still run one at a time, in the order they
+      were taken off the queue.
+    - Failures from rate limits, server errors and dropped connections are
+      retried with jittered exponential backoff. Once enough of them pile
+      up in a row for a broadcaster, their actions are held back for a
+      cooldown period. Actions for a broadcaster who is held back or out of
+      rate limit are passed over, so they don't tie up the workers.
+
+    Every method returns a future resolving to True once the action went
+    through and False if it failed; failures are logged here, so callers
+    don't have to await it.
+    """
+
+    def __init__(self, workers: int = 4, max_retries: int = 3, base_delay: float = 0.5, breaker_threshold: int = 5, breaker_cooldown: float = 30):
+        self.worker_count = workers
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.breaker_threshold = breaker_threshold
+        self.breaker_cooldown = breaker_cooldown
+        self._buckets: dict[str, TokenBucket] = {} # by broadcaster id, whose token the actions use
+        self._queue: list[tuple[int, int, _Action]] = []
+        self._counter = itertools.count()
+        self._pending: dict[tuple, list[_Action]] = {} # queued and in flight actions per user, oldest first
+        self._user_locks: dict[tuple, asyncio.Lock] = {}
+        self._wakeup = asyncio.Event()
+        self._workers: list[asyncio.Task] = []
+        self._consecutive_failures: dict[str, int] = {}
+        self._breaker_open_until: dict[str, float] = {}
+
+    def __len__(self) -> int:
+        return sum(len(actions) for actions in self._pending.values())
+
+    def start(self) -> None:
+        if not self._workers:
+            self._workers = [asyncio.create_task(self._work()) for _ in range(self.worker_count)]
+
+    def stop(self) -> None:
+        for worker in self._workers:
+            worker.cancel()
+        self._workers = []
+
+    def submit(self, method: str, broadcaster: twitchio.PartialUser, user_id, priority: Priority = Priority.GAME, **kwargs) -> asyncio.Future:
+        user_key = (broadcaster.id, user_id)
+        pending = self._pending.setdefault(user_key, [])
+        action = pending[-1] if pending else None
+        if action is not None and action.method == method:
+            if not action.started:
+                action.kwargs.update(kwargs)
+                if priority < action.priority:
+                    # Queue entries are checked against the action's priority when popped, so this one supersedes the old entry
+                    action.priority = priority
+                    action.order = next(self._counter)
+                    heapq.heappush(self._queue, (priority, action.order, action))
+                return action.future
+            # Too late to change an action in flight, so only an exact repeat is merged
+            if all(action.kwargs.get(name) == value for name, value in kwargs.items()):
+                return action.future
+        action = _Action(user_key, priority, broadcaster, method, {"user": user_id, **kwargs}, asyncio.get_running_loop().create_future())
+        pending.append(action)
+        action.order = next(self._counter)
+        heapq.heappush(self._queue, (priority, action.order, action))
+        self._wakeup.set()
+        return action.future
+
+    def timeout_user(self, broadcaster: twitchio.PartialUser, user_id, *, moderator, duration: int, reason: str, priority: Priority = Priority.GAME) -> asyncio.Future:
+        return self.submit("timeout_user", broadcaster, user_id, priority, moderator=moderator, duration=duration, reason=reason)
+
+    def add_vip(self, broadcaster: twitchio.PartialUser, user_id, priority: Priority = Priority.GAME) -> asyncio.Future:
+        return self.submit("add_vip", broadcaster, user_id, priority)
+
+    def remove_vip(self, broadcaster: twitchio.PartialUser, user_id, priority: Priority = Priority.GAME) -> asyncio.Future:
+        return self.submit("remove_vip", broadcaster, user_id, priority)
+
+    def add_moderator(self, broadcaster: twitchio.PartialUser, user_id, priority: Priority = Priority.GAME) -> asyncio.Future:
+        return self.submit("add_moderator", broadcaster, user_id, priority)
+
+    def remove_moderator(self, broadcaster: twitchio.PartialUser, user_id, priority: Priority = Priority.GAME) -> asyncio.Future:
+        return self.submit("remove_moderator", broadcaster, user_id, priority)
+
+    def _bucket(self, broadcaster_id) -> TokenBucket:
+        bucket = self._buckets.get(broadcaster_id)
+        if bucket is None:
+            bucket = self._buckets[broadcaster_id] = TokenBucket(HELIX_POINTS_PER_MINUTE, HELIX_POINTS_PER_MINUTE / 60)
+        return bucket
+
+    def _delay(self, broadcaster_id) -> float:
+        breaker = self._breaker_open_until.get(broadcaster_id, 0) - time.monotonic()
+        return max(breaker, self._bucket(broadcaster_id).wait_time())
+
+    def _next_action(self) -> tuple[_Action | None, float | None]:
+        """The next action that can run now, or None and how long until one can (None if the queue is empty)."""
+        held_back = []
+        soonest = None
+        action = None
+        while self._queue:
+            entry = heapq.heappop(self._queue)
+            priority, _, candidate = entry
+            # Entries left behind by a priority bump are skipped
+            if candidate.priority != priority or candidate.started:
+                continue
+            delay = self._delay(candidate.user_key[0])
+            if delay > 0:
+                held_back.append(entry)
+                soonest = delay if soonest is None else min(soonest, delay)
+                continue
+            candidate.started = True
+            action = candidate
+            break
+        for entry in held_back:
+            heapq.heappush(self._queue, entry)
+        return action, soonest
+
+    async def _work(self) -> None:
+        while True:
+            action, delay = self._next_action()
+            if action is None:
+                self._wakeup.clear()
+                if delay is None:
+                    await self._wakeup.wait()
+                else:
+                    # Woken early by new actions, which may be for another broadcaster
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                    except asyncio.TimeoutError:
+                        pass
+                continue
+            user_key = action.user_key
+            lock = self._user_locks.setdefault(user_key, asyncio.Lock())
+            try:
+                async with lock:
+                    await self._run(action)
+            finally:
+                # Kept while anything for this user is queued or waiting on the lock, so they keep their order
+                if user_key not in self._pending and self._user_locks.get(user_key) is lock:
+                    del self._user_locks[user_key]
+
+    async def _run(self, action: _Action) -> None:
+        result = False
+        requeued = False
+        broadcaster_id = action.user_key[0]
+        bucket = self._bucket(broadcaster_id)
+        try:
+            while True:
+                if self._breaker_open_until.get(broadcaster_id, 0) > time.monotonic():
+                    # Back in the queue, rather than holding a worker through the cooldown
+                    action.started = False
+                    heapq.heappush(self._queue, (action.priority, action.order, action))
+                    self._wakeup.set()
+                    requeued = True
+                    return
+                await bucket.acquire()
+                action.attempts += 1
+                try:
+                    await getattr(action.broadcaster, action.method)(**action.kwargs)
+                    self._consecutive_failures[broadcaster_id] = 0
+                    result = True
+                    break
+                except twitchio.HTTPException as e:
+                    if e.status != 429 and e.status < 500:
+                        # Not worth retrying, e.g. removing VIP from someone who isn't one
+                        logger.info(f"{action.method} for {action.kwargs['user']} was rejected: {e.extra.get('message') if isinstance(e.extra, dict) else e.extra}")
+                        break
+                    if e.status == 429:
+                        bucket.drain()
+                    self._record_failure(broadcaster_id)
+                    error = e
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    self._record_failure(broadcaster_id)
+                    error = e
+                if action.attempts > self.max_retries:
+                    logger.error(f"{action.method} for {action.kwargs['user']} failed after {action.attempts} attempts: {error}")
+                    break
+                # Full jitter keeps retries from several workers from lining up
+                await asyncio.sleep(random.uniform(0, self.base_delay * 2 ** (action.attempts - 1)))
+        except Exception as e:
+            logger.exception(f"{action.method} for {action.kwargs['user']} failed: {e}")
+        finally:
+            if not requeued:
+                pending = self._pending.get(action.user_key, [])
+                if action in pending:
+                    pending.remove(action)
+                if not pending:
+                    self._pending.pop(action.user_key, None)
+                if not action.future.done():
+                    action.future.set_result(result)
+
+    def _record_failure(self, broadcaster_id) -> None:
+        failures = self._consecutive_failures.get(broadcaster_id, 0) + 1
+        if failures >= self.breaker_threshold:
+            self._breaker_open_until[broadcaster_id] = time.monotonic() + self.breaker_cooldown
+            failures = 0
+            logger.warning(f"Too many Helix failures, pausing moderation actions in channel {broadcaster_id} for {self.breaker_cooldown}s")
+        self._consecutive_failures[broadcaster_id] = failures
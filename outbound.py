@@ -0,0 +1,119 @@
+import asyncio
+import heapq
+import itertools
+import time
+from enum import IntEnum
+
+import twitchio
+
+from ratelimit import TokenBucket
+
+import logging
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+class ChatPriority(IntEnum):
+    MODERATION = 0 # notices about timeouts, VIP and mod changes
+    EVENT = 1 # going live, follows, subs and ad breaks
+    COMMAND = 2 # replies to commands
+    GAME = 3 # minigame results and auto-responses
+
+
+class _ChannelOutbox:
+    __slots__ = ("queue", "bucket", "wakeup", "worker")
+
+    def __init__(self, bucket: TokenBucket):
+        self.queue: list[tuple[int, int, float, twitchio.PartialUser, str, bool, asyncio.Future]] = []
+        self.bucket = bucket
+        self.wakeup = asyncio.Event()
+        self.worker: asyncio.Task | None = None
+
+
+class ChatScheduler:
+    """
+    Outbound queue for everything the bot says in chat.
+
+    Twitch applies the chat limits per channel, so each channel has its own
+    queue, worker and token bucket, and a busy channel never eats into
+    another's budget. Within a channel, messages are sent one at a time,
+    highest priority first and in order within a priority. Sends are paced
+    by a token bucket sized so that no 30 second window goes over the chat
+    limit (100 messages while the bot is a moderator, 20 otherwise).
+    Command replies and game messages that sat in the queue past
+    STALE_AFTER seconds are dropped rather than sent late.
+
+    send() returns a future resolving to True once the message went out and
+    False if it was dropped or failed; failures are logged here, so callers
+    don't have to await it.
+    """
+    STALE_AFTER = {
+        ChatPriority.COMMAND: 30,
+        ChatPriority.GAME: 10,
+    }
+
+    def __init__(self, bot_id, limit: int = 100, window: float = 30):
+        self.bot_id = bot_id
+        self.limit = limit
+        self.window = window
+        self._outboxes: dict[str, _ChannelOutbox] = {}
+        self._counter = itertools.count()
+        self._running = False
+
+    def __len__(self) -> int:
+        return sum(len(outbox.queue) for outbox in self._outboxes.values())
+
+    def _outbox(self, broadcaster_id) -> _ChannelOutbox:
+        outbox = self._outboxes.get(broadcaster_id)
+        if outbox is None:
+            # A full bucket can be spent at once, so refill slower to keep burst + refill within the limit
+            burst = max(1, self.limit // 10)
+            outbox = self._outboxes[broadcaster_id] = _ChannelOutbox(TokenBucket(burst, (self.limit - burst) / self.window))
+        if self._running and outbox.worker is None:
+            outbox.worker = asyncio.create_task(self._work(outbox))
+        return outbox
+
+    def send(self, broadcaster: twitchio.PartialUser, message: str, priority: ChatPriority = ChatPriority.COMMAND, announcement: bool = False) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        outbox = self._outbox(broadcaster.id)
+        heapq.heappush(outbox.queue, (priority, next(self._counter), time.monotonic(), broadcaster, message, announcement, future))
+        outbox.wakeup.set()
+        return future
+
+    def start(self) -> None:
+        self._running = True
+        for broadcaster_id in self._outboxes:
+            self._outbox(broadcaster_id)
+
+    def stop(self) -> None:
+        self._running = False
+        for outbox in self._outboxes.values():
+            if outbox.worker is not None:
+                outbox.worker.cancel()
+                outbox.worker = None
+
+    async def _work(self, outbox: _ChannelOutbox) -> None:
+        while True:
+            if not outbox.queue:
+                outbox.wakeup.clear()
+                await outbox.wakeup.wait()
+                continue
+            await outbox.bucket.acquire()
+            # Popped after waiting for a token, so anything more urgent queued meanwhile goes first
+            priority, _, queued_at, broadcaster, message, announcement, future = heapq.heappop(outbox.queue)
+            stale_after = self.STALE_AFTER.get(priority)
+            if stale_after is not None and time.monotonic() - queued_at > stale_after:
+                logger.debug(f"Dropped stale {priority.name.lower()} message: {message}")
+                future.set_result(False)
+                # Nothing was sent, so hand the token back
+                outbox.bucket.release()
+                continue
+            try:
+                if announcement:
+                    await broadcaster.send_announcement(moderator=self.bot_id, message=message)
+                else:
+                    await broadcaster.send_message(sender=self.bot_id, message=message)
+                future.set_result(True)
+            except Exception as e:
+                logger.error(f"Failed to send chat message '{message}': {e}")
+                future.set_result(False)
@@ -0,0 +1,79 @@
+import asyncio
+from collections import deque
+from typing import Awaitable, Callable
+
+import logging
+
+from metrics import STAGE_SECONDS
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+class MessagePipeline:
+    """
+    Processes chat messages off the event handler.
+
+    Each chatter gets a queue drained by its own short-lived worker, so
+    messages from one chatter are handled strictly in order while different
+    chatters are handled concurrently. A chatter's queue is capped, dropping
+    their oldest unprocessed message when they flood, but never one submitted
+    with droppable=False (e.g. one holding a ban keyword). Within a message,
+    run_stages() runs independent stages concurrently, each with its own
+    timeout so one slow Helix call can't hold up the rest.
+    """
+
+    def __init__(self, handler: Callable[..., Awaitable[None]], stage_timeout: float = 5, max_queued_per_chatter: int = 20):
+        self.handler = handler
+        self.stage_timeout = stage_timeout
+        self.max_queued_per_chatter = max_queued_per_chatter
+        self._queues: dict[str, deque] = {}
+        self._workers: dict[str, asyncio.Task] = {}
+
+    def __len__(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    def submit(self, chatter_id, item, droppable: bool = True) -> None:
+        queue = self._queues.get(chatter_id)
+        if queue is None:
+            queue = self._queues[chatter_id] = deque()
+        if len(queue) >= self.max_queued_per_chatter:
+            for queued in queue:
+                if queued[1]:
+                    queue.remove(queued)
+                    logger.warning(f"Dropped a queued message from {chatter_id}, too many pending")
+                    break
+        queue.append((item, droppable))
+        if chatter_id not in self._workers:
+            self._workers[chatter_id] = asyncio.create_task(self._drain(chatter_id))
+
+    async def _drain(self, chatter_id) -> None:
+        queue = self._queues[chatter_id]
+        try:
+            while queue:
+                item, _ = queue.popleft()
+                try:
+                    with STAGE_SECONDS.time(stage="message"):
+                        await self.handler(item)
+                except Exception as e:
+                    logger.exception(f"Failed to process message from {chatter_id}: {e}")
+        finally:
+            # Idle chatters cost nothing once their queue is empty
+            del self._workers[chatter_id]
+            del self._queues[chatter_id]
+
+    async def run_stage(self, name: str, stage: Awaitable):
+        try:
+            with STAGE_SECONDS.time(stage=name):
+                return await asyncio.wait_for(stage, timeout=self.stage_timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Stage {name} timed out after {self.stage_timeout}s")
+        except Exception as e:
+            logger.exception(f"Stage {name} failed: {e}")
+        return None
+
+    async def run_stages(self, **stages: Awaitable) -> None:
+        await asyncio.gather(*(self.run_stage(name, stage) for name, stage in stages.items()))
+
+    def stop(self) -> None:
+        for worker in list(self._workers.values()):
+            worker.cancel()
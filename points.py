@@ -0,0 +1,98 @@
+import asyncio
+
+from leaderboard import Leaderboards
+
+import logging
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+class PointsLedger:
+    """
+    A channel's chat points and minigame stats.
+
+    Chatters are only noted in memory as they chat, and minigame bonuses,
+    !give transfers and stats like brick hits pile up as pending amounts.
+    Every tick, everyone who chatted since the last one earns
+    points_per_tick, and all of it is credited to the user database in
+    one bulk update per counter, so a message never costs a points write.
+    The leaderboards are kept up to date as amounts are added.
+    """
+
+    def __init__(self, user_db, leaderboards: Leaderboards, points_per_tick: int, tick_seconds: float):
+        self._user_db = user_db
+        self._leaderboards = leaderboards
+        self.points_per_tick = points_per_tick
+        self.tick_seconds = tick_seconds
+        self._active: set[str] = set()
+        self._pending: dict[str, int] = {}
+        self._pending_stats: dict[str, dict[str, int]] = {}
+        self._tick_task: asyncio.Task | None = None
+
+    def seen(self, user_id) -> None:
+        self._active.add(user_id)
+
+    def award(self, user_id, amount: int) -> None:
+        self._pending[user_id] = self._pending.get(user_id, 0) + amount
+        self._leaderboards.add("points", user_id, amount)
+
+    def count(self, user_id, stat: str) -> None:
+        """Record a game outcome, e.g. "brick_hits", for user_id."""
+        counts = self._pending_stats.setdefault(stat, {})
+        counts[user_id] = counts.get(user_id, 0) + 1
+        self._leaderboards.add(stat, user_id, 1)
+
+    async def balance(self, user_id) -> int:
+        user = await self._user_db.get_user(user_id)
+        # Pending is read after the await, so it includes anything awarded meanwhile
+        return (user or {}).get("points", 0) + self._pending.get(user_id, 0)
+
+    async def give(self, from_id, to_id, amount: int) -> bool:
+        """Move amount points between chatters, returning False if from_id can't afford it."""
+        if await self.balance(from_id) < amount:
+            return False
+        self.award(from_id, -amount)
+        self.award(to_id, amount)
+        return True
+
+    async def tick(self) -> None:
+        credits, self._pending = self._pending, {}
+        stats, self._pending_stats = self._pending_stats, {}
+        active, self._active = self._active, set()
+        for user_id in active:
+            credits[user_id] = credits.get(user_id, 0) + self.points_per_tick
+            self._leaderboards.add("points", user_id, self.points_per_tick)
+        counters = {"points": {user_id: amount for user_id, amount in credits.items() if amount}, **stats}
+        error = None
+        for field, amounts in counters.items():
+            if not amounts:
+                continue
+            try:
+                await self._user_db.add_counts(field, amounts)
+            except Exception as e:
+                # Keep them for the next tick rather than losing them, they're already on the leaderboards
+                pending = self._pending if field == "points" else self._pending_stats.setdefault(field, {})
+                for user_id, amount in amounts.items():
+                    pending[user_id] = pending.get(user_id, 0) + amount
+                error = e
+        if error is not None:
+            raise error
+        logger.debug(f"Credited points to {len(counters['points'])} chatters")
+
+    async def _tick_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.tick_seconds)
+            try:
+                await self.tick()
+            except Exception as e:
+                logger.error(f"Crediting points failed: {e}")
+
+    def start(self) -> None:
+        if self._tick_task is None:
+            self._tick_task = asyncio.create_task(self._tick_loop())
+
+    async def stop(self) -> None:
+        if self._tick_task is not None:
+            self._tick_task.cancel()
+            self._tick_task = None
+        await self.tick()
@@ -0,0 +1,96 @@
+import asyncio
+import random
+
+import twitchio
+
+import logging
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+class ChatterPresence:
+    """
+    Keeps track of who is currently in chat.
+
+    Chatters are added as they send messages, and a periodic background
+    sweep of the Helix chatters endpoint reconciles the set with who is
+    actually connected. Chatters are kept in a list with an id -> position
+    index, so adding, removing and picking a random chatter are all O(1).
+    """
+    SWEEP_PAGE_SIZE = 1000 # Largest page the chatters endpoint allows
+
+    def __init__(self, sweep_interval: float = 300):
+        self.sweep_interval = sweep_interval
+        self._positions: dict[str, int] = {}
+        self._chatters: list[tuple[str, str]] = []
+        self._seen_during_sweep: dict[str, str] | None = None
+        self._sweep_lock = asyncio.Lock()
+        self._sweep_task: asyncio.Task | None = None
+
+    def __len__(self) -> int:
+        return len(self._chatters)
+
+    def __contains__(self, user_id) -> bool:
+        return user_id in self._positions
+
+    def add(self, user_id, name) -> None:
+        if self._seen_during_sweep is not None:
+            self._seen_during_sweep[user_id] = name
+        position = self._positions.get(user_id)
+        if position is not None:
+            self._chatters[position] = (user_id, name)
+            return
+        self._positions[user_id] = len(self._chatters)
+        self._chatters.append((user_id, name))
+
+    def discard(self, user_id) -> None:
+        position = self._positions.pop(user_id, None)
+        if position is None:
+            return
+        # Move the last chatter into the freed slot so the list stays dense
+        last = self._chatters.pop()
+        if position < len(self._chatters):
+            self._chatters[position] = last
+            self._positions[last[0]] = position
+
+    def random_name(self) -> str|None:
+        if not self._chatters:
+            return None
+        return random.choice(self._chatters)[1]
+
+    async def sweep(self, broadcaster: twitchio.PartialUser, moderator_id) -> None:
+        async with self._sweep_lock:
+            # Anyone who chats while we page through the endpoint is kept,
+            # even if they joined after their page was fetched
+            self._seen_during_sweep = {}
+            try:
+                chatters = await broadcaster.fetch_chatters(moderator=moderator_id, first=self.SWEEP_PAGE_SIZE)
+                present = {}
+                async for user in chatters.users:
+                    present[user.id] = user.name
+                present.update(self._seen_during_sweep)
+            finally:
+                self._seen_during_sweep = None
+            for user_id, _ in list(self._chatters):
+                if user_id not in present:
+                    self.discard(user_id)
+            for user_id, name in present.items():
+                self.add(user_id, name)
+            logger.info(f"Chatter sweep found {len(self)} chatters")
+
+    async def _sweep_loop(self, broadcaster: twitchio.PartialUser, moderator_id) -> None:
+        while True:
+            try:
+                await self.sweep(broadcaster, moderator_id)
+            except Exception as e:
+                logger.error(f"Chatter sweep failed: {e}")
+            await asyncio.sleep(self.sweep_interval)
+
+    def start(self, broadcaster: twitchio.PartialUser, moderator_id) -> None:
+        if self._sweep_task is None:
+            self._sweep_task = asyncio.create_task(self._sweep_loop(broadcaster, moderator_id))
+
+    def stop(self) -> None:
+        if self._sweep_task is not None:
+            self._sweep_task.cancel()
+            self._sweep_task = None
@@ -0,0 +1,63 @@
+import asyncio
+import cProfile
+import io
+import os
+import pstats
+from datetime import datetime
+
+from config import LOG_PATH
+
+import logging
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+class ProfileResult:
+    def __init__(self, path: str, summary: str, hot_spots: list[tuple[str, float]]):
+        self.path = path # pstats dump, open with snakeviz or turn into a flamegraph with flameprof
+        self.summary = summary # top functions by cumulative time, as printed by pstats
+        self.hot_spots = hot_spots # (function, cumulative seconds) for the bot's own functions, slowest first
+
+
+_profiler: cProfile.Profile | None = None
+
+def is_profiling() -> bool:
+    return _profiler is not None
+
+async def profile_for(seconds: float, top: int = 30) -> ProfileResult:
+    """
+    Profile the event loop thread (the bot, twitchio and the GUI) for
+    `seconds`, then write a .prof dump to LOG_PATH and log the top
+    functions by cumulative time. Only one session can run at a time.
+    """
+    global _profiler
+    if _profiler is not None:
+        raise RuntimeError("A profile is already running.")
+    _profiler = cProfile.Profile()
+    logger.info(f"Profiling for {seconds}s")
+    # Enabled from the loop thread, so this covers everything the loop runs until disabled
+    _profiler.enable()
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        _profiler.disable()
+        profiler, _profiler = _profiler, None
+    path = os.path.join(LOG_PATH, f"profile-{datetime.now():%Y%m%d-%H%M%S}.prof")
+    # Dumping and sorting the stats can take a moment on a busy profile
+    result = await asyncio.to_thread(_write_results, profiler, path, top)
+    logger.info(f"Profile written to {path}, top {top} functions by cumulative time:\n{result.summary}")
+    return result
+
+def _write_results(profiler: cProfile.Profile, path: str, top: int) -> ProfileResult:
+    profiler.dump_stats(path)
+    stream = io.StringIO()
+    stats = pstats.Stats(profiler, stream=stream)
+    stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(top)
+    hot_spots = []
+    for (filename, line, name), (_, _, _, cumulative, _) in stats.stats.items():
+        if filename.startswith(REPO_DIR) and name != "<module>":
+            hot_spots.append((f"{os.path.basename(filename)}:{name}", cumulative))
+    hot_spots.sort(key=lambda spot: spot[1], reverse=True)
+    return ProfileResult(path, stream.getvalue(), hot_spots)
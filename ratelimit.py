@@ -0,0 +1,38 @@
+import asyncio
+import time
+
+class TokenBucket:
+    """
+    Token bucket holding up to `capacity` tokens, refilled at `rate` tokens
+    a second. acquire() waits until a token is available and takes it.
+    """
+
+    def __init__(self, capacity: float, rate: float):
+        self.capacity = capacity
+        self.rate = rate
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self) -> float:
+        """Seconds until acquire() could take a token without waiting."""
+        self._refill()
+        return max(0.0, (1 - self._tokens) / self.rate)
+
+    async def acquire(self) -> None:
+        self._refill()
+        while self._tokens < 1:
+            await asyncio.sleep((1 - self._tokens) / self.rate)
+            self._refill()
+        self._tokens -= 1
+
+    def release(self) -> None:
+        self._tokens = min(self.capacity, self._tokens + 1)
+
+    def drain(self) -> None:
+        self._refill()
+        self._tokens = min(self._tokens, 0)
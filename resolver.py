@@ -0,0 +1,116 @@
+import asyncio
+import re
+import time
+from collections import OrderedDict
+
+from twitchapi import TwitchAPI, TwitchAPIError
+
+import logging
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+# What Twitch allows in a login, anything else can't be a user
+_LOGIN_PATTERN = re.compile(r"^[a-z0-9_]{1,25}$")
+
+class UserIdResolver:
+    """
+    Resolves login names to user IDs through the Helix users endpoint.
+
+    Lookups that arrive within `window` seconds of each other are sent as
+    one users?login=a&login=b... request (up to 100 logins), callers asking
+    for a name that is already in flight share its future, and both hits
+    and misses are kept in a bounded TTL cache so repeated typos don't hit
+    the API again. Logins Twitch can't have are turned away without a
+    request, so they can't make Helix reject the rest of their batch; if a
+    batch is rejected anyway, its logins are looked up one by one.
+    """
+    MAX_BATCH_SIZE = 100 # Helix limit on login parameters per request
+
+    def __init__(self, twitch_api: TwitchAPI, window: float = 0.05, ttl: float = 3600, negative_ttl: float = 300, max_size: int = 10000):
+        self.twitch_api = twitch_api
+        self.window = window
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_size = max_size
+        self._cache: OrderedDict[str, tuple[str|None, float]] = OrderedDict()
+        self._in_flight: dict[str, asyncio.Future] = {}
+        self._pending: list[str] = []
+        self._flush_handle: asyncio.TimerHandle | None = None
+        self._tasks: set[asyncio.Task] = set()
+
+    def _cache_get(self, login):
+        entry = self._cache.get(login)
+        if entry is None:
+            return _MISSING
+        user_id, expiry = entry
+        if time.monotonic() >= expiry:
+            del self._cache[login]
+            return _MISSING
+        self._cache.move_to_end(login)
+        return user_id
+
+    def _cache_put(self, login, user_id) -> None:
+        ttl = self.ttl if user_id else self.negative_ttl
+        self._cache[login] = (user_id, time.monotonic() + ttl)
+        self._cache.move_to_end(login)
+        while len(self._cache) > self.max_size:
+            self._cache.popitem(last=False)
+
+    async def resolve(self, login) -> str|None:
+        login = login.lower()
+        user_id = self._cache_get(login)
+        if user_id is not _MISSING:
+            return user_id
+        if not _LOGIN_PATTERN.match(login):
+            self._cache_put(login, None)
+            return None
+        future = self._in_flight.get(login)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self._in_flight[login] = future
+            self._pending.append(login)
+            if len(self._pending) >= self.MAX_BATCH_SIZE:
+                self._flush()
+            elif self._flush_handle is None:
+                self._flush_handle = loop.call_later(self.window, self._flush)
+        # Shielded so one caller giving up doesn't cancel the lookup for the others
+        return await asyncio.shield(future)
+
+    def _flush(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        while self._pending:
+            batch, self._pending = self._pending[:self.MAX_BATCH_SIZE], self._pending[self.MAX_BATCH_SIZE:]
+            task = asyncio.create_task(self._fetch(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _fetch(self, batch: list[str]) -> None:
+        try:
+            user_data = await self.twitch_api.make_request("users", params=[("login", login) for login in batch])
+            found = {user["login"].lower(): user["id"] for user in user_data["data"]}
+        except TwitchAPIError as e:
+            if 400 <= e.status < 500 and e.status != 429 and len(batch) > 1:
+                # Helix rejects the whole batch over one bad login, so don't let it take the others down with it
+                logger.warning(f"Batch of {len(batch)} user lookups was rejected, retrying them one by one: {e}")
+                await asyncio.gather(*(self._fetch([login]) for login in batch))
+                return
+            self._fail(batch, e)
+            return
+        except Exception as e:
+            self._fail(batch, e)
+            return
+        for login in batch:
+            user_id = found.get(login)
+            self._cache_put(login, user_id)
+            self._in_flight.pop(login).set_result(user_id)
+
+    def _fail(self, batch: list[str], error: Exception) -> None:
+        # Errors aren't cached, so the next lookup tries again
+        logger.error(f"Error while fetching user IDs for {batch}: {error}")
+        for login in batch:
+            self._in_flight.pop(login).set_result(None)
@@ -0,0 +1,453 @@
+import asyncio
+import json
+import os
+import sqlite3
+import time
+from datetime import datetime
+
+import asqlite
+
+from config import USERS_DB, BRICK_DB, DICE_DB, MINIGAME_DB, CLIENT_ID, CLIENT_SECRET
+from db import DiceGameDatabase, MiniGameDatabase, UserDatabase, dice_day
+from resolver import UserIdResolver
+from metrics import DB_OPERATIONS
+from twitchapi import TwitchAPI
+
+import logging
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+
+def _read_json(filepath) -> dict:
+    if not os.path.exists(filepath):
+        return {}
+    with open(filepath, "r") as f:
+        return json.load(f)
+
+
+class SQLiteDatabase:
+    """
+    Base class for the async SQLite databases.
+    Every query runs on one of the asqlite pool's worker threads, so
+    awaiting them never blocks the event loop.
+    """
+    SCHEMA = ""
+
+    def __init__(self, pool: asqlite.Pool, json_path: str | None = None):
+        self._pool = pool
+        self._json_path = json_path # JSON file imported on first use
+
+    async def setup(self) -> None:
+        async with self._acquire() as connection:
+            await connection.execute("PRAGMA journal_mode=WAL")
+            await connection.executescript(self.SCHEMA)
+
+    def _acquire(self):
+        DB_OPERATIONS.inc(database=type(self).__name__, operation="query")
+        return self._pool.acquire()
+
+    def get_current_timestamp(self) -> int:
+        # Get the current timestamp
+        return int(datetime.now().timestamp())
+
+
+class SQLiteUserDatabase(SQLiteDatabase):
+    """
+    Async SQLite implementation of the UserDatabase API.
+    Known fields get their own column, anything else is kept in the
+    "extra" JSON column so records round-trip like the JSON store.
+    """
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS users(
+        id TEXT PRIMARY KEY,
+        name TEXT,
+        login TEXT,
+        mod INTEGER NOT NULL DEFAULT 0,
+        persistent_mod INTEGER NOT NULL DEFAULT 0,
+        sub INTEGER NOT NULL DEFAULT 0,
+        points INTEGER NOT NULL DEFAULT 0,
+        last_message_ts INTEGER,
+        extra TEXT NOT NULL DEFAULT '{}'
+    );
+    CREATE INDEX IF NOT EXISTS users_login_idx ON users(login);
+    CREATE TABLE IF NOT EXISTS auto_responses(
+        user_id TEXT NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+        position INTEGER NOT NULL,
+        response TEXT NOT NULL,
+        PRIMARY KEY (user_id, position)
+    );
+    """
+    COLUMNS = ("name", "mod", "persistent_mod", "sub", "points", "last_message_ts")
+    BOOLEAN_COLUMNS = ("mod", "persistent_mod", "sub")
+
+    def __init__(self, pool: asqlite.Pool, json_path: str = USERS_DB, resolver: UserIdResolver | None = None):
+        super().__init__(pool, json_path)
+        self.resolver = resolver or UserIdResolver(TwitchAPI(CLIENT_ID, CLIENT_SECRET))
+        self.twitch_api = self.resolver.twitch_api
+
+    async def setup(self) -> None:
+        await super().setup()
+        async with self._acquire() as connection:
+            row = await connection.fetchone("SELECT COUNT(*) AS count FROM users")
+        if row["count"] == 0:
+            await self._import_json()
+
+    async def _import_json(self) -> None:
+        # Carry existing chatters over the first time the SQLite backend is used, with users.json's journal replayed
+        data = await asyncio.to_thread(UserDatabase.read, self._json_path)
+        users = data.get("users", [])
+        if not users:
+            return
+        async with self._acquire() as connection:
+            async with connection.transaction():
+                for user in users:
+                    await self._upsert(connection, user["id"], user)
+        logger.info(f"Imported {len(users)} users from {self._json_path}")
+
+    def _row_to_user(self, row: sqlite3.Row, responses: list[str]) -> dict:
+        user = {"id": row["id"], **json.loads(row["extra"])}
+        for column in self.COLUMNS:
+            value = row[column]
+            if column in self.BOOLEAN_COLUMNS:
+                value = bool(value)
+            if value is not None:
+                user[column] = value
+        if responses:
+            user["auto_responses"] = responses
+        return user
+
+    async def _fetch_user(self, connection: asqlite.Connection, user_id) -> dict | None:
+        row = await connection.fetchone("SELECT * FROM users WHERE id = ?", (user_id,))
+        if row is None:
+            return None
+        responses = await connection.fetchall(
+            "SELECT response FROM auto_responses WHERE user_id = ? ORDER BY position", (user_id,)
+        )
+        return self._row_to_user(row, [r["response"] for r in responses])
+
+    async def _upsert(self, connection: asqlite.Connection, user_id, payload: dict) -> None:
+        columns = {key: value for key, value in payload.items() if key in self.COLUMNS}
+        extra = {key: value for key, value in payload.items() if key not in self.COLUMNS and key not in ("id", "auto_responses")}
+        if "name" in columns:
+            columns["login"] = columns["name"].lower()
+        names = ["id", *columns, "extra"]
+        updates = [f"{name} = excluded.{name}" for name in columns]
+        updates.append("extra = json_patch(users.extra, excluded.extra)")
+        query = f"""
+        INSERT INTO users ({", ".join(names)})
+        VALUES ({", ".join("?" for _ in names)})
+        ON CONFLICT(id)
+        DO UPDATE SET {", ".join(updates)};
+        """
+        await connection.execute(query, (user_id, *columns.values(), json.dumps(extra)))
+        if "auto_responses" in payload:
+            await connection.execute("DELETE FROM auto_responses WHERE user_id = ?", (user_id,))
+            await connection.executemany(
+                "INSERT INTO auto_responses (user_id, position, response) VALUES (?, ?, ?)",
+                [(user_id, position, response) for position, response in enumerate(payload["auto_responses"])],
+            )
+
+    async def add_user(self, user_id, payload):
+        await self.update_user_data(user_id, payload)
+
+    async def update_user_data(self, user_id, payload):
+        async with self._acquire() as connection:
+            async with connection.transaction():
+                await self._upsert(connection, user_id, payload)
+
+    async def update_current_chatter(self, payload):
+        query = """
+        INSERT INTO users (id, name, login, persistent_mod, points)
+        VALUES (?, ?, ?, 0, 0)
+        ON CONFLICT(id)
+        DO UPDATE SET
+            name = excluded.name,
+            login = excluded.login,
+            last_message_ts = ?;
+        """
+        async with self._acquire() as connection:
+            await connection.execute(query, (
+                payload.chatter.id,
+                payload.chatter.name,
+                payload.chatter.name.lower(),
+                self.get_current_timestamp(),
+            ))
+            return await self._fetch_user(connection, payload.chatter.id)
+
+    async def get_user(self, user_id) -> dict[str, str]|None:
+        async with self._acquire() as connection:
+            return await self._fetch_user(connection, user_id)
+
+    async def get_user_id_by_name(self, username) -> str|None:
+        async with self._acquire() as connection:
+            row = await connection.fetchone("SELECT id FROM users WHERE login = ?", (username.lower(),))
+        if row is not None:
+            return row["id"]
+        user_id = await self.resolver.resolve(username)
+        if user_id:
+            await self.update_user_data(user_id, {"name": username})
+        return user_id
+
+    async def grant_permamod(self, user_id) -> None:
+        await self.update_user_data(user_id, {"mod": True, "persistent_mod": True})
+
+    async def revoke_permamod(self, user_id) -> None:
+        await self.update_user_data(user_id, {"persistent_mod": False})
+
+    async def revoke_mod_status(self, user_id) -> None:
+        await self.update_user_data(user_id, {"mod": False, "persistent_mod": False})
+
+    async def append_auto_response(self, username, response) -> None:
+        query = """
+        INSERT INTO auto_responses (user_id, position, response)
+        SELECT id, (SELECT COUNT(*) FROM auto_responses WHERE user_id = users.id), ?
+        FROM users WHERE login = ?;
+        """
+        async with self._acquire() as connection:
+            await connection.execute(query, (response, username.lower()))
+
+    async def add_counts(self, field, amounts: dict[str, int]) -> None:
+        """
+        Add to a counter such as points or brick_hits for many users, in one
+        transaction. Users not seen before get a record with an empty name,
+        filled in the next time they chat.
+        """
+        if field in self.COLUMNS:
+            query = f"""
+            INSERT INTO users (id, name, {field})
+            VALUES (?, '', ?)
+            ON CONFLICT(id)
+            DO UPDATE SET {field} = {field} + excluded.{field};
+            """
+        else:
+            # Counters without a column of their own live in extra, like any other field
+            path = f"$.{field}"
+            query = f"""
+            INSERT INTO users (id, name, extra)
+            VALUES (?1, '', json_object('{field}', ?2))
+            ON CONFLICT(id)
+            DO UPDATE SET extra = json_set(users.extra, '{path}', coalesce(json_extract(users.extra, '{path}'), 0) + ?2);
+            """
+        async with self._acquire() as connection:
+            async with connection.transaction():
+                await connection.executemany(query, list(amounts.items()))
+
+    async def get_stats(self, fields) -> dict[str, dict[str, int]]:
+        columns = [field if field in self.COLUMNS else f"json_extract(extra, '$.{field}') AS {field}" for field in fields]
+        async with self._acquire() as connection:
+            rows = await connection.fetchall(f"SELECT id, {', '.join(columns)} FROM users")
+        stats = {field: {} for field in fields}
+        for row in rows:
+            for field in fields:
+                if row[field]:
+                    stats[field][row["id"]] = row[field]
+        return stats
+
+    async def get_auto_responders(self) -> dict[str, dict]:
+        async with self._acquire() as connection:
+            rows = await connection.fetchall("SELECT * FROM users WHERE id IN (SELECT user_id FROM auto_responses)")
+            responses = await connection.fetchall("SELECT user_id, response FROM auto_responses ORDER BY user_id, position")
+        by_user: dict[str, list[str]] = {}
+        for row in responses:
+            by_user.setdefault(row["user_id"], []).append(row["response"])
+        return {row["id"]: self._row_to_user(row, by_user[row["id"]]) for row in rows}
+
+    async def save_last_seen(self, last_seen: dict[str, int]) -> None:
+        async with self._acquire() as connection:
+            async with connection.transaction():
+                await connection.executemany(
+                    "UPDATE users SET last_message_ts = ? WHERE id = ?",
+                    [(timestamp, user_id) for user_id, timestamp in last_seen.items()],
+                )
+
+    async def is_persistent_mod(self, user_id) -> bool:
+        async with self._acquire() as connection:
+            row = await connection.fetchone("SELECT persistent_mod FROM users WHERE id = ?", (user_id,))
+        return bool(row and row["persistent_mod"])
+
+
+class SQLiteBrickGameDatabase(SQLiteDatabase):
+    """
+    Async SQLite implementation of the BrickGameDatabase API.
+    """
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS brick_settings(key TEXT PRIMARY KEY, value TEXT NOT NULL);
+    CREATE TABLE IF NOT EXISTS brick_players(username TEXT PRIMARY KEY, target TEXT NOT NULL);
+    """
+    DEFAULT_TARGET = "khan"
+
+    def __init__(self, pool: asqlite.Pool, json_path: str = BRICK_DB):
+        super().__init__(pool, json_path)
+
+    async def setup(self) -> None:
+        await super().setup()
+        async with self._acquire() as connection:
+            row = await connection.fetchone("SELECT value FROM brick_settings WHERE key = 'default_target'")
+        if row is None:
+            await self._import_json()
+
+    async def _import_json(self) -> None:
+        data = await asyncio.to_thread(_read_json, self._json_path)
+        async with self._acquire() as connection:
+            async with connection.transaction():
+                await connection.execute(
+                    "INSERT OR IGNORE INTO brick_settings (key, value) VALUES ('default_target', ?)",
+                    (data.get("default_target", self.DEFAULT_TARGET),),
+                )
+                await connection.executemany(
+                    "INSERT OR IGNORE INTO brick_players (username, target) VALUES (?, ?)",
+                    [(username, player["target"]) for username, player in data.get("players", {}).items() if "target" in player],
+                )
+
+    async def get_default_target(self):
+        async with self._acquire() as connection:
+            row = await connection.fetchone("SELECT value FROM brick_settings WHERE key = 'default_target'")
+        return row["value"] if row else self.DEFAULT_TARGET
+
+    async def set_default_target(self, target):
+        query = """
+        INSERT INTO brick_settings (key, value)
+        VALUES ('default_target', ?)
+        ON CONFLICT(key)
+        DO UPDATE SET value = excluded.value;
+        """
+        async with self._acquire() as connection:
+            await connection.execute(query, (target,))
+
+    async def get_users_target(self, username):
+        async with self._acquire() as connection:
+            row = await connection.fetchone("SELECT target FROM brick_players WHERE username = ?", (username,))
+        if row is None:
+            return await self.get_default_target()
+        return row["target"]
+
+    async def set_users_target(self, username, target):
+        query = """
+        INSERT INTO brick_players (username, target)
+        VALUES (?, ?)
+        ON CONFLICT(username)
+        DO UPDATE SET target = excluded.target;
+        """
+        async with self._acquire() as connection:
+            await connection.execute(query, (username, target))
+
+    async def is_target(self, from_user, current_target):
+        # Check if input_user is the target of target_user
+        target = await self.get_users_target(from_user)
+        return target.lower() == current_target.lower()
+
+
+class SQLiteDiceGameDatabase(SQLiteDatabase):
+    """
+    Async SQLite implementation of the DiceGameDatabase API.
+    Today's players are also kept in memory, so checking one is a set
+    lookup rather than a query, and only new players are written.
+    """
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS dice_settings(key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+    CREATE TABLE IF NOT EXISTS dice_players(username TEXT PRIMARY KEY);
+    """
+
+    def __init__(self, pool: asqlite.Pool, json_path: str = DICE_DB):
+        super().__init__(pool, json_path)
+        self._timestamp = 0
+        self._players: set[str] = set()
+        self._day_ends = 0
+
+    async def setup(self) -> None:
+        await super().setup()
+        async with self._acquire() as connection:
+            row = await connection.fetchone("SELECT value FROM dice_settings WHERE key = 'timestamp'")
+            rows = await connection.fetchall("SELECT username FROM dice_players")
+        if row is None:
+            # First run on SQLite, carry over today's players from dice.json and its journal
+            data = await asyncio.to_thread(DiceGameDatabase.read, self._json_path)
+            self._timestamp = data.get("timestamp", 0)
+            self._players = set(data.get("players_today", []))
+            async with self._acquire() as connection:
+                await connection.executemany("INSERT OR IGNORE INTO dice_players (username) VALUES (?)", [(username,) for username in self._players])
+            await self._set_timestamp(self._timestamp)
+        else:
+            self._timestamp = row["value"]
+            self._players = {row["username"] for row in rows}
+
+    async def _set_timestamp(self, timestamp: int) -> None:
+        query = """
+        INSERT INTO dice_settings (key, value)
+        VALUES ('timestamp', ?)
+        ON CONFLICT(key)
+        DO UPDATE SET value = excluded.value;
+        """
+        async with self._acquire() as connection:
+            await connection.execute(query, (timestamp,))
+
+    async def _roll_over(self) -> None:
+        now = time.time()
+        if now < self._day_ends:
+            return
+        start, self._day_ends = dice_day(now)
+        if self._timestamp < start:
+            if self._players:
+                logger.info(f"New dice day, clearing {len(self._players)} players")
+            self._timestamp = start
+            self._players = set()
+            async with self._acquire() as connection:
+                await connection.execute("DELETE FROM dice_players")
+            await self._set_timestamp(start)
+
+    async def get_timestamp(self):
+        await self._roll_over()
+        return self._timestamp
+
+    async def is_new_player(self, username):
+        await self._roll_over()
+        return username.lower().strip() not in self._players
+
+    async def add_player(self, username):
+        await self._roll_over()
+        username = username.lower().strip()
+        if username in self._players:
+            return
+        self._players.add(username)
+        async with self._acquire() as connection:
+            await connection.execute("INSERT OR IGNORE INTO dice_players (username) VALUES (?)", (username,))
+
+
+class SQLiteMiniGameDatabase(SQLiteDatabase):
+    """
+    Mirror of the minigame settings in bonkybot.db, for tools reading the
+    database. The in-memory MiniGameDatabase stays the source of truth:
+    the bot and the GUI read it, and every change is copied here with
+    replace_data(). Each setting is stored as a JSON value under a dotted
+    key, e.g. "ban_game.ban_keywords".
+    """
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS minigame_settings(key TEXT PRIMARY KEY, value TEXT NOT NULL);
+    """
+    DEFAULT_DATA = MiniGameDatabase.DEFAULT_DATA
+
+    def __init__(self, pool: asqlite.Pool, json_path: str = MINIGAME_DB):
+        super().__init__(pool, json_path)
+
+    async def replace_data(self, data: dict) -> None:
+        """Store a full MiniGameDatabase snapshot in one transaction."""
+        ban_game = data.get("ban_game", {})
+        vip_game = data.get("vip_game", {})
+        settings = {
+            "ban_game.ban_keywords": MiniGameDatabase._keyword_list(ban_game, "ban_keyword"),
+            "ban_game.timeout_duration": ban_game.get("timeout_duration", self.DEFAULT_DATA["ban_game"]["timeout_duration"]),
+            "vip_game.vip_keywords": MiniGameDatabase._keyword_list(vip_game, "vip_keyword"),
+            "vip_game.found_keywords": vip_game.get("found_keywords", []),
+            "vip_game.is_found": vip_game.get("is_found", False),
+            "culling_mode": data.get("culling_mode", False),
+        }
+        query = """
+        INSERT INTO minigame_settings (key, value)
+        VALUES (?, ?)
+        ON CONFLICT(key)
+        DO UPDATE SET value = excluded.value;
+        """
+        async with self._acquire() as connection:
+            async with connection.transaction():
+                await connection.executemany(query, [(key, json.dumps(value)) for key, value in settings.items()])
@@ -1,55 +1,94 @@
-import requests
+import asyncio
+import time
+import aiohttp
 import logging
 
+from metrics import HELIX_REQUESTS
+
 # Set up logging
 logger = logging.getLogger(__name__)
 
+class TwitchAPIError(Exception):
+    """A Helix request Twitch answered with an error status."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
 class TwitchAPI:
+    """
+    Minimal asyncio Helix client using an app access token.
+    One keep-alive session is reused for every request, and the token is
+    reused until shortly before Twitch says it expires.
+    """
     BASE_URL = "https://api.twitch.tv/helix"
-    
+    TOKEN_URL = "https://id.twitch.tv/oauth2/token"
+    TOKEN_EXPIRY_MARGIN = 60 # seconds, refresh a little before the token actually expires
+
     def __init__(self, client_id, client_secret):
         self.client_id = client_id
         self.client_secret = client_secret
         self.access_token = None
-        self.token_expiry = None
-
-    def get_access_token(self):
-        url = "https://id.twitch.tv/oauth2/token"
-        params = {
-            "client_id": self.client_id,
-            "client_secret": self.client_secret,
-            "grant_type": "client_credentials"
-        }
-        logger.info("Requesting access token from Twitch API")
-        response = requests.post(url, params=params)
-        if response.status_code == 200:
-            data = response.json()
+        self.token_expiry = None # time.monotonic() deadline
+        self._session: aiohttp.ClientSession | None = None
+        self._token_lock: asyncio.Lock | None = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        # Created lazily so it binds to the running event loop
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=10, keepalive_timeout=60),
+                timeout=aiohttp.ClientTimeout(total=10),
+            )
+        return self._session
+
+    def _has_valid_token(self) -> bool:
+        return bool(self.access_token) and self.token_expiry is not None and time.monotonic() < self.token_expiry
+
+    async def get_access_token(self, stale_token: str | None = None):
+        if self._token_lock is None:
+            self._token_lock = asyncio.Lock()
+        async with self._token_lock:
+            # Another caller may have refreshed it while we waited
+            if self._has_valid_token() and self.access_token != stale_token:
+                return
+            params = {
+                "client_id": self.client_id,
+                "client_secret": self.client_secret,
+                "grant_type": "client_credentials"
+            }
+            logger.info("Requesting access token from Twitch API")
+            async with self._get_session().post(self.TOKEN_URL, params=params) as response:
+                if response.status != 200:
+                    raise Exception("Failed to get access token: {}".format(await response.text()))
+                data = await response.json()
             self.access_token = data["access_token"]
-            self.token_expiry = data["expires_in"]
-        else:
-            raise Exception("Failed to get access token: {}".format(response.text))
-
-    def make_request(self, endpoint, params=None):
-        if not self.access_token or not self.token_expiry:
-            self.get_access_token()
-        
-        headers = {
-            "Client-ID": self.client_id,
-            "Authorization": f"Bearer {self.access_token}"
-        }
-        
+            self.token_expiry = time.monotonic() + data["expires_in"] - self.TOKEN_EXPIRY_MARGIN
+
+    async def make_request(self, endpoint, params=None):
+        if not self._has_valid_token():
+            await self.get_access_token()
+
         url = f"{self.BASE_URL}/{endpoint}"
-        
-        logger.info(f"Making request to {url} with params: {params}")
-        response = requests.get(url, headers=headers, params=params)
-        
-        if response.status_code == 401:  # Unauthorized
-            logger.info("Access token expired, refreshing token")
-            self.get_access_token()  # Refresh token
-            headers["Authorization"] = f"Bearer {self.access_token}"
-            response = requests.get(url, headers=headers, params=params)
-        
-        if response.status_code == 200:
-            return response.json()
-        else:
-            raise Exception("API request failed: {}".format(response.text))
\ No newline at end of file
+        logger.debug(f"Making request to {url} with params: {params}")
+
+        for attempt in range(2):
+            token = self.access_token
+            headers = {
+                "Client-ID": self.client_id,
+                "Authorization": f"Bearer {token}"
+            }
+            async with self._get_session().get(url, headers=headers, params=params) as response:
+                HELIX_REQUESTS.inc(endpoint=f"GET {endpoint}", status=response.status)
+                if response.status == 401 and attempt == 0:  # Unauthorized
+                    logger.info("Access token expired, refreshing token")
+                    await self.get_access_token(stale_token=token)  # Refresh token
+                    continue
+                if response.status == 200:
+                    return await response.json()
+                raise TwitchAPIError(response.status, "API request failed: {}".format(await response.text()))
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()